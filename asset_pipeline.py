@@ -0,0 +1,286 @@
+import os
+import io
+import sys
+import json
+import base64
+import hashlib
+import threading
+
+# =============================================================================
+# asset_pipeline.py - Display-Size Image Variants with Content-Hashed Names
+# Every image in assets/ is resized once to the width it is shown at (1x) and
+# twice that (2x, for high-DPI screens), as WebP plus a JPEG/PNG fallback.
+# Files are named after a hash of their bytes (rice.400w.1a2b3c4d.webp), so
+# they can be served with an immutable, long cache lifetime, and listed in
+# assets/build/manifest.json together with data URIs for the small ones.
+# Pillow is only needed to build; reading the manifest needs the stdlib only.
+# =============================================================================
+
+ASSETS_DIR = 'assets'
+BUILD_DIR = os.path.join(ASSETS_DIR, 'build')
+MANIFEST_PATH = os.path.join(BUILD_DIR, 'manifest.json')
+MANIFEST_VERSION = 1
+
+# Width in CSS pixels each image is displayed at in cropii.py
+DEFAULT_DISPLAY_WIDTH = 400          # crop photos: st.image(width=400)
+DISPLAY_WIDTHS = {
+    'Cropify logo.png': 120,         # circular header logo
+    'work_diagram.png': 640,         # About tab, one of two columns
+    'diagram_of_chart.png': 640
+}
+SCALES = (1, 2)
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+WEBP_QUALITY = 82
+JPEG_QUALITY = 85
+# Variants up to this size also get a precomputed data URI for inline HTML
+INLINE_MAX_BYTES = 48 * 1024
+
+def _slug(source):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return '-'.join(stem.lower().split())
+
+def display_width(source):
+    return DISPLAY_WIDTHS.get(os.path.basename(source), DEFAULT_DISPLAY_WIDTH)
+
+def _sha256_file(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, format='WEBP', quality=WEBP_QUALITY, method=4)
+    elif fmt == 'jpeg':
+        image.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+def build_asset(source, build_dir=BUILD_DIR, width=None):
+    """
+    Resize one image into its 1x/2x WebP and JPEG/PNG variants
+
+    Args:
+        source: Path of the original image
+        build_dir: Folder the hashed files are written to
+        width: Display width in CSS pixels (default: from DISPLAY_WIDTHS)
+
+    Returns:
+        dict: Manifest entry (source stat, hash and one record per variant)
+    """
+    from PIL import Image, ImageOps
+
+    width = width or display_width(source)
+    stat = os.stat(source)
+    with Image.open(source) as original:
+        # Let the JPEG decoder skip straight to a reduced scale (1/2 .. 1/8)
+        original.draft('RGB', (width * max(SCALES), original.height * width * max(SCALES) // original.width))
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    # Alpha channels that are fully opaque only cost bytes
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        alpha = image.getchannel('A').getextrema() != (255, 255)
+        image = image if alpha else image.convert('RGB')
+    else:
+        image = image.convert('RGB')
+        alpha = False
+    fallback = 'png' if alpha or source.lower().endswith('.png') else 'jpeg'
+
+    os.makedirs(build_dir, exist_ok=True)
+    variants = []
+    for scale in SCALES:
+        # Never upscale: a small original is used at its own size
+        target_width = min(width * scale, image.width)
+        target_height = round(image.height * target_width / image.width)
+        resized = image.resize((target_width, target_height), Image.LANCZOS) if target_width < image.width else image
+        for fmt in ('webp', fallback):
+            data = _encode(resized, fmt)
+            name = f"{_slug(source)}.{target_width}w.{hashlib.sha256(data).hexdigest()[:10]}.{fmt}"
+            path = os.path.join(build_dir, name)
+            if not os.path.exists(path):
+                _write_atomic(path, data)
+            variant = {'scale': scale, 'format': fmt, 'file': name,
+                       'width': target_width, 'height': target_height, 'bytes': len(data)}
+            if len(data) <= INLINE_MAX_BYTES:
+                variant['data_uri'] = f"data:image/{fmt};base64,{base64.b64encode(data).decode()}"
+            variants.append(variant)
+    return {
+        'source_mtime': stat.st_mtime,
+        'source_size': stat.st_size,
+        'source_sha256': _sha256_file(source),
+        'display_width': width,
+        'variants': variants
+    }
+
+def load_manifest(path=MANIFEST_PATH):
+    """Manifest dict; empty if it is missing, unreadable or from another version"""
+    try:
+        with open(path, 'r') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'assets': {}}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'assets': {}}
+    return manifest
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_atomic(path, json.dumps(manifest, indent=2, sort_keys=True).encode())
+
+def _prune(build_dir, manifest):
+    """Delete built files that no manifest entry refers to any more"""
+    keep = {variant['file'] for entry in manifest['assets'].values() for variant in entry['variants']}
+    removed = 0
+    for name in os.listdir(build_dir):
+        if name != os.path.basename(MANIFEST_PATH) and not name.startswith('.') and name not in keep:
+            os.remove(os.path.join(build_dir, name))
+            removed += 1
+    return removed
+
+def is_fresh(entry, source):
+    """True if the manifest entry was built from the current source file"""
+    if entry is None or entry.get('display_width') != display_width(source):
+        return False
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return False
+    if entry['source_mtime'] == stat.st_mtime and entry['source_size'] == stat.st_size:
+        return True
+    # Touched but unchanged (e.g. a fresh checkout)
+    return entry['source_size'] == stat.st_size and entry['source_sha256'] == _sha256_file(source)
+
+def build_all(assets_dir=ASSETS_DIR, build_dir=BUILD_DIR, force=False):
+    """
+    Build the variants of every image in assets_dir and rewrite the manifest
+
+    Returns:
+        dict: Per-source original vs. variant sizes, plus counts
+    """
+    manifest_path = os.path.join(build_dir, os.path.basename(MANIFEST_PATH))
+    manifest = load_manifest(manifest_path)
+    built = 0
+    sources = sorted(
+        os.path.join(assets_dir, name) for name in os.listdir(assets_dir)
+        if name.lower().endswith(SOURCE_EXTENSIONS)
+    )
+    for source in sources:
+        if force or not is_fresh(manifest['assets'].get(source), source):
+            manifest['assets'][source] = build_asset(source, build_dir)
+            built += 1
+    manifest['assets'] = {source: entry for source, entry in manifest['assets'].items() if source in sources}
+    save_manifest(manifest, manifest_path)
+    removed = _prune(build_dir, manifest)
+    sizes = {
+        source: {'original': os.path.getsize(source),
+                 **{f"{v['scale']}x.{v['format']}": v['bytes'] for v in entry['variants']}}
+        for source, entry in manifest['assets'].items()
+    }
+    return {'built': built, 'up_to_date': len(sources) - built, 'removed': removed, 'sizes': sizes}
+
+class AssetStore:
+    """
+    Variants of local assets, held in memory and keyed by the source's mtime
+
+    Looks a source up in the manifest and, if its entry is missing or stale,
+    rebuilds that one image (needs Pillow and a writable build folder). Bytes
+    and data URIs are read from disk once per source version. Sources that
+    cannot be built are returned as-is.
+
+    Args:
+        build_dir: Folder with manifest.json and the hashed files
+    """
+
+    def __init__(self, build_dir=BUILD_DIR):
+        self.build_dir = build_dir
+        self.manifest_path = os.path.join(build_dir, os.path.basename(MANIFEST_PATH))
+        self._entries = {}   # source -> (mtime, manifest entry or None)
+        self._bytes = {}     # variant file name -> bytes
+        self._lock = threading.Lock()
+
+    def entry(self, source):
+        """Manifest entry for source, building it if needed; None if unavailable"""
+        try:
+            mtime = os.path.getmtime(source)
+        except OSError:
+            return None
+        cached = self._entries.get(source)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with self._lock:
+            manifest = load_manifest(self.manifest_path)
+            entry = manifest['assets'].get(source)
+            if not is_fresh(entry, source):
+                try:
+                    entry = build_asset(source, self.build_dir)
+                    manifest = load_manifest(self.manifest_path)
+                    manifest['assets'][source] = entry
+                    save_manifest(manifest, self.manifest_path)
+                except (ImportError, OSError) as e:
+                    print(f"Asset build failed for {source}: {e}", file=sys.stderr)
+                    entry = None
+            self._entries[source] = (mtime, entry)
+        return entry
+
+    def variant(self, source, scale=1, formats=('webp',)):
+        """First variant of the given scale in one of formats (in order of preference)"""
+        entry = self.entry(source)
+        if entry is None:
+            return None
+        for fmt in formats:
+            for variant in entry['variants']:
+                if variant['scale'] == scale and variant['format'] == fmt:
+                    return variant
+        return None
+
+    def image_bytes(self, source, scale=1, formats=('jpeg', 'png')):
+        """
+        Bytes of a variant, or the original file's bytes if there is none
+
+        The default formats are the ones st.image() sends on unchanged; it
+        re-encodes WebP and resizes anything wider than its width argument.
+        """
+        variant = self.variant(source, scale, formats)
+        name = variant['file'] if variant else None
+        if name not in self._bytes:
+            with open(os.path.join(self.build_dir, name) if name else source, 'rb') as file:
+                data = file.read()
+            if name is None:
+                return data
+            self._bytes[name] = data
+        return self._bytes[name]
+
+    def data_uri(self, source, scale=2, formats=('webp', 'jpeg', 'png')):
+        """Inline data URI of a small variant (original file as a last resort)"""
+        variant = self.variant(source, scale, formats)
+        if variant and 'data_uri' in variant:
+            return variant['data_uri']
+        if variant:
+            fmt, data = variant['format'], self.image_bytes(source, scale, (variant['format'],))
+        else:
+            fmt, data = os.path.splitext(source)[1].lstrip('.').lower().replace('jpg', 'jpeg'), self.image_bytes(source)
+        return f"data:image/{fmt};base64,{base64.b64encode(data).decode()}"
+
+def hashed_name(source, scale=2, formats=('webp', 'jpeg', 'png'), manifest_path=MANIFEST_PATH):
+    """Content-hashed file name of a built variant, or None if it is not in the manifest"""
+    entry = load_manifest(manifest_path)['assets'].get(source)
+    for fmt in formats:
+        for variant in (entry or {}).get('variants', []):
+            if variant['scale'] == scale and variant['format'] == fmt:
+                return variant['file']
+    return None
+
+if __name__ == "__main__":
+    # python asset_pipeline.py [--force]
+    result = build_all(force='--force' in sys.argv[1:])
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+from datetime import datetime, timezone
+
+# =============================================================================
+# benchmark.py - Inference Benchmark Suite
+# Cold start, warm single-row latency, batch throughput and peak RSS for every
+# model artifact. Each model runs in its own fresh process so load costs and
+# peak memory are not shared, and every run is appended to a JSON Lines file.
+# =============================================================================
+
+RESULTS_PATH = 'benchmark_results.jsonl'
+CSV_PATH = 'csv/Crop_recommendation.csv'
+BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+def _load(model_name, engine):
+    """Model, scaler and label encoder the same way predict.py loads them"""
+    if engine == 'bundle':
+        from model_bundle import ModelBundle
+        bundle = ModelBundle()
+        return bundle.get(model_name), bundle.scaler, bundle.label_encoder
+    import joblib
+    from model_bundle import MODEL_PATHS
+    return joblib.load(MODEL_PATHS[model_name]), joblib.load('scaler.pkl'), joblib.load('label_encoder.pkl')
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def cold_start(model_name, engine):
+    """
+    Child process body: import, load and predict once; prints JSON timings
+
+    The parent measures the full spawn-to-exit time around this, which also
+    covers interpreter start-up.
+    """
+    start = time.perf_counter()
+    from predict import predict_batch
+    imported = time.perf_counter()
+    model, scaler, label_encoder = _load(model_name, engine)
+    loaded = time.perf_counter()
+    predict_batch([[90, 42, 43, 20.9, 82.0, 6.5, 202.9]], model, scaler, label_encoder)
+    done = time.perf_counter()
+    print(json.dumps({
+        'import_s': imported - start,
+        'load_s': loaded - imported,
+        'first_prediction_s': done - loaded,
+        'peak_rss_mb': _peak_rss_mb()
+    }))
+
+def warm_run(model_name, engine, iterations, max_batch):
+    """Child process body: warm latency and throughput; prints JSON results"""
+    import numpy as np
+    import pandas as pd
+    from predict import FEATURE_NAMES, predict_batch
+
+    model, scaler, label_encoder = _load(model_name, engine)
+    data = pd.read_csv(CSV_PATH)[FEATURE_NAMES].to_numpy(dtype=float)
+    rng = np.random.default_rng(42)
+
+    # Warm single-row latency through the full scale -> infer -> decode path
+    rows = data[rng.integers(0, len(data), size=iterations)]
+    predict_batch(rows[:1], model, scaler, label_encoder)
+    latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        predict_batch(row[None, :], model, scaler, label_encoder)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    # Throughput on rows resampled (with replacement) from the training CSV
+    throughput = {}
+    for batch_size in [b for b in BATCH_SIZES if b <= max_batch]:
+        batch = data[rng.integers(0, len(data), size=batch_size)]
+        repeats = max(1, min(50, 20000 // batch_size))
+        start = time.perf_counter()
+        for _ in range(repeats):
+            predict_batch(batch, model, scaler, label_encoder)
+        elapsed = (time.perf_counter() - start) / repeats
+        throughput[str(batch_size)] = {'seconds_per_batch': elapsed, 'rows_per_second': batch_size / elapsed}
+
+    print(json.dumps({
+        'single_row_ms': {
+            'p50': _percentile(latencies, 50) * 1000,
+            'p99': _percentile(latencies, 99) * 1000,
+            'mean': sum(latencies) / len(latencies) * 1000
+        },
+        'throughput': throughput,
+        'peak_rss_mb': _peak_rss_mb()
+    }))
+
+def _child(*args):
+    """Run this script in a fresh interpreter; returns (parsed JSON, wall seconds)"""
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, __file__, *args], capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    return json.loads(output.stdout.strip().splitlines()[-1]), wall
+
+def _environment():
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+    for module in ['numpy', 'sklearn', 'joblib']:
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    try:
+        info['git_commit'] = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                            text=True).stdout.strip() or None
+    except OSError:
+        info['git_commit'] = None
+    return info
+
+def run_suite(models, engine='sklearn', cold_runs=5, iterations=1000, max_batch=100000):
+    """
+    Benchmark every model and return one result record
+
+    Args:
+        models: Model display names (see model_bundle.MODEL_PATHS)
+        engine: 'sklearn' (pickles) or 'bundle' (model_bundle/)
+        cold_runs: Fresh processes per model for the cold-start measurement
+        iterations: Single-row predictions timed per model
+        max_batch: Largest throughput batch size
+    """
+    record = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'engine': engine,
+        'environment': _environment(),
+        'models': {}
+    }
+    for name in models:
+        cold = []
+        for _ in range(cold_runs):
+            stages, wall = _child('--cold-start', name, '--engine', engine)
+            cold.append(dict(stages, total_s=wall))
+        cold.sort(key=lambda run: run['total_s'])
+        warm, _ = _child('--warm', name, '--engine', engine,
+                         '--iterations', str(iterations), '--max-batch', str(max_batch))
+        record['models'][name] = {
+            'cold_start': {
+                'median_total_s': cold[len(cold) // 2]['total_s'],
+                'min_total_s': cold[0]['total_s'],
+                'median_run': cold[len(cold) // 2]
+            },
+            'single_row_ms': warm['single_row_ms'],
+            'throughput': warm['throughput'],
+            'peak_rss_mb': max(warm['peak_rss_mb'], max(run['peak_rss_mb'] for run in cold))
+        }
+    return record
+
+def print_summary(record, previous=None):
+    """Human-readable table, with % change vs. a previous record if given"""
+    def delta(now, before):
+        return f" ({(now - before) / before * 100:+.0f}%)" if before else ""
+
+    print(f"Benchmark {record['timestamp']} engine={record['engine']} "
+          f"commit={record['environment'].get('git_commit')}")
+    for name, result in record['models'].items():
+        old = (previous or {}).get('models', {}).get(name, {})
+        cold = result['cold_start']['median_total_s']
+        p50, p99 = result['single_row_ms']['p50'], result['single_row_ms']['p99']
+        largest = list(result['throughput'])[-1]
+        rps = result['throughput'][largest]['rows_per_second']
+        print(f"  {name:<14} cold {cold * 1000:7.0f} ms{delta(cold, old.get('cold_start', {}).get('median_total_s'))}"
+              f" | p50 {p50:7.3f} ms{delta(p50, old.get('single_row_ms', {}).get('p50'))}"
+              f" | p99 {p99:7.3f} ms"
+              f" | {rps:11.0f} rows/s @ {largest}"
+              f"{delta(rps, old.get('throughput', {}).get(largest, {}).get('rows_per_second'))}"
+              f" | peak RSS {result['peak_rss_mb']:6.1f} MB")
+
+def _previous_record(path, engine):
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, 'r') as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                if record.get('engine') == engine:
+                    previous = record
+    return previous
+
+def main(argv):
+    from model_bundle import MODEL_PATHS
+
+    parser = argparse.ArgumentParser(description="Cropify inference benchmark suite")
+    parser.add_argument('--models', nargs='+', default=list(MODEL_PATHS), metavar='NAME',
+                        help="Models to benchmark (default: all)")
+    parser.add_argument('--engine', choices=['sklearn', 'bundle'], default='sklearn')
+    parser.add_argument('--cold-runs', type=int, default=5)
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--max-batch', type=int, default=100000)
+    parser.add_argument('--output', default=RESULTS_PATH,
+                        help=f"JSON Lines file the run is appended to (default: {RESULTS_PATH})")
+    # Internal: child process entry points
+    parser.add_argument('--cold-start', metavar='NAME', help=argparse.SUPPRESS)
+    parser.add_argument('--warm', metavar='NAME', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.cold_start:
+        cold_start(args.cold_start, args.engine)
+        return 0
+    if args.warm:
+        warm_run(args.warm, args.engine, args.iterations, args.max_batch)
+        return 0
+
+    previous = _previous_record(args.output, args.engine)
+    record = run_suite(args.models, args.engine, args.cold_runs, args.iterations, args.max_batch)
+    with open(args.output, 'a') as file:
+        file.write(json.dumps(record) + "\n")
+    print_summary(record, previous)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
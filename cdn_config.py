@@ -31,6 +31,12 @@ def get_asset_url(asset_name, local_path=None):
     """
     if CDN_BASE_URL and ASSETS.get(asset_name):
         return f"{CDN_BASE_URL}/{ASSETS[asset_name]}"
+    elif CDN_BASE_URL and local_path:
+        # Content-hashed variant from assets/build (python asset_pipeline.py);
+        # its name changes whenever its bytes do, so it can be cached forever
+        from asset_pipeline import hashed_name
+        name = hashed_name(local_path)
+        return f"{CDN_BASE_URL}/{name}" if name else local_path
     elif local_path:
         return local_path
     else:
@@ -40,12 +46,12 @@ def get_asset_url(asset_name, local_path=None):
 # INSTRUCTIONS FOR PHASE 2 IMPLEMENTATION:
 # =============================================================================
 # 1. Create a Cloudinary or AWS S3 account
-# 2. Upload all images from assets/ folder:
-#    - Rice.jpg, Wheat.jpg, Maize.jpg, Bajra.jpg
-#    - Cropify logo.png
-#    - work_diagram.png, diagram_of_chart.png
-# 3. Copy the CDN URLs and update ASSETS dict above
-# 4. Set CDN_BASE_URL to your cloud storage base URL
-# 5. Delete local assets/ folder from repository
+# 2. Run `python asset_pipeline.py` and upload everything in assets/build/
+#    (display-size variants with content-hashed names), served with
+#    "Cache-Control: public, max-age=31536000, immutable"
+# 3. Set CDN_BASE_URL to your cloud storage base URL; get_asset_url() then
+#    looks up the hashed names in assets/build/manifest.json
+# 4. Optionally override single assets with explicit URLs in ASSETS above
+# 5. Keep assets/build/manifest.json deployed with the app
 # 6. The app will automatically use CDN URLs
 # =============================================================================
\ No newline at end of file
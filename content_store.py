@@ -0,0 +1,273 @@
+import os
+import json
+import hashlib
+import threading
+
+# =============================================================================
+# content_store.py - Compiled Crop Content and UI Translations
+# crops.yaml is parsed once and compiled into one record per (crop, language)
+# with the language fallbacks already applied. The compiled form is saved as
+# a JSON snapshot next to the YAML and is only rebuilt when the YAML's mtime
+# or content changes, so the app does a stat() and two dict lookups per page
+# instead of a YAML parse. The UI strings live here too.
+# =============================================================================
+
+CONTENT_PATH = 'crops.yaml'
+SNAPSHOT_PATH = 'crops.compiled.json'
+SNAPSHOT_VERSION = 1
+DEFAULT_LANGUAGE = 'English'
+DEFAULT_IMAGE = 'assets/Rice.jpg'
+
+# Text sections of each crop, with the message shown when a crop has none
+SECTIONS = {
+    'facts': "No facts available.",
+    'tips': "No tips available.",
+    'suggestions': "No suggestions available."
+}
+
+# ---------------------- UI Translations -----------------------
+UI_TRANSLATIONS = {
+    "English": {
+        "title": "Enter Soil and Climate Parameters",
+        "nitrogen": "Nitrogen (N)",
+        "phosphorus": "Phosphorus (P)",
+        "potassium": "Potassium (K)",
+        "soil_ph": "Soil pH",
+        "predict_crop": "Predict Crop",
+        "current_location": "Current Location",
+        "temperature": "Temperature",
+        "humidity": "Humidity",
+        "weather": "Weather",
+        "more_about": "More about",
+        "tips": "Tips to Grow",
+        "facts": "Interesting Facts",
+        "suggestions_to_improve_yield": "Suggestions to Improve Yield",
+        "description": "Description"
+    },
+    "Hindi": {
+        "title": "मृदा और जलवायु पैरामीटर दर्ज करें",
+        "nitrogen": "नाइट्रोजन (N)",
+        "phosphorus": "फॉस्फोरस (P)",
+        "potassium": "पोटेशियम (K)",
+        "soil_ph": "मिट्टी का पीएच",
+        "predict_crop": "फसल का पूर्वानुमान करें",
+        "current_location": "वर्तमान स्थान",
+        "temperature": "तापमान",
+        "humidity": "आर्द्रता",
+        "weather": "मौसम",
+        "more_about": "के बारे में अधिक",
+        "tips": "उगाने के टिप्स",
+        "facts": "दिलचस्प तथ्य",
+        "suggestions_to_improve_yield": "उपज बढ़ाने के सुझाव",
+        "description": "विवरण"
+    },
+    "Tamil": {
+        "title": "மண் மற்றும் காலநிலை அளவுருக்களை உள்ளிடவும்",
+        "nitrogen": "நைட்ரஜன் (N)",
+        "phosphorus": "பாஸ்பரஸ் (P)",
+        "potassium": "பொட்டாசியம் (K)",
+        "soil_ph": "மண்ணின் பிஎச்",
+        "predict_crop": "பயிர் கணிப்பு",
+        "current_location": "தற்போதைய இடம்",
+        "temperature": "வெப்பநிலை",
+        "humidity": "ஈரப்பதம்",
+        "weather": "வானிலை",
+        "more_about": "பற்றி மேலும்",
+        "tips": "வளர்க்கும் குறிப்புகள்",
+        "facts": "சுவாரஸ்யமான தகவல்கள்",
+        "suggestions_to_improve_yield": "உற்பத்தியை மேம்படுத்தும் யோசனைகள்",
+        "description": "விளக்கம்"
+    }
+}
+
+def ui_strings(language):
+    """UI strings for a language; keys it does not translate fall back to English"""
+    return {**UI_TRANSLATIONS[DEFAULT_LANGUAGE], **UI_TRANSLATIONS.get(language, {})}
+
+def _sha256_file(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def _parse_yaml(path):
+    import yaml
+    # libyaml's C loader when PyYAML was built with it (~10x faster)
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    with open(path, 'r', encoding='utf-8') as file:
+        return yaml.load(file, Loader=loader) or {}
+
+def compile_content(data):
+    """
+    Resolve every crop's sections for every language
+
+    A section missing in a language falls back to English, then to the
+    section's "No ... available." message, as the app always did.
+
+    Args:
+        data: Parsed crops.yaml ({crop: {'image', 'facts', 'tips', 'suggestions'}})
+
+    Returns:
+        tuple: (languages, {crop: {language: record}})
+    """
+    found = {language for crop in data.values() for section in SECTIONS
+             for language in (crop.get(section) or {})}
+    languages = [DEFAULT_LANGUAGE] + sorted((found | set(UI_TRANSLATIONS)) - {DEFAULT_LANGUAGE})
+    records = {}
+    for name, crop in data.items():
+        records[name] = {}
+        for language in languages:
+            record = {'image': crop.get('image', DEFAULT_IMAGE)}
+            for section, missing in SECTIONS.items():
+                texts = crop.get(section) or {}
+                record[section] = texts.get(language, texts.get(DEFAULT_LANGUAGE, missing))
+            records[name][language] = record
+    return languages, records
+
+def build_snapshot(source=CONTENT_PATH, snapshot_path=SNAPSHOT_PATH):
+    """Parse and compile source, write the JSON snapshot, and return it"""
+    stat = os.stat(source)
+    languages, records = compile_content(_parse_yaml(source))
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'source_mtime': stat.st_mtime,
+        'source_size': stat.st_size,
+        'source_sha256': _sha256_file(source),
+        'languages': languages,
+        'records': records
+    }
+    _write_snapshot(snapshot, snapshot_path)
+    return snapshot
+
+def _write_snapshot(snapshot, snapshot_path):
+    tmp_path = f"{snapshot_path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(snapshot, file, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, snapshot_path)
+    except OSError:
+        # Read-only deployments still work, they just compile in memory
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def load_snapshot(source=CONTENT_PATH, snapshot_path=SNAPSHOT_PATH):
+    """
+    Compiled content for source, from the snapshot if it is still current
+
+    The snapshot is current if the source's mtime and size are unchanged, or,
+    failing that, if its SHA-256 is (a touched or freshly checked out file).
+    """
+    stat = os.stat(source)
+    try:
+        with open(snapshot_path, 'r', encoding='utf-8') as file:
+            snapshot = json.load(file)
+    except (OSError, ValueError):
+        snapshot = None
+    if snapshot and snapshot.get('version') == SNAPSHOT_VERSION and snapshot['source_size'] == stat.st_size:
+        if snapshot['source_mtime'] == stat.st_mtime:
+            return snapshot
+        if snapshot['source_sha256'] == _sha256_file(source):
+            snapshot['source_mtime'] = stat.st_mtime
+            _write_snapshot(snapshot, snapshot_path)
+            return snapshot
+    return build_snapshot(source, snapshot_path)
+
+class ContentStore:
+    """
+    O(1) (crop, language) -> record lookups over the compiled crops.yaml
+
+    Each lookup stats the source file; the compiled content is reloaded only
+    when its mtime changed. Thread-safe, meant to be shared by all sessions.
+
+    Args:
+        source: Path of crops.yaml
+        snapshot_path: Where the compiled JSON snapshot is kept
+    """
+
+    def __init__(self, source=CONTENT_PATH, snapshot_path=SNAPSHOT_PATH):
+        self.source = source
+        self.snapshot_path = snapshot_path
+        self._mtime = None
+        self._languages = list(UI_TRANSLATIONS)
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = os.path.getmtime(self.source)
+        except OSError:
+            self._mtime, self._records = None, {}
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime != self._mtime:
+                snapshot = load_snapshot(self.source, self.snapshot_path)
+                self._languages, self._records = snapshot['languages'], snapshot['records']
+                self._mtime = mtime
+
+    def available(self):
+        """False if the source file is missing"""
+        self._refresh()
+        return self._mtime is not None
+
+    @property
+    def languages(self):
+        """English first, then every other language in crops.yaml or the UI strings"""
+        self._refresh()
+        return self._languages
+
+    def crops(self):
+        self._refresh()
+        return list(self._records)
+
+    def __contains__(self, crop):
+        self._refresh()
+        return crop in self._records
+
+    def get(self, crop, language=DEFAULT_LANGUAGE):
+        """
+        Record for a crop in a language
+
+        Returns:
+            dict: {'image', 'facts', 'tips', 'suggestions'}, or None for an unknown crop
+        """
+        self._refresh()
+        by_language = self._records.get(crop)
+        if by_language is None:
+            return None
+        return by_language.get(language) or by_language[DEFAULT_LANGUAGE]
+
+def verify(source=CONTENT_PATH):
+    """Compare every compiled record with the app's original nested .get() lookups"""
+    data = _parse_yaml(source)
+    store = ContentStore(source)
+    mismatches = []
+    for crop, crop_data in data.items():
+        for language in store.languages:
+            expected = {
+                'image': crop_data.get("image", DEFAULT_IMAGE),
+                'facts': crop_data.get("facts", {}).get(language, crop_data.get("facts", {}).get("English", "No facts available.")),
+                'tips': crop_data.get("tips", {}).get(language, crop_data.get("tips", {}).get("English", "No tips available.")),
+                'suggestions': crop_data.get("suggestions", {}).get(language, crop_data.get("suggestions", {}).get("English", "No suggestions available."))
+            }
+            if store.get(crop, language) != expected:
+                mismatches.append([crop, language])
+    return {'crops': len(data), 'languages': store.languages, 'mismatches': mismatches}
+
+if __name__ == "__main__":
+    import sys
+
+    # python content_store.py [--build | --verify | CROP [LANGUAGE]]
+    args = sys.argv[1:]
+    if args and args[0] == '--build':
+        snapshot = build_snapshot()
+        print(json.dumps({'crops': len(snapshot['records']), 'languages': snapshot['languages'],
+                          'snapshot': SNAPSHOT_PATH, 'bytes': os.path.getsize(SNAPSHOT_PATH)}))
+    elif args and args[0] == '--verify':
+        result = verify()
+        print(json.dumps(result))
+        sys.exit(1 if result['mismatches'] else 0)
+    elif args:
+        print(json.dumps(ContentStore().get(args[0].lower(), *args[1:2]), ensure_ascii=False, indent=2))
+    else:
+        print("Usage: python content_store.py [--build | --verify | CROP [LANGUAGE]]")
+        sys.exit(1)
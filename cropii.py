@@ -1,205 +1,138 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import joblib
-import seaborn as sns
-import matplotlib.pyplot as plt
 import os
-import requests
-import base64
+import copy
+import functools
 import yaml
 from yaml.loader import SafeLoader
 import streamlit_authenticator as stauth
+from lazy_imports import lazy_import
+import timing
+
+# Heavy modules load on first use, so the login page renders without them
+pd = lazy_import("pandas")
+joblib = lazy_import("joblib")
+
+# One timing record per script run (see timing.py and the admin timings panel)
+timing.begin_request("page")
+
+# ---------------------- Streamlit Config (first Streamlit call) --------------
+st.set_page_config(page_title="🌾 CROPIFY | Smart Crop Recommendation", layout="wide", page_icon="🌿")
 
 # =============================================================================
 # AUTHENTICATION SETUP
 # =============================================================================
-with open('config.yaml', 'r') as file:
-    config = yaml.load(file, Loader=SafeLoader)
+@st.cache_resource
+def load_auth_config(config_mtime):
+    """
+    config.yaml with its passwords bcrypt-hashed once per server process
+
+    The shipped config.yaml already stores bcrypt hashes; plaintext passwords
+    added by hand are hashed here once instead of by stauth.Authenticate on
+    every rerun (~0.3 s per user). Keyed on the file's mtime, so edits apply.
+    """
+    with open('config.yaml', 'r') as file:
+        config = yaml.load(file, Loader=SafeLoader)
+    stauth.Hasher.hash_passwords(config['credentials'])
+    return config
+
+with timing.stage('config_load'):
+    # Authenticate updates the credentials it is given, so it gets a copy
+    config = copy.deepcopy(load_auth_config(os.path.getmtime('config.yaml')))
 
 authenticator = stauth.Authenticate(
     config['credentials'],
     config['cookie']['name'],
     config['cookie']['key'],
-    config['cookie']['expiry_days']
+    config['cookie']['expiry_days'],
+    auto_hash=False
 )
 
+# =============================================================================
+# AUTHENTICATION CHECK
+# =============================================================================
+try:
+    authenticator.login(location='main', key='Login')
+except Exception as e:
+    st.error(e)
+
+if st.session_state['authentication_status'] == True:
+    pass  # User is authenticated
+elif st.session_state['authentication_status'] == False:
+    st.error('Invalid username or password')
+    timing.end_request()
+    st.stop()
+else:
+    st.info('Please log in to access the application')
+    timing.end_request()
+    st.stop()
+
+# =============================================================================
+# APP MODULES (imported after login; numpy, sklearn and requests load here)
+# =============================================================================
+from model_bundle import ModelBundle, BUNDLE_PATH
+from model_registry import ModelRegistry
+from weather_service import WeatherService
+from prediction_cache import PredictionCache, model_fingerprint
+from ensemble import predict_ensemble, parse_weights
+from streaming_stats import analyze_csv
+from heatmap_cache import RenderCache, file_digest
+from asset_pipeline import AssetStore
+from cdn_config import get_asset_url
+from content_store import ContentStore, ui_strings
+from decision_map import DecisionMap
+from sensitivity import sweep_1d, sweep_2d, render_sweep, from_json
+from prediction_server import PredictionClient, ENSEMBLE_MODEL
+from micro_batching import MicroBatcher
+from neighbour_index import NeighbourIndex
+from predict import FEATURE_NAMES
+
 # =============================================================================
 # WEATHER SETUP AND FUNCTIONS
 # =============================================================================
 # API_KEY should be set as an environment variable for security
 API_KEY = os.getenv("OPENWEATHER_API_KEY", "78e9075ace378bb96203be576111af4e")
 
-def get_location():
-    """Get user's location using multiple fallback services"""
-    # Try multiple location services for better reliability
-    location_services = [
-        "https://ipinfo.io/json",
-        "https://ipapi.co/json/",
-        "http://ip-api.com/json/"
-    ]
-    
-    for service_url in location_services:
-        try:
-            response = requests.get(service_url, timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                # Try different possible keys for city name
-                city = (data.get("city") or 
-                       data.get("town") or 
-                       data.get("region") or 
-                       data.get("district"))
-                if city:
-                    return city
-        except Exception as e:
-            print(f"Location fetch error from {service_url}: {e}")
-            continue
-    return None
-
-def get_weather(city):
-    """Get weather data for a given city"""
-    if not city:
-        return None, None, None
-    try:
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={API_KEY}&units=metric"
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            temp = data["main"]["temp"]
-            humidity = data["main"]["humidity"]
-            weather = data["weather"][0]["main"]
-            return temp, humidity, weather
-        else:
-            print(f"Weather API error: Status {response.status_code}")
-            return None, None, None
-    except Exception as e:
-        print(f"Weather fetch error: {e}")
-        return None, None, None
-
-# 🌍 Get user's city with improved reliability
-location_attempts = 0
-max_attempts = 3
-
-city = None
-while location_attempts < max_attempts and not city:
-    city = get_location()
-    location_attempts += 1
-    if not city:
-        print(f"Attempt {location_attempts} failed to get location. Retrying...")
-
-# If still no city after retries, set to None to trigger manual input prompt
-if not city:
-    city = None
-    print("⚠️ Location detection failed after multiple attempts. Please enter your city manually.")
+@st.cache_resource
+def get_weather_service():
+    """One service per server process: pooled sessions plus a shared TTL cache"""
+    return WeatherService(api_key=API_KEY)
+
+weather_service = get_weather_service()
 
-# 🌦 Get weather data with retry logic
-weather_attempts = 0
-max_weather_attempts = 2
-temp, hum, condition = None, None, None
+# 🌍 Get user's city: all providers are asked at once, the first answer wins,
+# and the result is cached so reruns and new sessions do not wait again
+with timing.stage('location'):
+    city = weather_service.detect_city()
+if not city:
+    print("⚠️ Location detection failed. Please enter your city manually.")
 
-while weather_attempts < max_weather_attempts and (temp is None or hum is None):
-    if city:  # Only try to get weather if we have a city
-        temp, hum, condition = get_weather(city)
-    weather_attempts += 1
-    if temp is None or hum is None:
-        print(f"Attempt {weather_attempts} failed to get weather. Retrying...")
+# 🌦 Get weather data (stale values are served while a background refresh runs)
+with timing.stage('weather'):
+    temp, hum, condition = weather_service.get_weather(city)
 
 # ⚡ If failed, fallback values
 if temp is None or hum is None:
     temp = 24.0
     hum = 60.0
     condition = "Clear"
-    if not city:  # Only set default city if no city was detected
-        city = None  # Set to None to clearly indicate no location detected
     print("⚠️ Could not fetch live weather. Using default values.")
 
-
-# # ---------------------- Translations -----------------------
-translations = {
-    "English": {
-        "title": "Enter Soil and Climate Parameters",
-        "nitrogen": "Nitrogen (N)",
-        "phosphorus": "Phosphorus (P)",
-        "potassium": "Potassium (K)",
-        "soil_ph": "Soil pH",
-        "predict_crop": "Predict Crop",
-        "current_location": "Current Location",
-        "temperature": "Temperature",
-        "humidity": "Humidity",
-        "weather": "Weather",
-        "more_about": "More about",
-        "tips": "Tips to Grow",
-        "facts": "Interesting Facts",
-        "suggestions_to_improve_yield": "Suggestions to Improve Yield",
-        "description": "Description"
-    },
-    "Hindi": {
-        "title": "मृदा और जलवायु पैरामीटर दर्ज करें",
-        "nitrogen": "नाइट्रोजन (N)",
-        "phosphorus": "फॉस्फोरस (P)",
-        "potassium": "पोटेशियम (K)",
-        "soil_ph": "मिट्टी का पीएच",
-        "predict_crop": "फसल का पूर्वानुमान करें",
-        "current_location": "वर्तमान स्थान",
-        "temperature": "तापमान",
-        "humidity": "आर्द्रता",
-        "weather": "मौसम",
-        "more_about": "के बारे में अधिक",
-        "tips": "उगाने के टिप्स",
-        "facts": "दिलचस्प तथ्य",
-        "suggestions_to_improve_yield": "उपज बढ़ाने के सुझाव",
-        "description": "विवरण"
-    },
-    "Tamil": {
-        "title": "மண் மற்றும் காலநிலை அளவுருக்களை உள்ளிடவும்",
-        "nitrogen": "நைட்ரஜன் (N)",
-        "phosphorus": "பாஸ்பரஸ் (P)",
-        "potassium": "பொட்டாசியம் (K)",
-        "soil_ph": "மண்ணின் பிஎச்",
-        "predict_crop": "பயிர் கணிப்பு",
-        "current_location": "தற்போதைய இடம்",
-        "temperature": "வெப்பநிலை",
-        "humidity": "ஈரப்பதம்",
-        "weather": "வானிலை",
-        "more_about": "பற்றி மேலும்",
-        "tips": "வளர்க்கும் குறிப்புகள்",
-        "facts": "சுவாரஸ்யமான தகவல்கள்",
-        "suggestions_to_improve_yield": "உற்பத்தியை மேம்படுத்தும் யோசனைகள்",
-        "description": "விளக்கம்"
-    }
-}
-
 # --- CORRECTION: Use relative paths from the 'assets' folder ---
 # Note: For crops without specific images (cotton, jute), we're using Rice.jpg as a placeholder
 # TODO: Add specific images for cotton and jute when available
 # --- LOAD CROP DATA FROM YAML ---
-if os.path.exists('crops.yaml'):
-    with open('crops.yaml', 'r', encoding='utf-8') as file:
-        crop_info = yaml.load(file, Loader=SafeLoader)
-else:
-    crop_info = {}
+@st.cache_resource
+def get_content_store():
+    """crops.yaml compiled once per (crop, language), shared by all sessions"""
+    return ContentStore()
+
+content_store = get_content_store()
+# A stat() per run; the compiled snapshot is reloaded only when crops.yaml changes
+with timing.stage('crops_yaml'):
+    content_available = content_store.available()
+if not content_available:
     st.error("crops.yaml not found! Please make sure it's in the project directory.")
 
-# ---------------------- Streamlit Config and Styling --------------
-st.set_page_config(page_title="🌾 CROPIFY | Smart Crop Recommendation", layout="wide", page_icon="🌿")
-
-# =============================================================================
-# AUTHENTICATION CHECK
-# =============================================================================
-try:
-    authenticator.login(location='main', key='Login')
-except Exception as e:
-    st.error(e)
-
-if st.session_state['authentication_status'] == True:
-    pass  # User is authenticated
-elif st.session_state['authentication_status'] == False:
-    st.error('Invalid username or password')
-    st.stop()
-else:
-    st.info('Please log in to access the application')
-    st.stop()
-
 st.markdown("""
     <style>
         html, body, [data-testid="stApp"] {
@@ -243,15 +176,34 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# ---------------------- Images ----------------------
+@st.cache_resource
+def get_asset_store():
+    """Display-size image variants, held in memory per source mtime (see asset_pipeline.py)"""
+    return AssetStore()
+
+def asset_image(asset_name, path):
+    """
+    What st.image() gets for an asset: its CDN URL if one is configured,
+    otherwise the in-memory JPEG/PNG variant, which Streamlit sends as-is
+    instead of decoding and resizing the full-size original on every rerun
+    """
+    url = get_asset_url(asset_name, path)
+    return url if url != path else get_asset_store().image_bytes(path)
+
 # ---------------------- Header with Circular Logo ----------------------
 # --- CORRECTION: Use a relative path to your logo in the 'assets' folder ---
 # --- Make sure your logo file is named 'logo.png' or change the name here ---
 logo_path = r"assets/Cropify logo.png" 
 
 if os.path.exists(logo_path):
+    # 2x WebP (a few KB) inlined as a precomputed data URI, or the CDN URL
+    logo_src = get_asset_url("logo", logo_path)
+    if logo_src == logo_path:
+        logo_src = get_asset_store().data_uri(logo_path)
     st.markdown(f"""
     <div style="text-align: center; padding: 20px;">
-        <img src="data:image/png;base64,{base64.b64encode(open(logo_path, 'rb').read()).decode()}" 
+        <img src="{logo_src}" 
              style="width:120px;height:120px;border-radius:50%;box-shadow:0 4px 15px rgba(0,0,0,0.2), 0 0 30px #00ffcc;
                     border: 4px solid #00ffcc; animation: pulse-border 1.5s infinite ease-in-out; margin-bottom:10px;">
         <h1 style="background: linear-gradient(135deg, #00c9ff 0%, #92fe9d 100%);
@@ -293,8 +245,8 @@ except Exception as e:
 
 st.sidebar.info(f"Welcome, {st.session_state['name']}!", icon="👋")
 
-selected_language = st.sidebar.selectbox("Select Language", ["English","Hindi", "Tamil"])
-language = translations[selected_language]
+selected_language = st.sidebar.selectbox("Select Language", content_store.languages)
+language = ui_strings(selected_language)
 
 # Location Settings
 st.sidebar.subheader("Location Settings")
@@ -319,7 +271,8 @@ if update_weather and manual_city:
         weather_loading.info("🔄 Fetching weather data...")
         
         # Refresh weather data with manual city
-        new_temp, new_hum, new_condition = get_weather(city)
+        with timing.stage('weather'):
+            new_temp, new_hum, new_condition = weather_service.get_weather(city)
         
         # Clear loading message
         weather_loading.empty()
@@ -362,31 +315,216 @@ model_paths = {
     "Naive Bayes": r"naive_bayes.pkl",
     "Decision Tree": r"random_tree.pkl"
 }
-models = {}
-
-# Show loading message
-loading_placeholder = st.sidebar.empty()
-loading_placeholder.info("🔄 Loading machine learning models...")
 
-for name, path in model_paths.items():
-    if os.path.exists(path):
-        models[name] = joblib.load(path)
-    else:
-        st.sidebar.error(f"Model not found: {path}")
+# Memory budget for loaded models, in MB (unset = keep every model loaded)
+MODEL_MEMORY_BUDGET_MB = os.getenv("CROPIFY_MODEL_MEMORY_MB")
+
+def model_files_fingerprint():
+    """
+    Identity of the model files on disk: the bundle manifest, or every pickle
+    plus scaler.pkl and label_encoder.pkl. Changes on every retrain.
+    """
+    if ModelBundle.exists(BUNDLE_PATH):
+        return model_fingerprint("bundle", os.path.join(BUNDLE_PATH, "manifest.json"))
+    paths = [*model_paths.values(), r"scaler.pkl", r"label_encoder.pkl"]
+    return "|".join(model_fingerprint(path, path) for path in paths)
+
+@st.cache_resource(max_entries=1)
+def get_model_registry(files_fingerprint):
+    """
+    One registry per server process and build of the model files, shared by
+    every session and rerun
+
+    Prefers the non-pickle bundle (python model_bundle.py --export), which
+    memory-maps a model's arrays on first use; falls back to the pickles.
+    A retrain changes files_fingerprint, so the registry, scaler and label
+    encoder are rebuilt together and a lazily loaded model is never paired
+    with the scaler of an older training run.
+    """
+    budget = int(float(MODEL_MEMORY_BUDGET_MB) * 1024 * 1024) if MODEL_MEMORY_BUDGET_MB else None
+    if ModelBundle.exists(BUNDLE_PATH):
+        bundle = ModelBundle(BUNDLE_PATH)
+        loaders = {name: functools.partial(bundle.load, name) for name in bundle.model_names()}
+        return ModelRegistry(loaders, memory_budget=budget), bundle.scaler, bundle.label_encoder
+
+    loaders = {name: functools.partial(joblib.load, path)
+               for name, path in model_paths.items() if os.path.exists(path)}
+    # Load Scaler and Label Encoder
+    scaler = joblib.load(r"scaler.pkl") if os.path.exists(r"scaler.pkl") else None
+    le = joblib.load(r"label_encoder.pkl") if os.path.exists(r"label_encoder.pkl") else None
+    return ModelRegistry(loaders, memory_budget=budget), scaler, le
+
+models_fingerprint = model_files_fingerprint()
+model_registry, scaler, le = get_model_registry(models_fingerprint)
+
+# -------------------- Prediction Service (opt-in) --------------------
+# With CROPIFY_PREDICTION_URL set (e.g. http://127.0.0.1:8765), predictions
+# and what-if sweeps come from prediction_server.py and no model is loaded
+# in this process. Falls back to the local models if the service is down.
+PREDICTION_URL = os.getenv("CROPIFY_PREDICTION_URL")
+
+@st.cache_resource
+def get_prediction_client(url):
+    """Keep-alive client shared by every session"""
+    return PredictionClient(url)
+
+prediction_client, service_health = None, None
+if PREDICTION_URL:
+    prediction_client = get_prediction_client(PREDICTION_URL)
+    try:
+        service_health = prediction_client.health()
+    except (OSError, ValueError) as e:
+        st.sidebar.warning(f"Prediction service at {PREDICTION_URL} is unavailable ({e}); using local models.")
+        prediction_client = None
 
-# Clear loading message
-loading_placeholder.empty()
+def service_predict(features, model_name, **options):
+    """One prediction from the service; a failure ends this run with an error message"""
+    try:
+        return prediction_client.predict(features, model=model_name, **options)
+    except (OSError, ValueError) as e:
+        st.error(f"Prediction service error: {e}")
+        st.stop()
 
-if not models:
+model_names = service_health["models"] if service_health else model_registry.names()
+if not model_names:
     st.error("No ML models were found. Please make sure the .pkl files are in the main project directory.")
     st.stop()
+if not ModelBundle.exists(BUNDLE_PATH) and prediction_client is None:
+    for name, path in model_paths.items():
+        if not os.path.exists(path):
+            st.sidebar.error(f"Model not found: {path}")
 
-# Load Scaler and Label Encoder
-scaler = joblib.load(r"scaler.pkl") if os.path.exists(r"scaler.pkl") else None
-le = joblib.load(r"label_encoder.pkl") if os.path.exists(r"label_encoder.pkl") else None
+# Consensus of every model by weighted soft voting (see ensemble.py)
+ENSEMBLE_OPTION = "Ensemble (all models)"
+ENSEMBLE_WEIGHTS = parse_weights(os.getenv("CROPIFY_ENSEMBLE_WEIGHTS"))
 
-selected_model = st.sidebar.selectbox("ML Model", list(models.keys()))
-model = models[selected_model]
+selected_model = st.sidebar.selectbox("ML Model", model_names + [ENSEMBLE_OPTION])
+
+model, ensemble_models = None, None
+if prediction_client is not None:
+    st.sidebar.caption(f"🛰️ Predictions served by {PREDICTION_URL} ({service_health['engine']} engine)")
+else:
+    # Show loading message (only the first use of a model actually loads it)
+    loading_placeholder = st.sidebar.empty()
+    loading_placeholder.info("🔄 Loading machine learning models...")
+    with timing.stage('model_load'):
+        if selected_model == ENSEMBLE_OPTION:
+            ensemble_models = {name: model_registry.get(name) for name in model_registry.names()}
+        else:
+            model = model_registry.get(selected_model)
+    # Clear loading message
+    loading_placeholder.empty()
+
+# -------------------- Prediction Cache --------------------
+@st.cache_resource
+def get_prediction_cache():
+    """Memo of recent predictions shared by all sessions (optionally persisted)"""
+    return PredictionCache(maxsize=10000, path=os.getenv("CROPIFY_PREDICTION_CACHE"), autosave_every=50)
+
+prediction_cache = get_prediction_cache()
+# Model identity for cache keys changes whenever the model files are rebuilt
+if prediction_client is not None:
+    model_key = f"{selected_model}@{PREDICTION_URL}/{service_health['fingerprint']}"
+else:
+    model_key = f"{selected_model}@{models_fingerprint}"
+if selected_model == ENSEMBLE_OPTION:
+    model_key += f"|{sorted(ENSEMBLE_WEIGHTS.items())}"
+
+# -------------------- Micro-Batching (opt-in) --------------------
+# With CROPIFY_MICRO_BATCH_MS set, concurrent sessions' single predictions
+# are scored together in one vectorized pass (see micro_batching.py)
+MICRO_BATCH_MS = os.getenv("CROPIFY_MICRO_BATCH_MS")
+
+@st.cache_resource(max_entries=1)
+def get_micro_batcher(max_wait_ms, files_fingerprint, _scaler, _le):
+    """One dispatcher per server process and build of the model files, shared by every session"""
+    return MicroBatcher(_scaler, _le, max_wait_ms=max_wait_ms)
+
+micro_batcher = None
+if MICRO_BATCH_MS is not None and prediction_client is None:
+    micro_batcher = get_micro_batcher(float(MICRO_BATCH_MS), models_fingerprint, scaler, le)
+
+# -------------------- Nearest Known Samples --------------------
+# The labelled training rows closest to the input (see neighbour_index.py),
+# shown as evidence next to every prediction once the index is built
+NEIGHBOUR_INDEX_PATH = os.getenv("CROPIFY_NEIGHBOUR_INDEX", "neighbour_index")
+NEIGHBOURS_SHOWN = 5
+
+@st.cache_resource
+def get_neighbour_index(path, manifest_mtime):
+    """KD-tree arrays, memory-mapped once per build of the index"""
+    return NeighbourIndex(path)
+
+neighbour_index = None
+if NeighbourIndex.exists(NEIGHBOUR_INDEX_PATH):
+    neighbour_index = get_neighbour_index(
+        NEIGHBOUR_INDEX_PATH, os.path.getmtime(os.path.join(NEIGHBOUR_INDEX_PATH, "manifest.json")))
+    if neighbour_index.is_stale():
+        st.sidebar.warning("Nearest-sample index is out of date; rebuild it with neighbour_index.py --build.")
+        neighbour_index = None
+
+# -------------------- Decision Maps (opt-in) --------------------
+# Precomputed per-model answers over the slider domain (see decision_map.py).
+# Approximate within a grid cell, so only used when CROPIFY_DECISION_MAP
+# points at a map built from the current models.
+DECISION_MAP_PATH = os.getenv("CROPIFY_DECISION_MAP")
+
+@st.cache_resource
+def get_decision_map(path, manifest_mtime):
+    """Decision map tables, memory-mapped once per build of the map"""
+    return DecisionMap(path)
+
+decision_map = None
+if (DECISION_MAP_PATH and DecisionMap.exists(DECISION_MAP_PATH) and selected_model != ENSEMBLE_OPTION
+        and prediction_client is None):
+    decision_map = get_decision_map(DECISION_MAP_PATH, os.path.getmtime(os.path.join(DECISION_MAP_PATH, "manifest.json")))
+    if decision_map.is_stale() or selected_model not in decision_map.model_names():
+        st.sidebar.warning("Decision map is out of date for this model; using the live model.")
+        decision_map = None
+    else:
+        model_key += "|map"
+
+with st.sidebar.expander("📦 Model Cache"):
+    registry_stats = model_registry.stats()
+    st.dataframe(pd.DataFrame([
+        {
+            "Model": name,
+            "Loaded": stats["loaded"],
+            "Size (MB)": round(stats["bytes"] / 1024 / 1024, 2) if stats["bytes"] else None,
+            "Loads": stats["loads"],
+            "Hits": stats["hits"],
+            "Evictions": stats["evictions"],
+            "Load (ms)": round(stats["load_seconds"] * 1000, 1) if stats["load_seconds"] else None
+        }
+        for name, stats in registry_stats.items()
+    ]), hide_index=True)
+    budget_text = f"{MODEL_MEMORY_BUDGET_MB} MB" if MODEL_MEMORY_BUDGET_MB else "unlimited"
+    st.caption(f"Loaded: {model_registry.loaded_bytes() / 1024 / 1024:.2f} MB / budget {budget_text}")
+    cache_stats = prediction_cache.stats()
+    st.caption(f"Prediction cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+               f"{cache_stats['size']} of {cache_stats['maxsize']} entries")
+    if micro_batcher is not None:
+        batch_stats = micro_batcher.stats()
+        if batch_stats['batches']:
+            st.caption(f"Micro-batching: {batch_stats['rows']} predictions in {batch_stats['batches']} batches "
+                       f"(mean size {batch_stats['mean_batch_size']:.1f}, "
+                       f"mean wait {batch_stats['mean_wait_ms']:.2f} ms)")
+
+# -------------------- What-if Sweeps --------------------
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_sweep(model_key, features, sweep_features, _models, _scaler, _le, weights):
+    """Sensitivity sweep (one batched predict_proba per model) and its drawing"""
+    if len(sweep_features) == 1:
+        result = sweep_1d(list(features), sweep_features[0], _models, _scaler, _le, weights=weights)
+    else:
+        result = sweep_2d(list(features), *sweep_features, _models, _scaler, _le, weights=weights)
+    return result, render_sweep(result)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_remote_sweep(model_key, features, sweep_features, model_name, weights, _client):
+    """Sensitivity sweep computed by the prediction service, drawn here"""
+    result = from_json(_client.sweep(list(features), sweep_features, model=model_name, weights=weights))
+    return result, render_sweep(result)
 
 # ------------------- Tabs Section ----------------------
 tab1, tab2, tab3 = st.tabs([language["title"], " DATA ANALYSIS", "WORK FLOW MODELS"])
@@ -414,43 +552,112 @@ with tab1:
         st.markdown('</div>', unsafe_allow_html=True)
 
     if submitted:
-        # Create a DataFrame with proper column names to avoid feature name warnings
-        feature_names = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
-        input_data = pd.DataFrame([[nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall]], 
-                                  columns=feature_names)
+        features = [nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall]
+        # Kept for the what-if panel, which reruns the script without the form
+        st.session_state['last_features'] = features
+        # A cache hit skips scaling, inference and label decoding entirely
+        prediction = prediction_cache.get(model_key, features)
+        ensemble_result = None
+        if selected_model == ENSEMBLE_OPTION:
+            # Cached ensemble entries hold the full result (top-k and votes)
+            ensemble_result = prediction
+            if ensemble_result is None and prediction_client is not None:
+                with timing.stage('service'):
+                    ensemble_result = service_predict(features, ENSEMBLE_MODEL, weights=ENSEMBLE_WEIGHTS)
+                prediction_cache.put(model_key, features, ensemble_result)
+            elif ensemble_result is None:
+                input_data = pd.DataFrame([features], columns=['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall'])
+                with timing.stage('ensemble'):
+                    ensemble_result = predict_ensemble(input_data, ensemble_models, scaler, le, weights=ENSEMBLE_WEIGHTS)
+                prediction_cache.put(model_key, features, ensemble_result)
+            prediction = ensemble_result['crop']
+        elif prediction is None and prediction_client is not None:
+            with timing.stage('service'):
+                prediction = service_predict(features, selected_model)['crop']
+            prediction_cache.put(model_key, features, prediction)
+        elif prediction is None:
+            # O(1) table answer when a decision map is enabled (None outside the domain)
+            if decision_map is not None:
+                with timing.stage('decision_map'):
+                    hit = decision_map.lookup(selected_model, features)
+                prediction = hit[0] if hit is not None else None
+
+        if prediction is None and micro_batcher is not None:
+            # Scored in one pass together with other sessions' concurrent predictions
+            with timing.stage('micro_batch'):
+                prediction = micro_batcher.predict(model, features)['crop']
+            prediction_cache.put(model_key, features, prediction)
+
+        if prediction is None:
+            # Create a DataFrame with proper column names to avoid feature name warnings
+            feature_names = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+            input_data = pd.DataFrame([features], columns=feature_names)
         
-        # Scale the data if scaler is available
-        if scaler:
-            input_data_scaled = scaler.transform(input_data)
-        else:
-            input_data_scaled = input_data
+            # Scale the data if scaler is available
+            if scaler:
+                with timing.stage('scale'):
+                    input_data_scaled = scaler.transform(input_data)
+            else:
+                input_data_scaled = input_data
 
-        prediction_encoded = model.predict(input_data_scaled)[0]
+            with timing.stage('infer'):
+                prediction_encoded = model.predict(input_data_scaled)[0]
         
-        # Decode the prediction if label encoder is available
-        if le:
-            prediction = le.inverse_transform([prediction_encoded])[0]
-        else:
-            prediction = str(prediction_encoded)
-            
+            # Decode the prediction if label encoder is available
+            with timing.stage('decode'):
+                if le:
+                    prediction = str(le.inverse_transform([prediction_encoded])[0])
+                else:
+                    prediction = str(prediction_encoded)
+            prediction_cache.put(model_key, features, prediction)
+
         crop_lower = prediction.lower()
 
         st.success(f"✅ {language['predict_crop']} using {selected_model}: **{prediction.capitalize()}**")
 
-        if crop_lower in crop_info:
-            crop_data = crop_info[crop_lower]
-            crop_img_path = crop_data.get("image", "assets/Rice.jpg")
+        if ensemble_result:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**🏆 Top Alternatives**")
+                st.dataframe(pd.DataFrame([
+                    {"Crop": alt["crop"].capitalize(), "Probability": f"{alt['probability'] * 100:.1f}%"}
+                    for alt in ensemble_result["top_k"]
+                ]), hide_index=True)
+            with col2:
+                st.markdown("**🗳️ Model Votes**")
+                st.dataframe(pd.DataFrame([
+                    {"Model": name, "Vote": vote["crop"].capitalize(),
+                     "Confidence": f"{vote['confidence'] * 100:.1f}%", "Weight": vote["weight"]}
+                    for name, vote in ensemble_result["votes"].items()
+                ]), hide_index=True)
+
+        if neighbour_index is not None:
+            with timing.stage('neighbours'):
+                neighbours = neighbour_index.nearest(features, NEIGHBOURS_SHOWN)
+            with st.expander("🔎 Most similar known fields", expanded=False):
+                st.dataframe(pd.DataFrame([
+                    {"Crop": neighbour["crop"].capitalize(), "Distance": round(neighbour["distance"], 3),
+                     **{name: round(value, 2) for name, value in neighbour["features"].items()}}
+                    for neighbour in neighbours
+                ]), hide_index=True)
+                st.caption(f"Closest of {len(neighbour_index)} labelled samples in the training data "
+                           "(distance in standardized units).")
+
+        # Sections already resolved for this language (English fallback included)
+        crop_data = content_store.get(crop_lower, selected_language)
+        if crop_data is not None:
+            crop_img_path = crop_data["image"]
             
             # Use fallback image if specific one doesn't exist
             if not os.path.exists(crop_img_path):
                 crop_img_path = r"assets/Rice.jpg"
                 
-            st.image(crop_img_path, width=400, caption=f"{prediction.capitalize()}")
+            with timing.stage('image_render'):
+                st.image(asset_image(crop_lower, crop_img_path), width=400, caption=f"{prediction.capitalize()}")
 
-            # Fetch translations with fallback to English
-            fact = crop_data.get("facts", {}).get(selected_language, crop_data.get("facts", {}).get("English", "No facts available."))
-            tip = crop_data.get("tips", {}).get(selected_language, crop_data.get("tips", {}).get("English", "No tips available."))
-            suggestion = crop_data.get("suggestions", {}).get(selected_language, crop_data.get("suggestions", {}).get("English", "No suggestions available."))
+            fact = crop_data["facts"]
+            tip = crop_data["tips"]
+            suggestion = crop_data["suggestions"]
 
             st.markdown('<div class="section-card">', unsafe_allow_html=True)
             st.subheader(f"🌟 {language['facts']}")
@@ -465,7 +672,62 @@ with tab1:
         else:
             st.warning(f"🔍 Info about {prediction.capitalize()} is not available in the database yet!")
 
+    # ---------------- What-if Sensitivity ----------------
+    if 'last_features' in st.session_state:
+        with st.expander("🔍 What-if: how far can the inputs move before the crop changes?"):
+            last_features = tuple(st.session_state['last_features'])
+            col1, col2 = st.columns(2)
+            with col1:
+                sweep_x = st.selectbox("Feature to sweep", FEATURE_NAMES, key='sweep_x')
+            with col2:
+                sweep_y = st.selectbox("Second feature (2-D map)", ["None"] + [name for name in FEATURE_NAMES if name != sweep_x],
+                                       key='sweep_y')
+            sweep_features = (sweep_x,) if sweep_y == "None" else (sweep_x, sweep_y)
+            if selected_model == ENSEMBLE_OPTION:
+                sweep_models, sweep_weights = ensemble_models, ENSEMBLE_WEIGHTS
+            else:
+                sweep_models, sweep_weights = {selected_model: model}, None
+            with timing.stage('sensitivity'):
+                if prediction_client is not None:
+                    sweep_model = ENSEMBLE_MODEL if selected_model == ENSEMBLE_OPTION else selected_model
+                    sweep, sweep_png = cached_remote_sweep(model_key, last_features, sweep_features, sweep_model,
+                                                           sweep_weights, prediction_client)
+                else:
+                    sweep, sweep_png = cached_sweep(model_key, last_features, sweep_features, sweep_models, scaler, le, sweep_weights)
+            st.image(sweep_png)
+            current_crop = sweep['current_crop'].capitalize()
+            if len(sweep_features) == 1:
+                low, high = sweep['stable_range']
+                st.caption(f"{current_crop} stays recommended for {sweep_x} from {low:.2f} to {high:.2f} "
+                           f"(current: {sweep['current']:.2f}), other inputs unchanged. "
+                           f"{sweep['points']} points scored in {sweep['elapsed_ms']:.0f} ms.")
+            else:
+                share = sweep['share'].get(sweep['current_crop'], 0.0)
+                st.caption(f"{current_crop} covers {share * 100:.0f}% of the {sweep_x} × {sweep_y} map "
+                           f"(✖ = current input). {sweep['points']} points scored in {sweep['elapsed_ms']:.0f} ms.")
+
 # ---------------- Data Analysis Tab ------------------
+# Rows parsed per chunk when analysing an upload
+ANALYSIS_CHUNKSIZE = int(os.getenv("CROPIFY_ANALYSIS_CHUNKSIZE", "50000"))
+
+@st.cache_resource
+def get_render_cache():
+    """Rendered heatmap PNGs shared by all sessions (optionally kept on disk)"""
+    return RenderCache(max_bytes=64 * 1024 * 1024, directory=os.getenv("CROPIFY_RENDER_CACHE_DIR"))
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def analyze_upload(content_digest, _file):
+    """Streaming analysis of an upload, computed once per distinct file content"""
+    return analyze_csv(_file, chunksize=ANALYSIS_CHUNKSIZE, random_state=0)
+
+def upload_digest(file):
+    """Content hash of an upload, computed once per upload and session"""
+    digests = st.session_state.setdefault("upload_digests", {})
+    file_id = getattr(file, "file_id", None) or file.name
+    if file_id not in digests:
+        digests[file_id] = file_digest(file)
+    return digests[file_id]
+
 with tab2:
     st.markdown('<div class="section-card">', unsafe_allow_html=True)
     st.subheader("📤 Upload Dataset for Correlation Analysis")
@@ -474,20 +736,28 @@ with tab2:
 
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file)
-            st.success("✅ File uploaded successfully!")
-            st.write("🔍 Data Preview:", df.head())
-
-            numeric_df = df.select_dtypes(include=[np.number])
-            if numeric_df.empty:
+            # Streamed in chunks: memory use does not depend on the file size
+            content_digest = upload_digest(uploaded_file)
+            with timing.stage('analysis'):
+                analysis = analyze_upload(content_digest, uploaded_file)
+            st.success(f"✅ File uploaded successfully! ({analysis.rows:,} rows)")
+            st.write("🔍 Data Preview:", analysis.head)
+
+            with st.expander("📋 Column Summary"):
+                st.dataframe(analysis.summary(), hide_index=True)
+            with st.expander("🎲 Random Sample"):
+                st.dataframe(analysis.sample(), hide_index=True)
+
+            if not analysis.numeric_columns():
                 st.warning("⚠️ No numeric columns found for correlation analysis.")
             else:
-                corr = numeric_df.corr()
+                corr = analysis.correlation()
 
                 st.subheader("🧩 Feature Correlation Heatmap")
-                fig, ax = plt.subplots(figsize=(10, 7))
-                sns.heatmap(corr, annot=True, cmap="coolwarm", fmt=".2f", linewidths=0.5, ax=ax)
-                st.pyplot(fig)
+                # matplotlib/seaborn are only imported on a cache miss
+                with timing.stage('heatmap'):
+                    heatmap_png, _ = get_render_cache().heatmap(content_digest, corr)
+                st.image(heatmap_png)
         except pd.errors.EmptyDataError:
             st.error("⚠️ The uploaded file is empty. Please upload a valid CSV.")
         except Exception as e:
@@ -518,16 +788,34 @@ with tab3:
     with col1:
         if os.path.exists(work_diagram_path):
             # Display image with better resolution while maintaining aspect ratio
-            st.image(work_diagram_path, caption="Model Workflow", width='stretch')
+            st.image(asset_image("work_diagram", work_diagram_path), caption="Model Workflow", width='stretch')
         else:
             st.info("Workflow diagram not available.")
 
     with col2:
         if os.path.exists(chart_diagram_path):
             # Display image with better resolution while maintaining aspect ratio
-            st.image(chart_diagram_path, caption="Systematic Workflow", width='stretch')
+            st.image(asset_image("chart_diagram", chart_diagram_path), caption="Systematic Workflow", width='stretch')
         else:
             st.info("Systematic workflow diagram not available.")
 
     st.markdown('</div>', unsafe_allow_html=True)
-    
\ No newline at end of file
+    
+
+# ------------------ Timings (admin only) -----------------
+page_timing = timing.end_request()
+if st.session_state.get('username') == 'admin' and st.sidebar.checkbox("⏱️ Show timings", value=False):
+    with st.sidebar.expander("⏱️ Stage Timings", expanded=True):
+        st.caption(f"This run: {page_timing['wall_ms']:.1f} ms wall / {page_timing['cpu_ms']:.1f} ms CPU "
+                   "(before this panel)")
+        st.dataframe(pd.DataFrame([
+            {"Stage": s["stage"], "Wall (ms)": round(s["wall_ms"], 2), "CPU (ms)": round(s["cpu_ms"], 2)}
+            for s in page_timing["stages"]
+        ]), hide_index=True)
+        st.caption("Rolling (last 1000 per stage, all sessions)")
+        st.dataframe(pd.DataFrame([
+            {"Stage": name, "Count": stats["count"], "p50 (ms)": round(stats["p50_ms"], 2),
+             "p90 (ms)": round(stats["p90_ms"], 2), "p99 (ms)": round(stats["p99_ms"], 2),
+             "Max (ms)": round(stats["max_ms"], 2)}
+            for name, stats in timing.histograms.summary().items()
+        ]), hide_index=True)
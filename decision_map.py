@@ -0,0 +1,333 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import threading
+import numpy as np
+
+from predict import FEATURE_NAMES
+
+# =============================================================================
+# decision_map.py - Precomputed Decision Maps over the Slider Domain
+# The cropii.py sliders bound every feature, so each model's answer can be
+# tabulated ahead of time: the domain is cut into a grid of cells and the
+# predicted class (uint8) and confidence (float16) at every cell centre are
+# stored as memory-mapped .npy arrays. A lookup is a few index computations;
+# inputs outside the domain go to the live model. The table is approximate
+# inside a cell, so each build reports how often it disagrees with the model.
+# =============================================================================
+
+MAP_PATH = 'decision_maps'
+MAP_VERSION = 1
+
+# Slider ranges in cropii.py, in FEATURE_NAMES order
+SLIDER_DOMAIN = {
+    'N': (0.0, 140.0),
+    'P': (0.0, 140.0),
+    'K': (0.0, 200.0),
+    'temperature': (10.0, 45.0),
+    'humidity': (10.0, 100.0),
+    'ph': (3.5, 9.0),
+    'rainfall': (0.0, 400.0)
+}
+# Cells per feature; 8^7 = 2.1M cells = 2 MB of classes + 4 MB of confidences per model
+DEFAULT_BINS = 8
+
+def parse_bins(spec):
+    """
+    Cells per feature from "8" (every feature) or "N=10,P=10,ph=12" (the rest default)
+
+    Returns:
+        dict: feature name -> number of cells
+    """
+    bins = {name: DEFAULT_BINS for name in FEATURE_NAMES}
+    if not spec:
+        return bins
+    spec = str(spec)
+    if '=' not in spec:
+        return {name: int(spec) for name in FEATURE_NAMES}
+    for part in spec.split(','):
+        name, value = part.split('=')
+        if name.strip() not in bins:
+            raise ValueError(f"Unknown feature '{name.strip()}' in bins spec")
+        bins[name.strip()] = int(value)
+    return bins
+
+def _slug(name):
+    return '_'.join(name.lower().split())
+
+def _cell_centres(start, stop, shape, low, width):
+    """Raw feature values at the centres of flat cells [start, stop)"""
+    index = np.unravel_index(np.arange(start, stop), shape)
+    return np.column_stack([low[i] + (index[i] + 0.5) * width[i] for i in range(len(shape))])
+
+def _model_sources(engine):
+    """Files whose mtime/size identify the models a map was built from"""
+    from model_bundle import BUNDLE_PATH, MODEL_PATHS
+    if engine == 'bundle':
+        return [os.path.join(BUNDLE_PATH, 'manifest.json')]
+    return list(MODEL_PATHS.values()) + ['scaler.pkl', 'label_encoder.pkl']
+
+def _fingerprints(paths):
+    from prediction_cache import model_fingerprint
+    return {path: model_fingerprint(path, path) for path in paths if os.path.exists(path)}
+
+def build_decision_maps(output_dir=MAP_PATH, bins=None, engine=None, model_names=None,
+                        batch_size=65536, report_samples=20000):
+    """
+    Tabulate every model over the slider domain
+
+    Cell centres are generated and scored in batches of batch_size rows, and
+    written straight into the memory-mapped output arrays. The manifest is
+    written last, so an interrupted build is never picked up.
+
+    Args:
+        output_dir: Directory for the tables (replaced if it exists)
+        bins: Feature name -> number of cells (default: DEFAULT_BINS each)
+        engine: 'bundle' or 'sklearn' (default: bundle if exported, else sklearn)
+        model_names: Subset of models to tabulate (default: all)
+        batch_size: Rows per vectorized predict_proba call
+        report_samples: Uniform samples for the disagreement report (0 = no report)
+
+    Returns:
+        dict: The manifest that was written
+    """
+    from model_bundle import ModelBundle
+    from predict import load_ensemble_models
+
+    engine = engine or ('bundle' if ModelBundle.exists() else 'sklearn')
+    models, scaler, label_encoder = load_ensemble_models(engine)
+    if model_names:
+        models = {name: models[name] for name in model_names}
+    labels = np.asarray(label_encoder.classes_).astype(str)
+    if len(labels) > 256:
+        raise ValueError(f"{len(labels)} classes do not fit in uint8 class tables")
+
+    bins = dict(parse_bins(None), **(bins or {}))
+    shape = tuple(bins[name] for name in FEATURE_NAMES)
+    low = np.array([SLIDER_DOMAIN[name][0] for name in FEATURE_NAMES])
+    high = np.array([SLIDER_DOMAIN[name][1] for name in FEATURE_NAMES])
+    width = (high - low) / np.array(shape)
+    cells = int(np.prod(shape))
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    manifest = {
+        'format_version': MAP_VERSION,
+        'engine': engine,
+        'feature_names': FEATURE_NAMES,
+        'domain': {name: list(SLIDER_DOMAIN[name]) for name in FEATURE_NAMES},
+        'bins': bins,
+        'labels': labels.tolist(),
+        'models': {},
+        'sources': _fingerprints(_model_sources(engine))
+    }
+    for name, model in models.items():
+        slug = _slug(name)
+        classes = np.lib.format.open_memmap(os.path.join(output_dir, f'{slug}.classes.npy'),
+                                            mode='w+', dtype=np.uint8, shape=shape)
+        confidence = np.lib.format.open_memmap(os.path.join(output_dir, f'{slug}.confidence.npy'),
+                                               mode='w+', dtype=np.float16, shape=shape)
+        flat_classes, flat_confidence = classes.reshape(-1), confidence.reshape(-1)
+        model_classes = np.asarray(model.classes_)
+        for start in range(0, cells, batch_size):
+            stop = min(start + batch_size, cells)
+            probabilities = model.predict_proba(scaler.transform(_cell_centres(start, stop, shape, low, width)))
+            best = probabilities.argmax(axis=1)
+            # Encoded label (index into label_encoder.classes_) of the argmax
+            flat_classes[start:stop] = model_classes[best]
+            flat_confidence[start:stop] = probabilities[np.arange(len(best)), best]
+        classes.flush()
+        confidence.flush()
+        del classes, confidence, flat_classes, flat_confidence
+        manifest['models'][name] = {'path': slug, 'bytes': cells * 3}
+
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    if report_samples:
+        manifest['report'] = disagreement_report(DecisionMap(output_dir), models, scaler, label_encoder,
+                                                 n_samples=report_samples)
+        with open(os.path.join(output_dir, 'manifest.json'), 'w') as file:
+            json.dump(manifest, file, indent=2)
+    return manifest
+
+class DecisionMap:
+    """
+    O(1) lookups in precomputed decision maps
+
+    Opening a map only reads manifest.json; each model's tables are
+    memory-mapped on first use and shared between processes.
+
+    Args:
+        path: Directory written by build_decision_maps()
+    """
+
+    def __init__(self, path=MAP_PATH):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), 'r') as file:
+            self.manifest = json.load(file)
+        if self.manifest['format_version'] != MAP_VERSION:
+            raise ValueError(f"Unsupported decision map version {self.manifest['format_version']} in {path}")
+        names = self.manifest['feature_names']
+        self.shape = tuple(self.manifest['bins'][name] for name in names)
+        self.low = np.array([self.manifest['domain'][name][0] for name in names])
+        self.high = np.array([self.manifest['domain'][name][1] for name in names])
+        self.scale = np.array(self.shape) / (self.high - self.low)
+        self.labels = np.asarray(self.manifest['labels'])
+        # Plain floats for the scalar path (no per-call numpy dispatch)
+        self._bounds = list(zip(self.low.tolist(), self.high.tolist(), self.scale.tolist(), self.shape))
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def exists(path=MAP_PATH):
+        return os.path.exists(os.path.join(path, 'manifest.json'))
+
+    def model_names(self):
+        return list(self.manifest['models'])
+
+    def is_stale(self):
+        """True if the models changed (or vanished) since the map was built"""
+        return _fingerprints(self.manifest['sources']) != self.manifest['sources']
+
+    def _table(self, name):
+        tables = self._tables.get(name)
+        if tables is None:
+            with self._lock:
+                slug = self.manifest['models'][name]['path']
+                tables = self._tables[name] = (
+                    np.load(os.path.join(self.path, f'{slug}.classes.npy'), mmap_mode='r'),
+                    np.load(os.path.join(self.path, f'{slug}.confidence.npy'), mmap_mode='r')
+                )
+        return tables
+
+    def cell(self, features):
+        """Cell index tuple of one input, or None if it is outside the domain"""
+        index = []
+        for value, (low, high, scale, size) in zip(features, self._bounds):
+            value = float(value)
+            # Also rejects NaN
+            if not low <= value <= high:
+                return None
+            index.append(min(int((value - low) * scale), size - 1))
+        return tuple(index)
+
+    def lookup(self, name, features):
+        """
+        Table answer for one input in FEATURE_NAMES order
+
+        Returns:
+            tuple: (crop, confidence), or None if the input is off the grid
+        """
+        index = self.cell(features)
+        if index is None:
+            return None
+        classes, confidence = self._table(name)
+        return str(self.labels[classes[index]]), float(confidence[index])
+
+    def lookup_batch(self, name, X):
+        """
+        Table answers for an (n, 7) array
+
+        Returns:
+            tuple: (crops, confidences, on_grid); rows where on_grid is False
+            hold placeholders and need the live model
+        """
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(self.shape))
+        with np.errstate(invalid='ignore'):
+            on_grid = ((X >= self.low) & (X <= self.high)).all(axis=1)
+        index = ((np.where(on_grid[:, None], X, self.low) - self.low) * self.scale).astype(np.intp)
+        np.minimum(index, np.array(self.shape) - 1, out=index)
+        classes, confidence = self._table(name)
+        flat = np.ravel_multi_index(tuple(index.T), self.shape)
+        return (self.labels[classes.reshape(-1)[flat]], confidence.reshape(-1)[flat].astype(np.float64), on_grid)
+
+def predict_with_map(decision_map, name, features, model, scaler, label_encoder):
+    """
+    One prediction from the table, or from the live model if off the grid
+
+    Returns:
+        dict: 'crop', 'confidence' and 'source' ('map' or 'model')
+    """
+    hit = decision_map.lookup(name, features)
+    if hit is not None:
+        return {'crop': hit[0], 'confidence': hit[1], 'source': 'map'}
+    probabilities = model.predict_proba(scaler.transform(np.asarray([features], dtype=np.float64)))[0]
+    best = int(probabilities.argmax())
+    crop = label_encoder.inverse_transform([np.asarray(model.classes_)[best]])[0]
+    return {'crop': str(crop), 'confidence': float(probabilities[best]), 'source': 'model'}
+
+def disagreement_report(decision_map, models, scaler, label_encoder, n_samples=20000,
+                        csv_path='csv/Crop_recommendation.csv', seed=0):
+    """
+    How often each table disagrees with its live model
+
+    Measured on n_samples points drawn uniformly from the domain and on the
+    in-domain rows of the training CSV (the inputs that actually matter).
+
+    Returns:
+        dict: per model, disagreement rates and mean |confidence delta|
+    """
+    rng = np.random.default_rng(seed)
+    samples = {'uniform': decision_map.low + rng.random((n_samples, len(decision_map.shape))) *
+                          (decision_map.high - decision_map.low)}
+    if csv_path and os.path.exists(csv_path):
+        import pandas as pd
+        samples['dataset'] = pd.read_csv(csv_path)[FEATURE_NAMES].to_numpy(dtype=np.float64)
+
+    report = {}
+    for name, model in models.items():
+        if name not in decision_map.manifest['models']:
+            continue
+        report[name] = {}
+        for kind, X in samples.items():
+            crops, confidences, on_grid = decision_map.lookup_batch(name, X)
+            X_on = X[on_grid]
+            probabilities = model.predict_proba(scaler.transform(X_on))
+            best = probabilities.argmax(axis=1)
+            live = np.asarray(label_encoder.inverse_transform(np.asarray(model.classes_)[best])).astype(str)
+            report[name][kind] = {
+                'rows': int(on_grid.sum()),
+                'off_grid': int((~on_grid).sum()),
+                'disagreement': float((crops[on_grid] != live).mean()) if len(X_on) else None,
+                'mean_abs_confidence_delta': float(np.abs(
+                    confidences[on_grid] - probabilities[np.arange(len(best)), best]).mean()) if len(X_on) else None
+            }
+    return report
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Build and check decision-map lookup tables")
+    parser.add_argument('--build', action='store_true', help="Tabulate the models over the slider domain")
+    parser.add_argument('--report', action='store_true', help="Disagreement of an existing map with the live models")
+    parser.add_argument('--lookup', nargs=7, type=float, metavar='X', help="Table answer for N P K temp hum ph rainfall")
+    parser.add_argument('--path', default=MAP_PATH)
+    parser.add_argument('--bins', help=f"Cells per feature: '10' or 'N=10,ph=12' (default: {DEFAULT_BINS})")
+    parser.add_argument('--engine', choices=['bundle', 'sklearn'])
+    parser.add_argument('--models', nargs='+', metavar='NAME')
+    parser.add_argument('--samples', type=int, default=20000, help="Uniform samples in the report")
+    args = parser.parse_args(argv)
+
+    if args.build:
+        manifest = build_decision_maps(args.path, parse_bins(args.bins), args.engine, args.models,
+                                       report_samples=args.samples)
+        print(json.dumps({'written': args.path, 'bins': manifest['bins'], 'models': manifest['models'],
+                          'report': manifest.get('report')}))
+    elif args.report:
+        from predict import load_ensemble_models
+        decision_map = DecisionMap(args.path)
+        models, scaler, label_encoder = load_ensemble_models(decision_map.manifest['engine'])
+        report = disagreement_report(decision_map, models, scaler, label_encoder, n_samples=args.samples)
+        print(json.dumps({'stale': decision_map.is_stale(), 'report': report}))
+    elif args.lookup:
+        decision_map = DecisionMap(args.path)
+        print(json.dumps({name: decision_map.lookup(name, args.lookup) for name in args.models or decision_map.model_names()}))
+    else:
+        parser.print_usage()
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
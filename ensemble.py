@@ -0,0 +1,120 @@
+import os
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# =============================================================================
+# ensemble.py - One-Pass Ensemble Prediction
+# Scales the input once, gets predict_proba from every model concurrently in a
+# thread pool (NumPy and sklearn's tree code release the GIL) and combines the
+# probabilities by weighted soft voting.
+# =============================================================================
+
+_executor = None
+
+def _get_executor():
+    """Shared pool, created on first use; one thread per model is enough"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) + 4),
+                                       thread_name_prefix="ensemble")
+    return _executor
+
+def parse_weights(text):
+    """
+    Parse 'Random Forest=2,MLP=1' into {'Random Forest': 2.0, 'MLP': 1.0}
+
+    Models that are not listed keep the default weight of 1.
+    """
+    weights = {}
+    for part in (text or "").split(','):
+        if not part.strip():
+            continue
+        name, _, value = part.rpartition('=')
+        if not name:
+            raise ValueError(f"Invalid weight '{part}'. Expected: Model Name=weight")
+        weights[name.strip()] = float(value)
+    return weights
+
+def _aligned_proba(model, X, n_classes):
+    """predict_proba with columns placed by the model's encoded classes_"""
+    proba = model.predict_proba(X)
+    if proba.shape[1] == n_classes:
+        return proba
+    aligned = np.zeros((len(proba), n_classes))
+    aligned[:, np.asarray(model.classes_, dtype=np.intp)] = proba
+    return aligned
+
+def ensemble_proba(X_scaled, models, n_classes, weights=None):
+    """
+    Weighted soft vote over already-scaled inputs
+
+    Args:
+        X_scaled: (n, 7) scaled feature matrix
+        models: Model name -> fitted classifier with predict_proba
+        n_classes: Number of encoded classes (len(label_encoder.classes_))
+        weights: Model name -> vote weight (missing names weigh 1)
+
+    Returns:
+        tuple: (combined (n, n_classes) probabilities, {name: per-model probabilities},
+                {name: seconds spent in that model})
+    """
+    weights = weights or {}
+
+    def run(name, model):
+        start = time.perf_counter()
+        proba = _aligned_proba(model, X_scaled, n_classes)
+        return proba, time.perf_counter() - start
+
+    futures = {name: _get_executor().submit(run, name, model) for name, model in models.items()}
+    per_model, timings = {}, {}
+    for name, future in futures.items():
+        per_model[name], timings[name] = future.result()
+
+    total_weight = sum(weights.get(name, 1.0) for name in per_model)
+    if total_weight <= 0:
+        raise ValueError("Ensemble weights must sum to a positive number")
+    combined = sum(weights.get(name, 1.0) * proba for name, proba in per_model.items()) / total_weight
+    return combined, per_model, timings
+
+def predict_ensemble(features, models, scaler, label_encoder, weights=None, top_k=3):
+    """
+    Consensus crop from every model for one sample
+
+    Args:
+        features: 7 values in FEATURE_NAMES order, or a one-row DataFrame
+        models: Model name -> fitted classifier
+        scaler: Scaler shared by all models (applied once)
+        label_encoder: Label encoder shared by all models
+        weights: Model name -> vote weight (missing names weigh 1)
+        top_k: Number of alternatives to return
+
+    Returns:
+        dict: Winning crop and confidence, the top-k crops and each model's vote
+    """
+    X = features if hasattr(features, 'columns') else np.array([features], dtype=float)
+    if scaler is not None:
+        X = scaler.transform(X)
+
+    n_classes = len(label_encoder.classes_)
+    combined, per_model, timings = ensemble_proba(X, models, n_classes, weights)
+    combined = combined[0]
+    ranked = np.argsort(combined)[::-1][:top_k]
+    names = label_encoder.inverse_transform(ranked)
+    weights = weights or {}
+
+    return {
+        'crop': str(names[0]),
+        'confidence': float(combined[ranked[0]]),
+        'top_k': [{'crop': str(name), 'probability': float(combined[index])}
+                  for name, index in zip(names, ranked)],
+        'votes': {
+            name: {
+                'crop': str(label_encoder.inverse_transform([int(proba[0].argmax())])[0]),
+                'confidence': float(proba[0].max()),
+                'weight': weights.get(name, 1.0),
+                'seconds': timings[name]
+            }
+            for name, proba in per_model.items()
+        }
+    }
@@ -0,0 +1,474 @@
+import sys
+import copy
+import json
+import time
+import pickle
+import inspect
+import argparse
+import numpy as np
+
+# =============================================================================
+# forest_compression.py - Size/Latency-Budgeted Forest Compression
+# Shrinks the 100-tree random forest three ways: pruning its trees by depth
+# and leaf size, keeping a greedily chosen subset of trees, or distilling it
+# into one shallow tree or a small MLP trained on the forest's class
+# probabilities. The winner within the budget is picked by accuracy on a
+# validation slice cut from the training rows; only the winner is then
+# scored on the held-out test split from model_training.py.
+# =============================================================================
+
+FOREST_PATH = r"random_forest.pkl"
+COMPRESSED_PATH = r"random_forest.compact.pkl"
+REPORT_PATH = r"forest_compression.json"
+METHODS = ('prune', 'select', 'distill-tree', 'distill-mlp')
+# Methods whose result is still a RandomForestClassifier, a drop-in replacement for random_forest.pkl
+DROP_IN_METHODS = ('prune', 'select')
+
+# Candidate grid per method
+PRUNE_DEPTHS = (4, 6, 8, 10, 12)
+PRUNE_MIN_SAMPLES_LEAF = (1, 3)
+SELECT_TREE_COUNTS = (3, 5, 10, 20, 40)
+DISTILL_TREE_DEPTHS = (8, 10, 12, 16)
+DISTILL_MLP_LAYERS = ((16,), (32,), (64,))
+
+# Distillation set: the training rows plus AUGMENT_COPIES jittered copies,
+# with Gaussian noise of AUGMENT_NOISE standard deviations (features are scaled)
+AUGMENT_COPIES = 4
+AUGMENT_NOISE = 0.15
+RANDOM_STATE = 42
+# Share of the training rows held out to choose between candidates
+VALIDATION_FRACTION = 0.2
+
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+def model_bytes(model):
+    """Size of the model's pickle, which is what the app loads and keeps in memory"""
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+def single_row_ms(model, X, iterations=100):
+    """Median predict_proba latency for one row, the app's path"""
+    rows = X[np.arange(iterations) % len(X)]
+    model.predict_proba(rows[:1])
+    latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        model.predict_proba(row[None, :])
+        latencies.append(time.perf_counter() - start)
+    return float(np.median(latencies) * 1000)
+
+def evaluate(model, data, reference=None, iterations=100):
+    """
+    Size and latency of a model on the held-out split (no labels are used)
+
+    Args:
+        model: Fitted classifier on the scaled features
+        data: model_training.load_dataset() dict
+        reference: Original model's test predictions, for the agreement rate
+        iterations: Single-row predictions timed
+
+    Returns:
+        dict: agreement with the original, pickle bytes, median single-row
+        and whole-test-set predict_proba milliseconds
+    """
+    X_test = np.asarray(data['X_test'])
+    start = time.perf_counter()
+    predictions = model.predict_proba(X_test).argmax(axis=1)
+    batch = (time.perf_counter() - start) * 1000
+    predictions = model.classes_[predictions]
+    result = {
+        'bytes': model_bytes(model),
+        'single_row_ms': single_row_ms(model, X_test, iterations),
+        'batch_ms': batch
+    }
+    if reference is not None:
+        result['agreement'] = float(np.mean(predictions == reference))
+    if hasattr(model, 'estimators_'):
+        result['trees'] = len(model.estimators_)
+        result['nodes'] = int(sum(tree.tree_.node_count for tree in model.estimators_))
+    elif hasattr(model, 'tree_'):
+        result['nodes'] = int(model.tree_.node_count)
+    return result
+
+def test_accuracy(model, data):
+    """Accuracy on the held-out test split"""
+    predictions = model.predict_proba(np.asarray(data['X_test'])).argmax(axis=1)
+    return float(np.mean(model.classes_[predictions] == data['y_test']))
+
+def validation_rows(data, fraction=VALIDATION_FRACTION, random_state=RANDOM_STATE):
+    """
+    Stratified split of the training row indices
+
+    Returns:
+        tuple: (rows candidates are fitted on, rows they are chosen on)
+    """
+    from sklearn.model_selection import train_test_split
+    y_train = np.asarray(data['y_train'])
+    return train_test_split(np.arange(len(y_train)), test_size=fraction, random_state=random_state,
+                            stratify=y_train)
+
+def validation_accuracy(model, data, rows):
+    """
+    Accuracy on the validation rows of the training split
+
+    The forest's trees were fitted on most of those rows, so a forest (the
+    original, pruned or selected) is scored with its out-of-bag vote: each
+    row is voted on only by the trees whose bootstrap sample left it out,
+    and rows that no tree left out are skipped. Distilled models never saw
+    the validation rows and are scored directly.
+    """
+    X = np.asarray(data['X_train'])[rows]
+    y = np.asarray(data['y_train'])[rows]
+    if hasattr(model, 'estimators_'):
+        masks = oob_masks(model, len(data['y_train']))[:, rows]
+        votes = sum(tree.predict_proba(X) * mask[:, None] for tree, mask in zip(model.estimators_, masks))
+        covered = masks.any(axis=0)
+        predictions, y = votes[covered].argmax(axis=1), y[covered]
+    else:
+        predictions = model.predict_proba(X).argmax(axis=1)
+    return float(np.mean(model.classes_[predictions] == y))
+
+# ------------------------------ Pruning -------------------------------
+
+def prune_tree(tree, max_depth=None, min_samples_leaf=1):
+    """
+    Copy of a fitted decision tree cut back to max_depth and min_samples_leaf
+
+    A split is removed when it is at max_depth or either side holds fewer
+    than min_samples_leaf training rows; the node keeps its class
+    distribution and becomes a leaf. The node arrays are rebuilt without the
+    cut-off subtrees, so the pickle shrinks with them.
+    """
+    state = tree.tree_.__getstate__()
+    nodes, values = state['nodes'], state['values']
+    left, right = nodes['left_child'], nodes['right_child']
+    samples = nodes['n_node_samples']
+
+    # Depth-first, left before right: the order sklearn builds nodes in
+    order, leaves, depths = [], [], []
+    stack = [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        is_leaf = (left[node] == TREE_LEAF
+                   or (max_depth is not None and depth >= max_depth)
+                   or min(samples[left[node]], samples[right[node]]) < min_samples_leaf)
+        order.append(node)
+        leaves.append(is_leaf)
+        depths.append(depth)
+        if not is_leaf:
+            stack.append((right[node], depth + 1))
+            stack.append((left[node], depth + 1))
+
+    order = np.asarray(order)
+    leaves = np.asarray(leaves)
+    position = np.full(len(nodes), TREE_LEAF, dtype=np.int64)
+    position[order] = np.arange(len(order))
+    pruned_nodes = nodes[order].copy()
+    pruned_nodes['left_child'] = np.where(leaves, TREE_LEAF, position[pruned_nodes['left_child']])
+    pruned_nodes['right_child'] = np.where(leaves, TREE_LEAF, position[pruned_nodes['right_child']])
+    pruned_nodes['feature'][leaves] = TREE_UNDEFINED
+    pruned_nodes['threshold'][leaves] = TREE_UNDEFINED
+
+    pruned_tree = type(tree.tree_)(tree.n_features_in_, np.atleast_1d(tree.n_classes_).astype(np.intp),
+                                   tree.n_outputs_)
+    pruned_tree.__setstate__({
+        'max_depth': int(max(depths)),
+        'node_count': len(order),
+        'nodes': pruned_nodes,
+        'values': np.ascontiguousarray(values[order])
+    })
+    pruned = copy.copy(tree)
+    pruned.tree_ = pruned_tree
+    return pruned
+
+def prune_forest(forest, max_depth=None, min_samples_leaf=1):
+    """Copy of the forest with every tree passed through prune_tree()"""
+    pruned = copy.copy(forest)
+    pruned.estimators_ = [prune_tree(tree, max_depth, min_samples_leaf) for tree in forest.estimators_]
+    return pruned
+
+# --------------------------- Tree selection ---------------------------
+
+def oob_masks(forest, n_samples):
+    """
+    (trees, n_samples) mask of the training rows each tree did not see
+
+    Re-draws each tree's bootstrap sample from its random_state, as the
+    forest did when fitting. Only valid for the training rows the forest was
+    fitted on (model_training.py's split). Without bootstrapping every tree
+    saw every row, and all rows are used.
+    """
+    if not getattr(forest, 'bootstrap', False):
+        return np.ones((len(forest.estimators_), n_samples), dtype=bool)
+    max_samples = forest.max_samples
+    if max_samples is None:
+        n_bootstrap = n_samples
+    elif isinstance(max_samples, float):
+        n_bootstrap = max(round(n_samples * max_samples), 1)
+    else:
+        n_bootstrap = max_samples
+    masks = np.empty((len(forest.estimators_), n_samples), dtype=bool)
+    for i, tree in enumerate(forest.estimators_):
+        drawn = np.random.RandomState(tree.random_state).randint(0, n_samples, n_bootstrap)
+        masks[i] = np.bincount(drawn, minlength=n_samples) == 0
+    return masks
+
+def greedy_tree_order(forest, X_train, y_train, n_trees, rows=None):
+    """
+    Forward selection of trees by out-of-bag accuracy
+
+    Each step adds the tree that makes the most training rows correctly
+    classified by the soft vote of the chosen trees that did not see them
+    (ties: most probability on the true class). Any prefix of the returned
+    order is the greedy subset of that size.
+
+    Args:
+        X_train, y_train: The rows the forest was fitted on
+        rows: Only count these training rows (default: all)
+
+    Returns:
+        list: Tree indices in the order they were chosen
+    """
+    masks = oob_masks(forest, len(y_train))
+    if rows is not None:
+        X_train, y_train, masks = np.asarray(X_train)[rows], np.asarray(y_train)[rows], masks[:, rows]
+    X_train = np.asarray(X_train)
+    y_train = np.asarray(y_train)
+    rows = np.arange(len(y_train))
+    # Per-tree probabilities, zeroed on the rows the tree was trained on
+    probas = np.stack([tree.predict_proba(X_train) for tree in forest.estimators_]) * masks[:, :, None]
+    total = np.zeros(probas.shape[1:])
+    counted = np.zeros(len(y_train), dtype=bool)
+    remaining = list(range(len(forest.estimators_)))
+    order = []
+    for _ in range(min(n_trees, len(remaining))):
+        candidates = total[None] + probas[remaining]
+        covered = counted[None] | masks[remaining]
+        correct = ((candidates.argmax(axis=2) == y_train[None]) & covered).sum(axis=1)
+        mass = candidates[:, rows, y_train].sum(axis=1)
+        best = remaining[np.lexsort((mass, correct))[-1]]
+        order.append(best)
+        remaining.remove(best)
+        total += probas[best]
+        counted |= masks[best]
+    return order
+
+def select_trees(forest, order):
+    """Copy of the forest keeping only the trees at the given indices"""
+    selected = copy.copy(forest)
+    selected.estimators_ = [forest.estimators_[i] for i in order]
+    selected.n_estimators = len(order)
+    return selected
+
+# ---------------------------- Distillation ----------------------------
+
+def distillation_set(forest, X_train, copies=AUGMENT_COPIES, noise=AUGMENT_NOISE, random_state=RANDOM_STATE):
+    """
+    Training rows plus jittered copies, labelled with the forest's probabilities
+
+    Returns:
+        tuple: (X, soft labels of shape (rows, classes))
+    """
+    X_train = np.asarray(X_train, dtype=np.float64)
+    rng = np.random.default_rng(random_state)
+    jittered = [X_train + rng.normal(0, noise, X_train.shape) for _ in range(copies)]
+    X = np.vstack([X_train] + jittered)
+    return X, forest.predict_proba(X)
+
+def _soft_label_rows(X, soft_labels, classes):
+    """
+    One weighted row per (row, class with non-zero probability)
+
+    Weighted gini impurity / cross-entropy over these rows equals the
+    soft-label loss, so standard classifiers learn the forest's probabilities.
+    """
+    row, column = np.nonzero(soft_labels)
+    return X[row], classes[column], soft_labels[row, column]
+
+def distill_tree(X, soft_labels, classes, max_depth, random_state=RANDOM_STATE):
+    """Single decision tree of at most max_depth fitted to the soft labels"""
+    from sklearn.tree import DecisionTreeClassifier
+    X_rows, y_rows, weights = _soft_label_rows(X, soft_labels, classes)
+    return DecisionTreeClassifier(max_depth=max_depth, random_state=random_state).fit(
+        X_rows, y_rows, sample_weight=weights)
+
+def distill_mlp(X, soft_labels, classes, hidden_layer_sizes, random_state=RANDOM_STATE):
+    """
+    Small MLP fitted to the soft labels
+
+    scikit-learn releases without MLP sample weights get the forest's hard
+    labels instead.
+    """
+    from sklearn.neural_network import MLPClassifier
+    mlp = MLPClassifier(hidden_layer_sizes=hidden_layer_sizes, max_iter=300, random_state=random_state)
+    if 'sample_weight' in inspect.signature(mlp.fit).parameters:
+        X_rows, y_rows, weights = _soft_label_rows(X, soft_labels, classes)
+        return mlp.fit(X_rows, y_rows, sample_weight=weights)
+    return mlp.fit(X, classes[soft_labels.argmax(axis=1)])
+
+# ------------------------------ Search --------------------------------
+
+def candidates(forest, data, methods=METHODS, fit_rows=None):
+    """
+    Generate (method, parameters, model) for every grid point of the methods
+
+    Distillation sets and the greedy order are computed once per call, from
+    the training rows in fit_rows only (default: all of them).
+    """
+    classes = forest.classes_
+    if fit_rows is None:
+        fit_rows = np.arange(len(data['y_train']))
+    if 'prune' in methods:
+        for depth in PRUNE_DEPTHS:
+            for min_samples_leaf in PRUNE_MIN_SAMPLES_LEAF:
+                yield 'prune', {'max_depth': depth, 'min_samples_leaf': min_samples_leaf}, \
+                    prune_forest(forest, depth, min_samples_leaf)
+    if 'select' in methods:
+        order = greedy_tree_order(forest, data['X_train'], data['y_train'], max(SELECT_TREE_COUNTS), fit_rows)
+        for count in SELECT_TREE_COUNTS:
+            if count < len(forest.estimators_):
+                yield 'select', {'trees': count}, select_trees(forest, order[:count])
+    if 'distill-tree' in methods or 'distill-mlp' in methods:
+        X, soft_labels = distillation_set(forest, np.asarray(data['X_train'])[fit_rows])
+        if 'distill-tree' in methods:
+            for depth in DISTILL_TREE_DEPTHS:
+                yield 'distill-tree', {'max_depth': depth}, distill_tree(X, soft_labels, classes, depth)
+        if 'distill-mlp' in methods:
+            for layers in DISTILL_MLP_LAYERS:
+                yield 'distill-mlp', {'hidden_layer_sizes': list(layers)}, \
+                    distill_mlp(X, soft_labels, classes, layers)
+
+def within_budget(metrics, max_bytes=None, max_latency_ms=None):
+    return ((max_bytes is None or metrics['bytes'] <= max_bytes)
+            and (max_latency_ms is None or metrics['single_row_ms'] <= max_latency_ms))
+
+def compress(forest, data, max_bytes=None, max_latency_ms=None, methods=METHODS, iterations=100):
+    """
+    Best compressed forest within a size and/or latency budget
+
+    Candidates are fitted without a validation slice of the training rows
+    and compared by their accuracy on it (see validation_accuracy), so the
+    test split plays no part in the choice. Only the original and the
+    chosen model are scored on it.
+
+    Args:
+        forest: Fitted RandomForestClassifier on the scaled features
+        data: model_training.load_dataset() dict
+        max_bytes: Largest allowed pickle size
+        max_latency_ms: Largest allowed median single-row latency
+        methods: Subset of METHODS to try
+        iterations: Single-row predictions timed per candidate
+
+    Returns:
+        tuple: (candidate with the best validation accuracy within budget,
+        smaller on ties, or None; report dict with the original's and every
+        candidate's metrics)
+    """
+    if max_bytes is None and max_latency_ms is None:
+        raise ValueError("Give a size budget, a latency budget or both")
+    unknown = set(methods) - set(METHODS)
+    if unknown:
+        raise ValueError(f"Unknown method(s) {', '.join(sorted(unknown))}. Expected: {', '.join(METHODS)}")
+    fit_rows, held_rows = validation_rows(data)
+    reference = forest.predict(np.asarray(data['X_test']))
+    original = {**evaluate(forest, data, iterations=iterations),
+                'validation_accuracy': validation_accuracy(forest, data, held_rows),
+                'test_accuracy': test_accuracy(forest, data)}
+    report = {
+        'budget': {'max_bytes': max_bytes, 'max_latency_ms': max_latency_ms},
+        'validation_rows': len(held_rows),
+        'original': original,
+        'candidates': [],
+        'selected': None
+    }
+    best, best_key = None, None
+    for method, params, model in candidates(forest, data, methods, fit_rows):
+        metrics = evaluate(model, data, reference, iterations)
+        metrics['validation_accuracy'] = validation_accuracy(model, data, held_rows)
+        fits = within_budget(metrics, max_bytes, max_latency_ms)
+        report['candidates'].append({
+            'method': method, 'params': params, **metrics,
+            'validation_delta': metrics['validation_accuracy'] - original['validation_accuracy'],
+            'size_ratio': metrics['bytes'] / original['bytes'],
+            'speedup': original['single_row_ms'] / metrics['single_row_ms'],
+            'drop_in': method in DROP_IN_METHODS,
+            'within_budget': fits
+        })
+        key = (metrics['validation_accuracy'], -metrics['bytes'])
+        if fits and (best_key is None or key > best_key):
+            best, best_key = model, key
+            report['selected'] = len(report['candidates']) - 1
+    if best is not None:
+        report['candidates'][report['selected']]['test_accuracy'] = test_accuracy(best, data)
+    return best, report
+
+def compress_file(max_bytes=None, max_latency_ms=None, methods=METHODS, model_path=FOREST_PATH,
+                  output_path=COMPRESSED_PATH, report_path=REPORT_PATH, data=None):
+    """
+    compress() the forest pickle at model_path and save the result and report
+
+    Returns:
+        dict: The report, with the output path ('output' is None if no
+        candidate fit the budget and nothing was written)
+    """
+    import joblib
+    forest = joblib.load(model_path)
+    if data is None:
+        from model_training import load_dataset
+        data, _, _ = load_dataset()
+    model, report = compress(forest, data, max_bytes, max_latency_ms, methods)
+    report['source'] = model_path
+    report['output'] = None
+    if model is not None:
+        joblib.dump(model, output_path)
+        report['output'] = output_path
+    if report_path:
+        with open(report_path, 'w') as file:
+            json.dump(report, file, indent=2)
+    return report
+
+def _summary(report):
+    """One line per candidate, for the terminal"""
+    original = report['original']
+    lines = [f"{'method':<13}{'params':<34}{'val acc':>9}{'agree':>8}{'KB':>9}{'1-row ms':>10}{'batch ms':>10}",
+             f"{'original':<13}{'':<34}{original['validation_accuracy']:>9.4f}{'':>8}{original['bytes'] / 1024:>9.1f}"
+             f"{original['single_row_ms']:>10.2f}{original['batch_ms']:>10.2f}"]
+    for i, candidate in enumerate(report['candidates']):
+        mark = ' <- selected' if i == report['selected'] else ('' if candidate['within_budget'] else ' (over budget)')
+        params = ', '.join(f"{key}={value}" for key, value in candidate['params'].items())
+        lines.append(f"{candidate['method']:<13}{params:<34}{candidate['validation_accuracy']:>9.4f}"
+                     f"{candidate['agreement']:>8.3f}{candidate['bytes'] / 1024:>9.1f}"
+                     f"{candidate['single_row_ms']:>10.2f}{candidate['batch_ms']:>10.2f}{mark}")
+    if report['selected'] is not None:
+        selected = report['candidates'][report['selected']]
+        lines.append(f"Test accuracy: selected {selected['test_accuracy']:.4f}, original {original['test_accuracy']:.4f}")
+    return '\n'.join(lines)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Compress the random forest within a size or latency budget")
+    parser.add_argument('--max-kb', type=float, help="Largest pickle size in KB")
+    parser.add_argument('--max-latency-ms', type=float, help="Largest median single-row latency in ms")
+    parser.add_argument('--method', action='append', choices=METHODS,
+                        help="Only try this method (repeatable; default: all)")
+    parser.add_argument('--model', default=FOREST_PATH, help=f"Forest pickle (default: {FOREST_PATH})")
+    parser.add_argument('--output', default=COMPRESSED_PATH, help=f"Compressed model (default: {COMPRESSED_PATH})")
+    parser.add_argument('--report', default=REPORT_PATH, help=f"JSON report (default: {REPORT_PATH})")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON instead of a table")
+    args = parser.parse_args(argv)
+    if args.max_kb is None and args.max_latency_ms is None:
+        parser.error("give --max-kb, --max-latency-ms or both")
+
+    report = compress_file(None if args.max_kb is None else int(args.max_kb * 1024), args.max_latency_ms,
+                           tuple(args.method or METHODS), args.model, args.output, args.report)
+    print(json.dumps(report, indent=2) if args.json else _summary(report))
+    if report['output'] is None:
+        print("No candidate fits the budget", file=sys.stderr)
+        return 1
+    if not args.json:
+        print(f"Saved {report['output']}")
+        if not report['candidates'][report['selected']]['drop_in']:
+            print("Not a forest: it cannot replace random_forest.pkl (use --method prune/select for that)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
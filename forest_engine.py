@@ -0,0 +1,225 @@
+import os
+import sys
+import json
+import numpy as np
+
+# =============================================================================
+# forest_engine.py - Compiled Flat-Array Tree Ensemble Engine
+# Packs every tree of a RandomForest / DecisionTree into one structure-of-arrays
+# layout (.npy files, memory-mappable) and scores whole batches against all
+# trees at once, level by level.
+# =============================================================================
+
+COMPILED_FOREST_PATH = 'random_forest.forest'
+FORMAT_VERSION = 1
+
+# Arrays that make up a compiled forest, one .npy file each
+ARRAY_NAMES = ['roots', 'feature', 'threshold', 'children', 'leaf_index', 'leaf_values', 'classes']
+
+def _float32_floor(threshold):
+    """
+    Largest float32 <= each float64 threshold
+
+    sklearn casts X to float32 and compares it against float64 thresholds.
+    For a float32 x, x <= t holds exactly when x <= floor32(t), so storing the
+    rounded-down threshold keeps every split decision identical.
+    """
+    rounded = threshold.astype(np.float32)
+    too_high = rounded.astype(np.float64) > threshold
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+def _tree_arrays(tree):
+    """Flatten one sklearn Tree object into per-node arrays (local offsets)"""
+    is_leaf = tree.children_left == -1
+    n_nodes = tree.node_count
+    local = np.arange(n_nodes)
+
+    # Children as (left, right) pairs; leaves point to themselves so a fixed
+    # number of steps is always safe
+    children = np.stack([np.where(is_leaf, local, tree.children_left),
+                         np.where(is_leaf, local, tree.children_right)], axis=1)
+    feature = np.where(is_leaf, 0, tree.feature)
+    threshold = _float32_floor(np.where(is_leaf, np.inf, tree.threshold))
+
+    # Leaf class distributions, normalised like DecisionTreeClassifier.predict_proba
+    values = tree.value[is_leaf, 0, :].astype(np.float64)
+    totals = values.sum(axis=1, keepdims=True)
+    totals[totals == 0] = 1.0
+    leaf_index = np.full(n_nodes, -1, dtype=np.int32)
+    leaf_index[is_leaf] = np.arange(is_leaf.sum())
+
+    return {
+        'feature': feature, 'threshold': threshold, 'children': children,
+        'leaf_index': leaf_index, 'leaf_values': values / totals, 'max_depth': tree.max_depth
+    }
+
+def compile_forest(model):
+    """
+    Compile a fitted RandomForestClassifier or DecisionTreeClassifier
+
+    All trees are concatenated into shared arrays; child and leaf offsets are
+    rewritten to be global so traversal never needs per-tree dispatch.
+
+    Returns:
+        CompiledForest
+    """
+    if not hasattr(model, 'estimators_') and not hasattr(model, 'tree_'):
+        raise TypeError(f"Expected a fitted random forest or decision tree, got {type(model).__name__}")
+    estimators = getattr(model, 'estimators_', [model])
+    return CompiledForest.from_tree_arrays([_tree_arrays(e.tree_) for e in estimators], model.classes_)
+
+class CompiledForest:
+    """
+    Structure-of-arrays tree ensemble with batched traversal
+
+    Exposes the classifier API used by predict.py (predict, predict_proba,
+    classes_). Input is the same scaled feature matrix the sklearn model takes.
+    """
+
+    def __init__(self, arrays, max_depth):
+        for name in ARRAY_NAMES:
+            # Plain ndarray views of np.memmap arrays skip the subclass overhead
+            # on every take() while still reading the shared mapping
+            setattr(self, name, arrays[name].view(np.ndarray))
+        self.max_depth = max_depth
+        self.n_trees = len(self.roots)
+        self.classes_ = self.classes
+
+    @classmethod
+    def from_tree_arrays(cls, trees, classes):
+        """Concatenate per-tree arrays from _tree_arrays() into one layout"""
+        node_offsets = np.cumsum([0] + [len(t['feature']) for t in trees])
+        leaf_offsets = np.cumsum([0] + [len(t['leaf_values']) for t in trees])
+        arrays = {
+            'roots': node_offsets[:-1].astype(np.int32),
+            'feature': np.concatenate([t['feature'] for t in trees]).astype(np.int32),
+            'threshold': np.concatenate([t['threshold'] for t in trees]).astype(np.float32),
+            'children': np.concatenate([t['children'] + off for t, off in zip(trees, node_offsets)]).astype(np.int32),
+            'leaf_index': np.concatenate([
+                np.where(t['leaf_index'] >= 0, t['leaf_index'] + off, -1)
+                for t, off in zip(trees, leaf_offsets)
+            ]).astype(np.int32),
+            'leaf_values': np.concatenate([t['leaf_values'] for t in trees]),
+            'classes': np.asarray(classes)
+        }
+        return cls(arrays, max(t['max_depth'] for t in trees))
+
+    def save(self, path=COMPILED_FOREST_PATH):
+        """Write one .npy per array plus meta.json into a directory"""
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(path, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+        meta = {
+            'format_version': FORMAT_VERSION,
+            'n_trees': self.n_trees,
+            'n_nodes': int(len(self.feature)),
+            'n_classes': int(len(self.classes)),
+            'max_depth': int(self.max_depth)
+        }
+        with open(os.path.join(path, 'meta.json'), 'w') as file:
+            json.dump(meta, file, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, path=COMPILED_FOREST_PATH, mmap_mode='r'):
+        """
+        Load a compiled forest; arrays are memory-mapped by default so several
+        processes share a single copy through the page cache
+        """
+        with open(os.path.join(path, 'meta.json'), 'r') as file:
+            meta = json.load(file)
+        if meta['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled forest version {meta['format_version']} in {path}")
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in ARRAY_NAMES}
+        return cls(arrays, meta['max_depth'])
+
+    def apply(self, X, block_size=256):
+        """
+        Leaf node reached in every tree, shape (n_samples, n_trees)
+
+        Level-synchronous: each step advances all samples in all trees by one
+        level, so the loop runs max_depth times regardless of batch size.
+        Rows go through in small blocks to keep the working set in cache.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) > block_size:
+            return np.concatenate([self.apply(X[start:start + block_size], block_size)
+                                   for start in range(0, len(X), block_size)])
+
+        n_samples, n_features = X.shape
+        flat_X = X.ravel()
+        flat_children = self.children.reshape(-1)
+        # One (sample, tree) pair per slot, flattened sample-major
+        row_offsets = np.repeat(np.arange(n_samples, dtype=np.int32) * n_features, self.n_trees)
+        nodes = np.tile(self.roots, n_samples)
+        for _ in range(self.max_depth):
+            values = np.take(flat_X, row_offsets + np.take(self.feature, nodes))
+            go_right = values > np.take(self.threshold, nodes)
+            nodes = np.take(flat_children, 2 * nodes + go_right)
+        return nodes.reshape(n_samples, self.n_trees)
+
+    def predict_proba(self, X, block_size=8192):
+        """Mean of the per-tree leaf distributions, as in RandomForestClassifier"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        proba = np.zeros((len(X), len(self.classes)), dtype=np.float64)
+        # Blocks bound the (rows, trees) leaf matrix; for large blocks,
+        # accumulating one tree at a time avoids a (rows, trees, classes) gather
+        for start in range(0, len(X), block_size):
+            leaves = self.leaf_index[self.apply(X[start:start + block_size])]
+            block = proba[start:start + block_size]
+            if len(block) <= 64:
+                block += self.leaf_values[leaves].sum(axis=1)
+            else:
+                for tree in range(self.n_trees):
+                    block += self.leaf_values[leaves[:, tree]]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        """Encoded class predictions"""
+        return self.classes[self.predict_proba(X).argmax(axis=1)]
+
+def verify_against_sklearn(csv_path='csv/Crop_recommendation.csv', model_path='random_forest.pkl',
+                           compiled_path=COMPILED_FOREST_PATH, scaler_path='scaler.pkl'):
+    """
+    Compare a compiled forest with the sklearn model on a labelled CSV
+
+    Returns:
+        dict: rows compared, top-1 agreement and max probability difference
+    """
+    import joblib
+    import pandas as pd
+    from predict import FEATURE_NAMES
+
+    X = joblib.load(scaler_path).transform(pd.read_csv(csv_path)[FEATURE_NAMES])
+    expected = joblib.load(model_path).predict_proba(X)
+    actual = CompiledForest.load(compiled_path).predict_proba(X)
+
+    return {
+        'rows': len(X),
+        'top1_agreement': float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean()),
+        'max_abs_proba_diff': float(np.abs(expected - actual).max())
+    }
+
+if __name__ == "__main__":
+    # python forest_engine.py --compile [MODEL.pkl [OUTPUT_DIR]]
+    # python forest_engine.py --verify [MODEL.pkl [COMPILED_DIR]]
+    if len(sys.argv) in (2, 3, 4) and sys.argv[1] in ('--compile', '--verify'):
+        model_path = sys.argv[2] if len(sys.argv) > 2 else 'random_forest.pkl'
+        compiled_path = sys.argv[3] if len(sys.argv) > 3 else COMPILED_FOREST_PATH
+        if sys.argv[1] == '--compile':
+            import joblib
+            print(json.dumps({'written': compile_forest(joblib.load(model_path)).save(compiled_path)}))
+        else:
+            report = verify_against_sklearn(model_path=model_path, compiled_path=compiled_path)
+            print(json.dumps(report))
+            sys.exit(0 if report['top1_agreement'] == 1.0 and report['max_abs_proba_diff'] < 1e-9 else 1)
+    else:
+        print(json.dumps({'error': 'Invalid arguments. Expected: --compile|--verify [MODEL.pkl [DIR]]'}))
+        sys.exit(1)
@@ -0,0 +1,144 @@
+import io
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# =============================================================================
+# heatmap_cache.py - Content-Addressed Cache for Rendered Heatmaps
+# Finished heatmaps are stored as PNG bytes, keyed by a hash of the uploaded
+# file plus the plot parameters, so a repeat view is a dictionary lookup.
+# matplotlib and seaborn are imported only when a heatmap is actually drawn,
+# and every figure is closed right after it is saved.
+# =============================================================================
+
+# Defaults of the Data Analysis tab's correlation heatmap
+HEATMAP_PARAMS = {
+    'figsize': [10, 7],
+    'cmap': 'coolwarm',
+    'annot': True,
+    'fmt': '.2f',
+    'linewidths': 0.5,
+    'dpi': 100
+}
+
+def file_digest(file, block_size=1024 * 1024):
+    """SHA-256 of a binary file-like object; the read position is restored"""
+    digest = hashlib.sha256()
+    position = file.tell()
+    file.seek(0)
+    for block in iter(lambda: file.read(block_size), b''):
+        digest.update(block)
+    file.seek(position)
+    return digest.hexdigest()
+
+def render_key(content_digest, params):
+    """Cache key for one rendering of one file"""
+    payload = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(f"{content_digest}:{payload}".encode()).hexdigest()
+
+def render_heatmap(corr, params=None):
+    """
+    Draw a correlation heatmap and return it as PNG bytes
+
+    Args:
+        corr: Square DataFrame (e.g. DataFrame.corr() output)
+        params: Overrides for HEATMAP_PARAMS
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    params = dict(HEATMAP_PARAMS, **(params or {}))
+    fig, ax = plt.subplots(figsize=tuple(params['figsize']))
+    try:
+        sns.heatmap(corr, annot=params['annot'], cmap=params['cmap'], fmt=params['fmt'],
+                    linewidths=params['linewidths'], ax=ax)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=params['dpi'], bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        # Figures are otherwise kept alive by pyplot's global registry
+        plt.close(fig)
+
+class RenderCache:
+    """
+    Thread-safe LRU of rendered PNGs, bounded by total size in bytes
+
+    Args:
+        max_bytes: Evict least recently used images beyond this total
+        directory: Optional folder of <key>.png files shared between restarts
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.png")
+
+    def get(self, key):
+        """PNG bytes, or None on a miss"""
+        with self._lock:
+            png = self._images.get(key)
+            if png is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return png
+        if self.directory and os.path.exists(self._path(key)):
+            with open(self._path(key), 'rb') as file:
+                png = file.read()
+            self._remember(key, png)
+            with self._lock:
+                self.hits += 1
+            return png
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, png):
+        self._remember(key, png)
+        if self.directory:
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(png)
+            os.replace(tmp_path, self._path(key))
+
+    def _remember(self, key, png):
+        with self._lock:
+            if key in self._images:
+                self._bytes -= len(self._images.pop(key))
+            self._images[key] = png
+            self._bytes += len(png)
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._images), 'bytes': self._bytes}
+
+    def heatmap(self, content_digest, corr, params=None):
+        """
+        Cached render_heatmap(); corr must be derived from the hashed content
+
+        Returns:
+            tuple: (PNG bytes, True if it came from the cache)
+        """
+        params = dict(HEATMAP_PARAMS, **(params or {}))
+        key = render_key(content_digest, params)
+        png = self.get(key)
+        if png is not None:
+            return png, True
+        png = render_heatmap(corr, params)
+        self.put(key, png)
+        return png, False
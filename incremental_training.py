@@ -0,0 +1,393 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import joblib
+from sklearn.metrics import accuracy_score
+
+from model_training import DATASET_PATH, MODEL_OUTPUTS
+
+# =============================================================================
+# incremental_training.py - Incremental Retraining from Appended Rows
+# Fits only the rows appended to the training CSV since the last (full or
+# incremental) training run, instead of refitting everything:
+#   - StandardScaler: partial_fit; the existing models are then re-expressed
+#     in the new scaled space (an affine change of their inputs): exactly
+#     for the MLP and Naive Bayes, up to float32 rounding for the trees
+#   - MLP and GaussianNB: partial_fit on the new rows
+#   - Random Forest: warm_start adds trees grown on the new rows
+#   - Decision Tree: re-expressed only (no incremental fit exists)
+# Consumed rows are tracked by byte offset plus a hash of everything before it.
+# New pickles are staged next to the old ones and recorded in the state file
+# before any is swapped in, so a crash never leads to fitting twice.
+# =============================================================================
+
+STATE_PATH = r"training_state.json"
+HOLDOUT_PATH = r"training_holdout.npz"
+FEATURE_COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+# Updates kept in the state file's history
+HISTORY_LIMIT = 50
+
+def _prefix_hash(path, length):
+    """SHA-256 of the first `length` bytes of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        remaining = length
+        while remaining > 0:
+            block = file.read(min(remaining, 1024 * 1024))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+def _write_json_atomic(payload, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(payload, file, indent=2)
+    os.replace(tmp_path, path)
+
+def _replace_dir(tmp_dir, path):
+    """Swap a freshly written directory into place (readers keep their mmaps)"""
+    old_dir = path + ".old"
+    if os.path.exists(old_dir):
+        shutil.rmtree(old_dir)
+    if os.path.exists(path):
+        os.rename(path, old_dir)
+    os.rename(tmp_dir, path)
+    if os.path.exists(old_dir):
+        shutil.rmtree(old_dir)
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as file:
+        return json.load(file)
+
+def record_full_training(csv_path, data, state_path=STATE_PATH, holdout_path=HOLDOUT_PATH):
+    """
+    Mark the whole CSV as consumed and save the held-out split after a full train
+
+    Args:
+        csv_path: CSV the models were just trained on
+        data: model_training.preprocess() output (for the held-out rows)
+    """
+    size = os.path.getsize(csv_path)
+    labels = data['label_encoder'].inverse_transform(np.asarray(data['y_test']))
+    tmp_path = holdout_path + ".tmp.npz"
+    np.savez(tmp_path, X=np.asarray(data['X_test_raw'], dtype=float), y=np.asarray(labels).astype(str))
+    os.replace(tmp_path, holdout_path)
+    _write_json_atomic({
+        'csv_path': csv_path,
+        'offset': size,
+        'prefix_sha256': _prefix_hash(csv_path, size),
+        'rows': int(len(data['X_train']) + len(data['X_test'])),
+        'full_training_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'history': []
+    }, state_path)
+
+def read_new_rows(csv_path, state):
+    """
+    Rows appended after the consumed offset
+
+    Raises:
+        ValueError: if anything before the offset changed (rows edited or
+            removed), in which case only a full retrain is safe
+
+    Returns:
+        tuple: (DataFrame of new rows, new offset)
+    """
+    offset = state['offset']
+    size = os.path.getsize(csv_path)
+    if size < offset or _prefix_hash(csv_path, offset) != state['prefix_sha256']:
+        raise ValueError(f"{csv_path} was modified before the last consumed row; "
+                         "run python model_training.py for a full retrain")
+    with open(csv_path, 'rb') as file:
+        header = file.readline()
+        file.seek(offset)
+        appended = file.read()
+    if not appended.strip():
+        return pd.DataFrame(columns=header.decode('utf-8').strip().split(',')), size
+    return pd.read_csv(io.BytesIO(header + appended)), size
+
+# =============================================================================
+# Re-expressing fitted models for an updated scaler
+# Old scaled input z1 = (x - m1) / s1, new z2 = (x - m2) / s2, so
+# z1 = z2 * r + d with r = s2 / s1 and d = (m2 - m1) / s1.
+# =============================================================================
+
+def _rescale_mlp(model, r, d):
+    # z1 @ W + b = z2 @ (r[:, None] * W) + (d @ W + b)
+    W = model.coefs_[0]
+    model.intercepts_[0] = model.intercepts_[0] + d @ W
+    model.coefs_[0] = W * r[:, None]
+    # Adam's moment estimates belong to the old parametrization
+    if hasattr(model, '_optimizer'):
+        del model._optimizer
+
+def _rescale_naive_bayes(model, r, d):
+    # z2 = (z1 - d) / r: shift and scale the class means, scale the variances
+    model.theta_ = (model.theta_ - d) / r
+    model.var_ = (model.var_ - model.epsilon_) / r ** 2 + model.epsilon_
+
+def _float32_toward(values, direction):
+    """Closest float32 to each value that is not past it in direction (-inf: at or below, +inf: at or above)"""
+    rounded = values.astype(np.float32)
+    past = rounded.astype(np.float64) > values if direction < 0 else rounded.astype(np.float64) < values
+    rounded[past] = np.nextafter(rounded[past], np.float32(direction))
+    return rounded
+
+def _rescale_tree(tree, r, d):
+    # sklearn casts X to float32, so an old input went left when
+    # float32(z1) <= t, i.e. when z1 lies below the midpoint between the
+    # largest float32 <= t and the next float32 up. That bound is mapped to
+    # the new space, z2 = (z1 - d) / r (scales are positive), and rounded up
+    # to a float32, so every input that went left still does. Inputs one
+    # float32 step right of a split can still change side, and some forest
+    # splits sit exactly there: between two roundings of the same raw value,
+    # e.g. scaler.fit_transform at training vs. scaler.transform later. On
+    # the bundled dataset top-1 stays unchanged, but a handful of rows move
+    # in a few trees, shifting forest probabilities by up to ~0.05.
+    split = tree.feature >= 0
+    features = tree.feature[split]
+    below = _float32_toward(tree.threshold[split], -np.inf)
+    bound = (below.astype(np.float64) + np.nextafter(below, np.float32(np.inf)).astype(np.float64)) / 2
+    tree.threshold[split] = _float32_toward((bound - d[features]) / r[features], np.inf)
+
+def rescale_models(models, old_mean, old_scale, new_mean, new_scale):
+    """
+    Make models trained on the old scaling give the same results on the new one
+
+    Exact for the MLP and Naive Bayes; trees match up to float32 rounding at
+    their splits (see _rescale_tree).
+    """
+    r = np.asarray(new_scale) / np.asarray(old_scale)
+    d = (np.asarray(new_mean) - np.asarray(old_mean)) / np.asarray(old_scale)
+    for model in models.values():
+        if hasattr(model, 'coefs_'):
+            _rescale_mlp(model, r, d)
+        elif hasattr(model, 'theta_'):
+            _rescale_naive_bayes(model, r, d)
+        elif hasattr(model, 'estimators_'):
+            for estimator in model.estimators_:
+                _rescale_tree(estimator.tree_, r, d)
+        elif hasattr(model, 'tree_'):
+            _rescale_tree(model.tree_, r, d)
+
+# =============================================================================
+# Incremental fits
+# =============================================================================
+
+def _grow_forest(model, X, y, new_trees):
+    """
+    Add `new_trees` trees fitted on (X, y) with warm_start
+
+    fit() re-derives classes_ from y, so every class missing from the new
+    rows gets one zero-weight placeholder row (at the mean of X) to keep the
+    class layout of the old trees.
+    """
+    classes = np.asarray(model.classes_)
+    missing = np.setdiff1d(classes, y)
+    weights = np.ones(len(y))
+    if len(missing):
+        X = np.vstack([X, np.repeat(X.mean(axis=0, keepdims=True), len(missing), axis=0)])
+        y = np.concatenate([y, missing])
+        weights = np.concatenate([weights, np.zeros(len(missing))])
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + new_trees)
+    model.fit(X, y, sample_weight=weights)
+    model.set_params(warm_start=False)
+    model.n_jobs = None
+
+def update_models(models, X_new, y_new, epochs=5, new_trees=10):
+    """
+    Fit already re-expressed models on new scaled rows
+
+    Returns:
+        dict: name -> what was done ('partial_fit', 'warm_start', 'rescaled only')
+    """
+    actions = {}
+    for name, model in models.items():
+        if hasattr(model, 'coefs_'):
+            for _ in range(epochs):
+                model.partial_fit(X_new, y_new)
+            actions[name] = f"partial_fit x{epochs}"
+        elif hasattr(model, 'theta_'):
+            model.partial_fit(X_new, y_new)
+            actions[name] = "partial_fit"
+        elif hasattr(model, 'estimators_'):
+            _grow_forest(model, X_new, y_new, new_trees)
+            actions[name] = f"warm_start +{new_trees} trees"
+        else:
+            actions[name] = "rescaled only"
+    return actions
+
+def _accuracies(models, scaler, label_encoder, X_raw, labels):
+    X = scaler.transform(pd.DataFrame(X_raw, columns=FEATURE_COLUMNS))
+    y = label_encoder.transform(labels)
+    return {name: float(accuracy_score(y, model.predict(X))) for name, model in models.items()}
+
+def _export_runtime_artifacts():
+    """Rebuild the fused MLP, compiled forests, bundle and quantized models, swapping each into place"""
+    from mlp_engine import export_fused_mlp, FUSED_MLP_PATH
+    from forest_engine import compile_forest
+    from model_bundle import export_bundle, BUNDLE_PATH
+    from quantization import export_quantized, QUANTIZED_DIR
+
+    tmp_path = FUSED_MLP_PATH[:-len('.npz')] + ".tmp.npz"
+    export_fused_mlp(output_path=tmp_path)
+    os.replace(tmp_path, FUSED_MLP_PATH)
+    for pickle_path, forest_path in [("random_forest.pkl", "random_forest.forest"),
+                                     ("random_tree.pkl", "random_tree.forest")]:
+        compile_forest(joblib.load(pickle_path)).save(forest_path + ".tmp")
+        _replace_dir(forest_path + ".tmp", forest_path)
+    export_bundle(BUNDLE_PATH + ".tmp")
+    _replace_dir(BUNDLE_PATH + ".tmp", BUNDLE_PATH)
+    export_quantized(QUANTIZED_DIR + ".tmp")
+    _replace_dir(QUANTIZED_DIR + ".tmp", QUANTIZED_DIR)
+
+def _finish_update(csv_path, state, state_path=STATE_PATH):
+    """
+    Swap the staged pickles in, rebuild what derives from them, then advance the offset
+
+    Safe to repeat: a run interrupted anywhere in here is completed by the
+    next one (see state['pending']) instead of refitting the same rows.
+    """
+    pending = state['pending']
+    for path in [*MODEL_OUTPUTS.values(), "scaler.pkl"]:
+        if os.path.exists(path + ".tmp"):
+            os.replace(path + ".tmp", path)
+    _export_runtime_artifacts()
+    # The neighbour index covers every row in the updated scaled space: rebuilt in full
+    from neighbour_index import build_index, INDEX_PATH
+    build_index(csv_path, joblib.load("scaler.pkl"), INDEX_PATH + ".tmp")
+    _replace_dir(INDEX_PATH + ".tmp", INDEX_PATH)
+
+    state['offset'] = pending['offset']
+    state['prefix_sha256'] = pending['prefix_sha256']
+    state['rows'] = state.get('rows', 0) + pending['report']['new_rows']
+    state['history'] = (state.get('history', []) + [pending['report']])[-HISTORY_LIMIT:]
+    del state['pending']
+    _write_json_atomic(state, state_path)
+
+def incremental_update(csv_path=DATASET_PATH, epochs=5, new_trees=10, dry_run=False,
+                       state_path=STATE_PATH, holdout_path=HOLDOUT_PATH):
+    """
+    Fit the current models on rows appended since the last training run
+
+    Args:
+        csv_path: Training CSV that new rows are appended to
+        epochs: partial_fit passes of the MLP over the new rows
+        new_trees: Trees added to the Random Forest
+        dry_run: Compute the drift report but write nothing
+
+    Returns:
+        dict: Drift report (new rows, per-model actions and accuracies)
+    """
+    state = load_state(state_path)
+    if state is None or not os.path.exists(holdout_path):
+        raise FileNotFoundError(f"No {state_path} / {holdout_path}; run python model_training.py once first")
+    resumed = None
+    if state.get('pending') and not dry_run:
+        # The last run was interrupted after staging its pickles: complete it, don't refit
+        resumed = state['pending']['offset']
+        _finish_update(csv_path, state, state_path)
+
+    new_rows, new_offset = read_new_rows(csv_path, state)
+    report = {
+        'updated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'new_rows': int(len(new_rows)),
+        'offset': [state['offset'], new_offset]
+    }
+    if resumed is not None:
+        report['resumed_offset'] = resumed
+    if new_rows.empty:
+        return report
+
+    scaler = joblib.load("scaler.pkl")
+    label_encoder = joblib.load("label_encoder.pkl")
+    models = {name: joblib.load(path) for name, path in MODEL_OUTPUTS.items() if os.path.exists(path)}
+
+    unknown = sorted(set(new_rows['label']) - set(label_encoder.classes_))
+    if unknown:
+        raise ValueError(f"New crop labels {unknown} need a full retrain (python model_training.py)")
+
+    holdout = np.load(holdout_path)
+    X_new_raw = new_rows[FEATURE_COLUMNS].to_numpy(dtype=float)
+    new_labels = new_rows['label'].to_numpy()
+
+    # Drift signal: how well the current models handle the incoming rows
+    report['new_rows_accuracy_before'] = _accuracies(models, scaler, label_encoder, X_new_raw, new_labels)
+    report['holdout_accuracy_before'] = _accuracies(models, scaler, label_encoder, holdout['X'], holdout['y'])
+
+    start = time.perf_counter()
+    old_mean, old_scale = scaler.mean_.copy(), scaler.scale_.copy()
+    scaler.partial_fit(pd.DataFrame(X_new_raw, columns=FEATURE_COLUMNS))
+    rescale_models(models, old_mean, old_scale, scaler.mean_, scaler.scale_)
+    X_new = scaler.transform(pd.DataFrame(X_new_raw, columns=FEATURE_COLUMNS))
+    report['actions'] = update_models(models, X_new, label_encoder.transform(new_labels), epochs, new_trees)
+    report['fit_seconds'] = time.perf_counter() - start
+
+    report['holdout_accuracy_after'] = _accuracies(models, scaler, label_encoder, holdout['X'], holdout['y'])
+    report['holdout_drift'] = {name: report['holdout_accuracy_after'][name] - report['holdout_accuracy_before'][name]
+                               for name in models}
+    if dry_run:
+        return report
+
+    # Every pickle is written to <path>.tmp first. Until the state file
+    # records them as pending, a crash leaves the old set untouched and the
+    # run is simply redone; after that, the next run swaps them in without
+    # refitting (models and scaler must never be rescaled twice). The swap
+    # itself is a handful of renames; readers keyed on the files' mtimes
+    # (cropii.py, prediction_server.py) reload again once it is complete.
+    for name, model in models.items():
+        joblib.dump(model, MODEL_OUTPUTS[name] + ".tmp")
+    joblib.dump(scaler, "scaler.pkl.tmp")
+    state['pending'] = {'offset': new_offset, 'prefix_sha256': _prefix_hash(csv_path, new_offset),
+                        'report': report}
+    _write_json_atomic(state, state_path)
+    _finish_update(csv_path, state, state_path)
+    return report
+
+def print_report(report):
+    print(f"New rows: {report['new_rows']} (bytes {report['offset'][0]} -> {report['offset'][1]})")
+    if not report['new_rows']:
+        print("Nothing to do")
+        return
+    print(f"{'Model':<14} {'Update':<22} {'New rows (before)':>18} {'Held-out before':>16} "
+          f"{'after':>8} {'drift':>8}")
+    for name, action in report['actions'].items():
+        print(f"{name:<14} {action:<22} {report['new_rows_accuracy_before'][name]*100:17.2f}% "
+              f"{report['holdout_accuracy_before'][name]*100:15.2f}% "
+              f"{report['holdout_accuracy_after'][name]*100:7.2f}% "
+              f"{report['holdout_drift'][name]*100:+7.2f}%")
+    print(f"Fitted in {report['fit_seconds']:.2f}s")
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Fit the models on rows appended since the last training run")
+    parser.add_argument('--csv', default=DATASET_PATH, help=f"Training data (default: {DATASET_PATH})")
+    parser.add_argument('--epochs', type=int, default=5, help="MLP partial_fit passes (default: 5)")
+    parser.add_argument('--new-trees', type=int, default=10, help="Trees added to the forest (default: 10)")
+    parser.add_argument('--dry-run', action='store_true', help="Report drift without writing anything")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        report = incremental_update(args.csv, args.epochs, args.new_trees, args.dry_run)
+    except (ValueError, FileNotFoundError) as e:
+        print(json.dumps({'error': str(e)}) if args.json else f"Error: {e}")
+        return 1
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print_report(report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,58 @@
+import sys
+import importlib
+import threading
+
+# =============================================================================
+# lazy_imports.py - Deferred Module Imports
+# lazy_import("pandas") returns a stand-in that imports the real module the
+# first time one of its attributes is used, so a page that never touches
+# pandas never pays for importing it.
+# =============================================================================
+
+class LazyModule:
+    """Module proxy; the import runs on first attribute access (thread-safe)"""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with self.__dict__['_lock']:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._load(), attribute, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__['_module'] is not None else "not loaded"
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+def lazy_import(name):
+    """
+    Module `name`, or a LazyModule stand-in if it has not been imported yet
+
+    Only attribute access is deferred: `pd = lazy_import("pandas")` then
+    `pd.DataFrame(...)` imports pandas on that first call.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+def is_loaded(module):
+    """False while a LazyModule has not imported its module yet"""
+    if isinstance(module, LazyModule):
+        return module.__dict__['_module'] is not None
+    return True
@@ -0,0 +1,309 @@
+import os
+import sys
+import json
+import time
+import queue
+import asyncio
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+
+from predict import FEATURE_NAMES, predict_batch
+
+# =============================================================================
+# micro_batching.py - Adaptive Micro-Batching Dispatcher
+# Concurrent callers (Streamlit sessions, server threads, asyncio tasks)
+# submit single rows and get a Future back. One dispatcher thread collects
+# them and scores each model's rows with a single scaler.transform +
+# predict_proba pass (predict_batch), which costs about the same for 64 rows
+# as for one. A batch is flushed when it is full, when its oldest row has
+# waited max_wait_ms, or as soon as the recent arrival rate says no further
+# row is due before that deadline or the batch already holds as many rows
+# as recent batches did (every active caller is in it), so a lone caller, or
+# a fixed set of callers, is not kept waiting.
+# =============================================================================
+
+# Defaults; cropii.py and prediction_server.py only batch when
+# CROPIFY_MICRO_BATCH_MS is set (0: merge only rows that are already queued)
+DEFAULT_MAX_BATCH = int(os.getenv("CROPIFY_MICRO_BATCH_SIZE", "64"))
+DEFAULT_MAX_WAIT_MS = float(os.getenv("CROPIFY_MICRO_BATCH_MS", "2"))
+# Batch size histogram upper bounds (the last bucket is open-ended)
+BATCH_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128]
+# Weight of the newest gap in the moving average of inter-arrival times
+ARRIVAL_SMOOTHING = 0.2
+# Batches remembered when estimating how many callers are active
+RECENT_BATCHES = 8
+FLUSH_REASONS = ('full', 'deadline', 'idle')
+
+class MicroBatcher:
+    """
+    Thread-safe dispatcher that merges single-row predictions into batches
+
+    All models share the scaler and label encoder (as in load_ensemble_models);
+    rows for different models queued together are scored model by model.
+
+    Args:
+        scaler: Pre-loaded scaler (None: rows are used as given)
+        label_encoder: Pre-loaded label encoder
+        max_batch: Most rows scored in one pass
+        max_wait_ms: Longest a row waits for others to join its batch
+        adaptive: Flush early when no further row is expected before the
+            deadline, or the batch is as large as the largest recent one
+        on_batch: Called with (batch size, flush reason) after every batch
+    """
+
+    def __init__(self, scaler, label_encoder, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 adaptive=True, on_batch=None):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.scaler = scaler
+        self.label_encoder = label_encoder
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.adaptive = adaptive
+        self.on_batch = on_batch
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._last_arrival = None
+        self._mean_gap = None
+        self._recent_sizes = deque(maxlen=RECENT_BATCHES)
+        self._batch_counts = [0] * (len(BATCH_BUCKETS) + 1)
+        self._flushes = dict.fromkeys(FLUSH_REASONS, 0)
+        self._rows = 0
+        self._batches = 0
+        self._errors = 0
+        self._wait_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    # --- submitting ---
+
+    def submit(self, model, features):
+        """
+        Queue one row for model
+
+        Returns:
+            Future: resolves to {'crop', 'confidence'} (or the scoring error)
+        """
+        future = Future()
+        row = np.asarray(features, dtype=float).reshape(len(FEATURE_NAMES))
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((model, row, future, time.perf_counter()))
+        return future
+
+    def predict(self, model, features, timeout=None):
+        """Blocking submit(); same result shape as predict.predict()"""
+        result = self.submit(model, features).result(timeout)
+        return {**result, 'input': dict(zip(FEATURE_NAMES, (float(value) for value in features)))}
+
+    async def predict_async(self, model, features):
+        """predict() for asyncio code; the event loop is not blocked while the batch fills"""
+        result = await asyncio.wrap_future(self.submit(model, features))
+        return {**result, 'input': dict(zip(FEATURE_NAMES, (float(value) for value in features)))}
+
+    def close(self):
+        """Score what is queued, then stop the dispatcher thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    # --- dispatching ---
+
+    def _note_arrival(self, arrived):
+        # Gaps are capped so one idle spell does not switch batching off for long
+        if self._last_arrival is not None:
+            gap = min(max(arrived - self._last_arrival, 0.0), 2 * self.max_wait)
+            self._mean_gap = gap if self._mean_gap is None else (
+                ARRIVAL_SMOOTHING * gap + (1 - ARRIVAL_SMOOTHING) * self._mean_gap)
+        self._last_arrival = arrived
+
+    def _collect(self, first):
+        """The batch opened by first, plus whether the queue was closed while collecting"""
+        batch = [first]
+        self._note_arrival(first[3])
+        deadline = first[3] + self.max_wait
+        reason = 'full'
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Rows already queued join without waiting
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                if remaining <= 0:
+                    reason = 'deadline'
+                    break
+                if self.adaptive and (self._mean_gap is None or self._mean_gap > remaining
+                                      or len(batch) >= max(self._recent_sizes, default=self.max_batch)):
+                    reason = 'idle'
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    reason = 'deadline'
+                    break
+            if item is None:
+                return batch, reason, True
+            self._note_arrival(item[3])
+            batch.append(item)
+        return batch, reason, False
+
+    def _score(self, batch):
+        by_model = {}
+        for item in batch:
+            by_model.setdefault(id(item[0]), []).append(item)
+        for items in by_model.values():
+            futures = [future for _, _, future, _ in items]
+            try:
+                result = predict_batch(np.stack([row for _, row, _, _ in items]), items[0][0],
+                                       self.scaler, self.label_encoder)
+            except Exception as e:
+                self._errors += len(items)
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            confidences = result['confidences']
+            for i, future in enumerate(futures):
+                future.set_result({
+                    'crop': str(result['crops'][i]),
+                    'confidence': None if confidences is None else float(confidences[i])
+                })
+
+    def _run(self):
+        closed = False
+        while not closed:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, reason, closed = self._collect(first)
+            started = time.perf_counter()
+            self._recent_sizes.append(len(batch))
+            self._score(batch)
+            with self._lock:
+                self._batches += 1
+                self._rows += len(batch)
+                self._flushes[reason] += 1
+                self._batch_counts[np.searchsorted(BATCH_BUCKETS, len(batch))] += 1
+                self._wait_seconds += sum(started - arrived for _, _, _, arrived in batch)
+            if self.on_batch is not None:
+                self.on_batch(len(batch), reason)
+
+    # --- reporting ---
+
+    def stats(self):
+        """Rows, batches, flush reasons, mean queue wait and the batch size histogram"""
+        with self._lock:
+            return {
+                'rows': self._rows,
+                'batches': self._batches,
+                'errors': self._errors,
+                'mean_batch_size': self._rows / self._batches if self._batches else None,
+                'mean_wait_ms': self._wait_seconds / self._rows * 1000 if self._rows else None,
+                'flushes': dict(self._flushes),
+                'batch_size_buckets': {
+                    **{f"<={bound}": count for bound, count in zip(BATCH_BUCKETS, self._batch_counts)},
+                    f">{BATCH_BUCKETS[-1]}": self._batch_counts[-1]
+                },
+                'max_batch': self.max_batch,
+                'max_wait_ms': self.max_wait * 1000
+            }
+
+# =============================================================================
+# Benchmark - concurrent single-row callers, direct vs batched
+# =============================================================================
+
+def _random_rows(count, seed=0):
+    rng = np.random.default_rng(seed)
+    low = np.array([0, 5, 5, 10, 15, 3.5, 20])
+    high = np.array([140, 145, 205, 45, 100, 9.5, 300])
+    return rng.uniform(low, high, size=(count, len(FEATURE_NAMES)))
+
+def _run_threads(call, rows, threads):
+    chunks = np.array_split(rows, threads)
+    workers = [threading.Thread(target=lambda chunk=chunk: [call(row) for row in chunk]) for chunk in chunks]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+def bench(model_name='MLP', engine=None, requests=4000, threads=16, max_batch=DEFAULT_MAX_BATCH,
+          max_wait_ms=DEFAULT_MAX_WAIT_MS, use_asyncio=False):
+    """
+    Score the same rows from concurrent callers, once per call and once through a MicroBatcher
+
+    Returns:
+        dict: rows per second of both, agreement of their answers and the batcher's stats
+    """
+    from predict import load_ensemble_models
+
+    models, scaler, label_encoder = load_ensemble_models(engine)
+    model = models[model_name]
+    rows = _random_rows(requests)
+    direct, batched = [None] * requests, [None] * requests
+
+    def direct_call(i):
+        result = predict_batch(rows[i:i + 1], model, scaler, label_encoder)
+        direct[i] = str(result['crops'][0])
+
+    direct_seconds = _run_threads(direct_call, np.arange(requests), threads)
+
+    batcher = MicroBatcher(scaler, label_encoder, max_batch, max_wait_ms)
+    if use_asyncio:
+        async def gather():
+            semaphore = asyncio.Semaphore(threads)
+
+            async def one(i):
+                async with semaphore:
+                    batched[i] = (await batcher.predict_async(model, rows[i]))['crop']
+            await asyncio.gather(*(one(i) for i in range(requests)))
+
+        start = time.perf_counter()
+        asyncio.run(gather())
+        batched_seconds = time.perf_counter() - start
+    else:
+        def batched_call(i):
+            batched[i] = batcher.predict(model, rows[i])['crop']
+        batched_seconds = _run_threads(batched_call, np.arange(requests), threads)
+    batcher.close()
+
+    return {
+        'model': model_name,
+        'requests': requests,
+        'concurrency': threads,
+        'caller': 'asyncio' if use_asyncio else 'threads',
+        'direct_rows_per_second': requests / direct_seconds,
+        'batched_rows_per_second': requests / batched_seconds,
+        'speedup': direct_seconds / batched_seconds,
+        'agreement': float(np.mean([a == b for a, b in zip(direct, batched)])),
+        'batcher': batcher.stats()
+    }
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the micro-batching dispatcher")
+    parser.add_argument('--model', default='MLP', help="Model name (default: MLP)")
+    parser.add_argument('--engine', choices=['sklearn', 'bundle'], default=None,
+                        help="Model source (default: CROPIFY_ENGINE or sklearn)")
+    parser.add_argument('--requests', type=int, default=4000, help="Rows to score (default: 4000)")
+    parser.add_argument('--concurrency', type=int, default=16, help="Concurrent callers (default: 16)")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                        help=f"Rows per batch (default: {DEFAULT_MAX_BATCH})")
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help=f"Longest wait for a batch to fill (default: {DEFAULT_MAX_WAIT_MS:g})")
+    parser.add_argument('--asyncio', action='store_true', help="Batched callers are asyncio tasks, not threads")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(bench(args.model, args.engine, args.requests, args.concurrency, args.max_batch,
+                           args.max_wait_ms, args.asyncio), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
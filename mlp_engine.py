@@ -0,0 +1,196 @@
+import sys
+import json
+import numpy as np
+
+# =============================================================================
+# mlp_engine.py - Pure-NumPy MLP Inference Engine
+# Runs the trained MLPClassifier as a few float32 matmuls with the
+# StandardScaler folded into the first layer. No sklearn import at request time.
+# =============================================================================
+
+FUSED_MLP_PATH = 'MLP_fused.npz'
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+def _tanh(x):
+    return np.tanh(x, out=x)
+
+def _logistic(x):
+    return np.divide(1, 1 + np.exp(-x), out=x)
+
+def _identity(x):
+    return x
+
+HIDDEN_ACTIVATIONS = {
+    'relu': _relu,
+    'tanh': _tanh,
+    'logistic': _logistic,
+    'identity': _identity
+}
+
+def export_fused_mlp(model_path='MLP.pkl', scaler_path='scaler.pkl',
+                     label_encoder_path='label_encoder.pkl', output_path=FUSED_MLP_PATH):
+    """
+    Fold the scaler into the MLP's first layer and save plain arrays
+
+    Scaling then the first layer, ((x - mean) / scale) @ W + b, is rewritten
+    as x @ (W / scale[:, None]) + (b - (mean / scale) @ W), so inference
+    starts directly from the raw features.
+
+    Args:
+        model_path: Trained MLPClassifier pickle
+        scaler_path: StandardScaler pickle (skipped if None)
+        label_encoder_path: LabelEncoder pickle, stored as plain class names
+        output_path: Destination .npz file
+
+    Returns:
+        str: output_path
+    """
+    import joblib
+
+    model = joblib.load(model_path)
+    coefs = [np.asarray(w, dtype=np.float64) for w in model.coefs_]
+    intercepts = [np.asarray(b, dtype=np.float64) for b in model.intercepts_]
+
+    if scaler_path:
+        scaler = joblib.load(scaler_path)
+        n_features = coefs[0].shape[0]
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+        intercepts[0] = intercepts[0] - (mean / scale) @ coefs[0]
+        coefs[0] = coefs[0] / scale[:, None]
+
+    arrays = {
+        'hidden_activation': np.array(model.activation),
+        'out_activation': np.array(model.out_activation_),
+        'classes': np.asarray(model.classes_),
+        'n_layers': np.array(len(coefs))
+    }
+    if label_encoder_path:
+        arrays['labels'] = np.asarray(joblib.load(label_encoder_path).classes_).astype(str)
+    for i, (w, b) in enumerate(zip(coefs, intercepts)):
+        arrays[f'coef_{i}'] = np.ascontiguousarray(w, dtype=np.float32)
+        arrays[f'intercept_{i}'] = np.ascontiguousarray(b, dtype=np.float32)
+
+    np.savez(output_path, **arrays)
+    return output_path
+
+class FusedMLP:
+    """
+    Inference-only MLP with the StandardScaler fused in
+
+    Exposes the classifier API used by predict.py (predict, predict_proba,
+    classes_) but expects raw, unscaled features.
+    """
+
+    def __init__(self, coefs, intercepts, classes, hidden_activation='relu', out_activation='softmax'):
+        self.coefs_ = coefs
+        self.intercepts_ = intercepts
+        self.classes_ = classes
+        self.activation = hidden_activation
+        self.out_activation_ = out_activation
+        self._hidden = HIDDEN_ACTIVATIONS[hidden_activation]
+
+    @classmethod
+    def load(cls, path=FUSED_MLP_PATH):
+        """Load an engine written by export_fused_mlp()"""
+        with np.load(path) as data:
+            n_layers = int(data['n_layers'])
+            return cls(
+                coefs=[data[f'coef_{i}'] for i in range(n_layers)],
+                intercepts=[data[f'intercept_{i}'] for i in range(n_layers)],
+                classes=data['classes'],
+                hidden_activation=str(data['hidden_activation']),
+                out_activation=str(data['out_activation'])
+            )
+
+    def _forward(self, X):
+        # Compute in the weights' precision (float32 for the fused export)
+        activation = np.asarray(X, dtype=self.coefs_[0].dtype)
+        if activation.ndim == 1:
+            activation = activation.reshape(1, -1)
+        last = len(self.coefs_) - 1
+        for i, (w, b) in enumerate(zip(self.coefs_, self.intercepts_)):
+            activation = activation @ w
+            activation += b
+            if i != last:
+                activation = self._hidden(activation)
+        return activation
+
+    def predict_proba(self, X):
+        """Class probabilities for raw (unscaled) features"""
+        logits = self._forward(X)
+        if self.out_activation_ == 'softmax':
+            logits -= logits.max(axis=1, keepdims=True)
+            np.exp(logits, out=logits)
+            logits /= logits.sum(axis=1, keepdims=True)
+            return logits
+        # Binary / multilabel models end in a logistic unit
+        positive = _logistic(logits)
+        if positive.shape[1] == 1:
+            return np.hstack([1 - positive, positive])
+        return positive
+
+    def predict(self, X):
+        """Encoded class predictions for raw (unscaled) features"""
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+class LabelDecoder:
+    """Minimal stand-in for LabelEncoder.inverse_transform without sklearn"""
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+
+    def inverse_transform(self, y):
+        return self.classes_[np.asarray(y, dtype=np.intp)]
+
+def load_fused_models(path=FUSED_MLP_PATH):
+    """
+    Load the fused engine in the same shape as predict.load_models()
+
+    Returns:
+        tuple: (model, None, label_decoder) - no scaler, it is folded in
+    """
+    engine = FusedMLP.load(path)
+    with np.load(path) as data:
+        decoder = LabelDecoder(data['labels'])
+    return engine, None, decoder
+
+def verify_against_sklearn(csv_path='csv/Crop_recommendation.csv', fused_path=FUSED_MLP_PATH,
+                           model_path='MLP.pkl', scaler_path='scaler.pkl'):
+    """
+    Compare the fused engine with the sklearn pipeline on a labelled CSV
+
+    Returns:
+        dict: rows compared, top-1 agreement and max probability difference
+    """
+    import joblib
+    import pandas as pd
+    from predict import FEATURE_NAMES
+
+    X = pd.read_csv(csv_path)[FEATURE_NAMES]
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    expected = model.predict_proba(scaler.transform(X))
+    actual = FusedMLP.load(fused_path).predict_proba(X.to_numpy())
+
+    return {
+        'rows': len(X),
+        'top1_agreement': float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean()),
+        'max_abs_proba_diff': float(np.abs(expected - actual).max())
+    }
+
+if __name__ == "__main__":
+    # python mlp_engine.py --export    (writes MLP_fused.npz from the pickles)
+    # python mlp_engine.py --verify    (equivalence check against sklearn)
+    if len(sys.argv) == 2 and sys.argv[1] == '--export':
+        print(json.dumps({'written': export_fused_mlp()}))
+    elif len(sys.argv) == 2 and sys.argv[1] == '--verify':
+        report = verify_against_sklearn()
+        print(json.dumps(report))
+        # float32 rounding must never change the recommended crop
+        sys.exit(0 if report['top1_agreement'] == 1.0 and report['max_abs_proba_diff'] < 1e-4 else 1)
+    else:
+        print(json.dumps({'error': 'Invalid arguments. Expected: --export or --verify'}))
+        sys.exit(1)
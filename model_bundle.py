@@ -0,0 +1,296 @@
+import os
+import sys
+import json
+import shutil
+import threading
+import numpy as np
+
+from mlp_engine import FusedMLP, LabelDecoder
+from forest_engine import CompiledForest
+
+# =============================================================================
+# model_bundle.py - Versioned, Non-Pickle Model Bundle
+# A manifest plus raw .npy arrays for every model, the scaler statistics and
+# the label classes. Each model's arrays are memory-mapped only when that model
+# is first used, so unused models are never read and processes share pages.
+# =============================================================================
+
+BUNDLE_PATH = 'model_bundle'
+BUNDLE_VERSION = 1
+
+# Display name -> source pickle, same models as the Streamlit sidebar
+MODEL_PATHS = {
+    "Random Forest": r"random_forest.pkl",
+    "MLP": r"MLP.pkl",
+    "Naive Bayes": r"naive_bayes.pkl",
+    "Decision Tree": r"random_tree.pkl"
+}
+
+def _load_array(path, mmap_mode='r'):
+    """Memory-map one .npy file and drop the np.memmap subclass"""
+    return np.load(path, mmap_mode=mmap_mode).view(np.ndarray)
+
+def _model_kind(model):
+    """Bundle kind for a fitted sklearn classifier"""
+    name = type(model).__name__
+    if name in ('RandomForestClassifier', 'ExtraTreesClassifier', 'DecisionTreeClassifier'):
+        return 'forest'
+    if name == 'MLPClassifier':
+        return 'mlp'
+    if name == 'GaussianNB':
+        return 'gaussian_nb'
+    raise ValueError(f"Cannot export {name} to a model bundle")
+
+class BundleScaler:
+    """StandardScaler.transform from stored mean/scale arrays"""
+
+    def __init__(self, mean, scale, feature_names):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.feature_names = feature_names
+
+    def transform(self, X):
+        if hasattr(X, 'columns'):
+            X = X[self.feature_names].to_numpy(dtype=np.float64)
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+class NaiveBayesEngine:
+    """
+    GaussianNB inference from stored theta/var/prior arrays
+
+    Exposes the classifier API used by predict.py (predict, predict_proba,
+    classes_) on scaled features.
+    """
+
+    def __init__(self, theta, var, class_prior, classes):
+        self.theta_ = theta
+        self.var_ = var
+        self.class_prior_ = class_prior
+        self.classes_ = classes
+        # Per-class constant of the Gaussian log-likelihood
+        self._log_norm = np.log(class_prior) - 0.5 * np.log(2.0 * np.pi * var).sum(axis=1)
+
+    def _joint_log_likelihood(self, X):
+        X = np.asarray(X, dtype=self.theta_.dtype)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        squared = (X[:, None, :] - self.theta_) ** 2
+        return self._log_norm - 0.5 * (squared / self.var_).sum(axis=2)
+
+    def predict_proba(self, X):
+        jll = self._joint_log_likelihood(X)
+        jll -= jll.max(axis=1, keepdims=True)
+        np.exp(jll, out=jll)
+        jll /= jll.sum(axis=1, keepdims=True)
+        return jll
+
+    def predict(self, X):
+        return self.classes_[self._joint_log_likelihood(X).argmax(axis=1)]
+
+def _export_model(model, directory):
+    """Write one model's arrays into directory; returns its manifest entry"""
+    kind = _model_kind(model)
+    os.makedirs(directory, exist_ok=True)
+    entry = {'kind': kind}
+
+    if kind == 'forest':
+        from forest_engine import compile_forest
+        compile_forest(model).save(directory)
+    elif kind == 'mlp':
+        for i, (w, b) in enumerate(zip(model.coefs_, model.intercepts_)):
+            np.save(os.path.join(directory, f'coef_{i}.npy'), np.ascontiguousarray(w))
+            np.save(os.path.join(directory, f'intercept_{i}.npy'), np.ascontiguousarray(b))
+        np.save(os.path.join(directory, 'classes.npy'), np.asarray(model.classes_))
+        entry.update(n_layers=len(model.coefs_), hidden_activation=model.activation,
+                     out_activation=model.out_activation_)
+    elif kind == 'gaussian_nb':
+        np.save(os.path.join(directory, 'theta.npy'), np.ascontiguousarray(model.theta_))
+        np.save(os.path.join(directory, 'var.npy'), np.ascontiguousarray(model.var_))
+        np.save(os.path.join(directory, 'class_prior.npy'), np.asarray(model.class_prior_))
+        np.save(os.path.join(directory, 'classes.npy'), np.asarray(model.classes_))
+    return entry
+
+def export_bundle(output_dir=BUNDLE_PATH, model_paths=MODEL_PATHS,
+                  scaler_path='scaler.pkl', label_encoder_path='label_encoder.pkl'):
+    """
+    Convert the current pickles into a model bundle
+
+    The manifest is written last, so a bundle interrupted mid-export is never
+    picked up by the loaders.
+
+    Args:
+        output_dir: Bundle directory (replaced if it exists)
+        model_paths: Display name -> pickle path; missing files are skipped
+        scaler_path: StandardScaler pickle
+        label_encoder_path: LabelEncoder pickle
+
+    Returns:
+        dict: The manifest that was written
+    """
+    import joblib
+    import sklearn
+    from predict import FEATURE_NAMES
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    scaler = joblib.load(scaler_path)
+    np.save(os.path.join(output_dir, 'scaler_mean.npy'), np.asarray(scaler.mean_, dtype=np.float64))
+    np.save(os.path.join(output_dir, 'scaler_scale.npy'), np.asarray(scaler.scale_, dtype=np.float64))
+    labels = np.asarray(joblib.load(label_encoder_path).classes_).astype(str)
+    np.save(os.path.join(output_dir, 'labels.npy'), labels)
+
+    manifest = {
+        'format_version': BUNDLE_VERSION,
+        'sklearn_version': sklearn.__version__,
+        'feature_names': FEATURE_NAMES,
+        'models': {},
+        'sources': {}
+    }
+    for name, path in model_paths.items():
+        if not os.path.exists(path):
+            continue
+        directory = os.path.splitext(os.path.basename(path))[0]
+        entry = _export_model(joblib.load(path), os.path.join(output_dir, directory))
+        entry['path'] = directory
+        manifest['models'][name] = entry
+    for path in [scaler_path, label_encoder_path, *model_paths.values()]:
+        if os.path.exists(path):
+            manifest['sources'][path] = os.path.getmtime(path)
+
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+class ModelBundle:
+    """
+    Lazy reader for a model bundle
+
+    Opening a bundle only reads manifest.json. The scaler, the label classes
+    and each model are memory-mapped on first access and then reused.
+    """
+
+    def __init__(self, path=BUNDLE_PATH, mmap_mode='r'):
+        self.path = path
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(path, 'manifest.json'), 'r') as file:
+            self.manifest = json.load(file)
+        if self.manifest['format_version'] != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported model bundle version {self.manifest['format_version']} in {path}")
+        self._models = {}
+        self._scaler = None
+        self._label_encoder = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def exists(path=BUNDLE_PATH):
+        return os.path.exists(os.path.join(path, 'manifest.json'))
+
+    def model_names(self):
+        return list(self.manifest['models'])
+
+    def is_stale(self):
+        """True if any source pickle changed after the bundle was exported"""
+        return any(not os.path.exists(source) or os.path.getmtime(source) > mtime
+                   for source, mtime in self.manifest['sources'].items())
+
+    def _array(self, *parts):
+        return _load_array(os.path.join(self.path, *parts), self.mmap_mode)
+
+    @property
+    def scaler(self):
+        if self._scaler is None:
+            self._scaler = BundleScaler(self._array('scaler_mean.npy'), self._array('scaler_scale.npy'),
+                                        self.manifest['feature_names'])
+        return self._scaler
+
+    @property
+    def label_encoder(self):
+        if self._label_encoder is None:
+            self._label_encoder = LabelDecoder(self._array('labels.npy'))
+        return self._label_encoder
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def get(self, name):
+        """Model by display name, memory-mapped on first use"""
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = self.load(name)
+            return self._models[name]
+
+    def load(self, name):
+        """Fresh, uncached model by display name (for callers with their own cache)"""
+        return self._load_model(self.manifest['models'][name])
+
+    def _load_model(self, entry):
+        directory = entry['path']
+        if entry['kind'] == 'forest':
+            return CompiledForest.load(os.path.join(self.path, directory), mmap_mode=self.mmap_mode)
+        if entry['kind'] == 'mlp':
+            n_layers = entry['n_layers']
+            return FusedMLP(
+                coefs=[self._array(directory, f'coef_{i}.npy') for i in range(n_layers)],
+                intercepts=[self._array(directory, f'intercept_{i}.npy') for i in range(n_layers)],
+                classes=self._array(directory, 'classes.npy'),
+                hidden_activation=entry['hidden_activation'],
+                out_activation=entry['out_activation']
+            )
+        if entry['kind'] == 'gaussian_nb':
+            return NaiveBayesEngine(
+                theta=self._array(directory, 'theta.npy'),
+                var=self._array(directory, 'var.npy'),
+                class_prior=self._array(directory, 'class_prior.npy'),
+                classes=self._array(directory, 'classes.npy')
+            )
+        raise ValueError(f"Unknown model kind '{entry['kind']}' in {self.path}")
+
+def load_bundle_models(name="MLP", path=BUNDLE_PATH):
+    """
+    Load one bundled model in the same shape as predict.load_models()
+
+    Returns:
+        tuple: (model, scaler, label_encoder)
+    """
+    bundle = ModelBundle(path)
+    return bundle.get(name), bundle.scaler, bundle.label_encoder
+
+def verify_against_pickles(csv_path='csv/Crop_recommendation.csv', path=BUNDLE_PATH):
+    """
+    Compare every bundled model with its source pickle on a labelled CSV
+
+    Returns:
+        dict: per model, top-1 agreement and max probability difference
+    """
+    import joblib
+    import pandas as pd
+    from predict import FEATURE_NAMES
+
+    X = pd.read_csv(csv_path)[FEATURE_NAMES]
+    bundle = ModelBundle(path)
+    expected_X = joblib.load('scaler.pkl').transform(X)
+    actual_X = bundle.scaler.transform(X)
+    report = {}
+    for name in bundle.model_names():
+        expected = joblib.load(MODEL_PATHS[name]).predict_proba(expected_X)
+        actual = bundle.get(name).predict_proba(actual_X)
+        report[name] = {
+            'top1_agreement': float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean()),
+            'max_abs_proba_diff': float(np.abs(expected - actual).max())
+        }
+    return report
+
+if __name__ == "__main__":
+    # python model_bundle.py --export    (writes model_bundle/ from the pickles)
+    # python model_bundle.py --verify    (bundled models vs. the pickles)
+    if len(sys.argv) == 2 and sys.argv[1] == '--export':
+        print(json.dumps({'written': BUNDLE_PATH, 'models': list(export_bundle()['models'])}))
+    elif len(sys.argv) == 2 and sys.argv[1] == '--verify':
+        report = verify_against_pickles()
+        print(json.dumps(report))
+        sys.exit(0 if all(r['top1_agreement'] == 1.0 for r in report.values()) else 1)
+    else:
+        print(json.dumps({'error': 'Invalid arguments. Expected: --export or --verify'}))
+        sys.exit(1)
@@ -0,0 +1,126 @@
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# =============================================================================
+# model_registry.py - Process-Wide Model Registry
+# Loads each model once on first use, optionally warms it up, tracks its memory
+# footprint and evicts least recently used models under a memory budget.
+# =============================================================================
+
+def estimate_size(obj, _seen=None):
+    """
+    Approximate memory footprint of a model in bytes
+
+    Sums the nbytes of every NumPy array reachable from obj through attributes,
+    containers and __getstate__ (which is how sklearn's Cython tree objects
+    expose their node arrays). Shared arrays are counted once.
+    """
+    if _seen is None:
+        # id -> object; holding the object keeps temporary __getstate__ results
+        # alive so their ids cannot be recycled during the walk
+        _seen = {}
+    if id(obj) in _seen or obj is None or isinstance(obj, (str, bytes, int, float, bool)):
+        return 0
+    _seen[id(obj)] = obj
+
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(estimate_size(v, _seen) for v in obj.values())
+    if isinstance(obj, (list, tuple, set)):
+        return sum(estimate_size(v, _seen) for v in obj)
+    if hasattr(obj, '__dict__'):
+        return estimate_size(vars(obj), _seen)
+    try:
+        state = obj.__getstate__()
+    except Exception:
+        return 0
+    return estimate_size(state, _seen) if state is not obj else 0
+
+class ModelRegistry:
+    """
+    Lazily loaded, memory-bounded cache of models shared by all sessions
+
+    Args:
+        loaders: Model name -> zero-argument callable that loads the model
+        memory_budget: Max total estimated bytes of loaded models (None = no limit).
+            The most recently used model is always kept, even if it alone is larger.
+        warm_up: Run one dummy predict_proba right after loading
+        n_features: Width of the dummy warm-up input
+    """
+
+    def __init__(self, loaders, memory_budget=None, warm_up=True, n_features=7):
+        self.loaders = dict(loaders)
+        self.memory_budget = memory_budget
+        self.warm_up = warm_up
+        self.n_features = n_features
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._stats = {name: {'loads': 0, 'hits': 0, 'evictions': 0,
+                              'load_seconds': None, 'warmup_seconds': None}
+                       for name in self.loaders}
+        self._lock = threading.Lock()
+        self._load_locks = {name: threading.Lock() for name in self.loaders}
+
+    def names(self):
+        return list(self.loaders)
+
+    def get(self, name):
+        """Model by name; loads (and warms up) on first use or after eviction"""
+        if name not in self.loaders:
+            raise KeyError(f"Unknown model '{name}'")
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                self._stats[name]['hits'] += 1
+                return self._models[name]
+
+        # Per-model lock: concurrent sessions asking for the same model wait
+        # for a single load, while other models stay available
+        with self._load_locks[name]:
+            with self._lock:
+                if name in self._models:
+                    self._models.move_to_end(name)
+                    self._stats[name]['hits'] += 1
+                    return self._models[name]
+            model, size = self._load(name)
+            with self._lock:
+                self._models[name] = model
+                self._sizes[name] = size
+                self._evict()
+            return model
+
+    def _load(self, name):
+        stats = self._stats[name]
+        start = time.perf_counter()
+        model = self.loaders[name]()
+        stats['load_seconds'] = time.perf_counter() - start
+        stats['loads'] += 1
+
+        if self.warm_up and hasattr(model, 'predict_proba'):
+            start = time.perf_counter()
+            model.predict_proba(np.zeros((1, self.n_features)))
+            stats['warmup_seconds'] = time.perf_counter() - start
+        return model, estimate_size(model)
+
+    def _evict(self):
+        """Drop least recently used models until the budget is met (lock held)"""
+        if self.memory_budget is None:
+            return
+        while len(self._models) > 1 and self.loaded_bytes() > self.memory_budget:
+            name, _ = self._models.popitem(last=False)
+            del self._sizes[name]
+            self._stats[name]['evictions'] += 1
+
+    def loaded_bytes(self):
+        return sum(self._sizes.values())
+
+    def stats(self):
+        """Per-model counters plus whether and how large each model is loaded"""
+        with self._lock:
+            return {
+                name: dict(stats, loaded=name in self._models, bytes=self._sizes.get(name))
+                for name, stats in self._stats.items()
+            }
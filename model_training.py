@@ -1,3 +1,9 @@
+import os
+import sys
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
@@ -9,42 +15,221 @@ from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
 
-df = pd.read_csv(r"csv/Crop_recommendation.csv")
-
-X = df.drop("label", axis=1)
-y = df["label"]
-
-# Encode labels
-le = LabelEncoder()
-y_encoded = le.fit_transform(y)
-
-# Scale features using StandardScaler
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-X_train, X_test, y_train, y_test = train_test_split(
-    X_scaled, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
-)
-
-# Train models
-rf = RandomForestClassifier(n_estimators=100, random_state=42).fit(X_train, y_train)
-mlp = MLPClassifier(hidden_layer_sizes=(100,50), max_iter=1000, random_state=42).fit(X_train, y_train)
-dt = DecisionTreeClassifier(random_state=42).fit(X_train, y_train)
-nb = GaussianNB().fit(X_train, y_train)
-
-# Print results
-for name, model in [("Random Forest", rf), ("MLP", mlp), ("Decision Tree", dt), ("Naive Bayes", nb)]:
-    preds = model.predict(X_test)
-    print(f"{name}: {accuracy_score(y_test, preds)*100:.2f}%")
-    print(classification_report(y_test, preds, target_names=le.classes_))
-    print("---")
-
-# Save models
-joblib.dump(rf, r"random_forest.pkl")
-joblib.dump(mlp, r"MLP.pkl")
-joblib.dump(dt, r"random_tree.pkl")
-joblib.dump(nb, r"naive_bayes.pkl")
-joblib.dump(le, r"label_encoder.pkl")
-joblib.dump(scaler, r"scaler.pkl")
-
-print("Done")
\ No newline at end of file
+# =============================================================================
+# model_training.py - Training Pipeline
+# Preprocesses the dataset once (cached on disk, keyed by the CSV's content
+# hash), trains the four models concurrently in a process pool and exports
+# the pickles plus the fast runtime artifacts.
+# =============================================================================
+
+DATASET_PATH = r"csv/Crop_recommendation.csv"
+PREPROCESS_CACHE_DIR = r".training_cache"
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+# Bump when preprocess() output changes, so old cache files are not reused
+PREPROCESS_VERSION = 2
+
+# Model name -> output pickle
+MODEL_OUTPUTS = {
+    "Random Forest": r"random_forest.pkl",
+    "MLP": r"MLP.pkl",
+    "Decision Tree": r"random_tree.pkl",
+    "Naive Bayes": r"naive_bayes.pkl"
+}
+
+def build_model(name):
+    """Untrained estimator for a model name (same hyperparameters as always)"""
+    if name == "Random Forest":
+        # Trees are built on all cores
+        return RandomForestClassifier(n_estimators=100, random_state=RANDOM_STATE, n_jobs=-1)
+    if name == "MLP":
+        return MLPClassifier(hidden_layer_sizes=(100,50), max_iter=1000, random_state=RANDOM_STATE)
+    if name == "Decision Tree":
+        return DecisionTreeClassifier(random_state=RANDOM_STATE)
+    if name == "Naive Bayes":
+        return GaussianNB()
+    raise ValueError(f"Unknown model '{name}'. Expected one of: {', '.join(MODEL_OUTPUTS)}")
+
+def file_hash(path):
+    """SHA-256 of a file's contents, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def preprocess(df):
+    """
+    Encode labels, fit the scaler and make the stratified train/test split
+
+    Returns:
+        dict: X_train, X_test, y_train, y_test (scaled / encoded), X_test_raw
+        (unscaled held-out features), scaler, label_encoder
+    """
+    X = df.drop("label", axis=1)
+    y = df["label"]
+
+    # Encode labels
+    le = LabelEncoder()
+    y_encoded = le.fit_transform(y)
+
+    # Scale features using StandardScaler
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+
+    X_train, X_test, y_train, y_test, _, X_test_raw = train_test_split(
+        X_scaled, y_encoded, X.to_numpy(dtype=float),
+        test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y_encoded
+    )
+    return {
+        'X_train': X_train, 'X_test': X_test,
+        'y_train': y_train, 'y_test': y_test,
+        'X_test_raw': X_test_raw,
+        'scaler': scaler, 'label_encoder': le
+    }
+
+def preprocessed_cache_path(csv_path=DATASET_PATH, cache_dir=PREPROCESS_CACHE_DIR):
+    """Cache file for a dataset; the name changes whenever the CSV content does"""
+    key = f"{file_hash(csv_path)}:{TEST_SIZE}:{RANDOM_STATE}:{PREPROCESS_VERSION}"
+    key = hashlib.sha256(key.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"preprocessed-{key}.joblib")
+
+def load_dataset(csv_path=DATASET_PATH, use_cache=True, mmap_mode=None):
+    """
+    Preprocessed dataset, read from the cache when the CSV is unchanged
+
+    Args:
+        csv_path: Training CSV (N, P, K, temperature, humidity, ph, rainfall, label)
+        use_cache: Read/write the on-disk preprocessing cache
+        mmap_mode: Passed to joblib.load, e.g. 'r' to memory-map the arrays
+
+    Returns:
+        tuple: (preprocess() dict, cache path or None, True if it was a cache hit)
+    """
+    if not use_cache:
+        return preprocess(pd.read_csv(csv_path)), None, False
+    path = preprocessed_cache_path(csv_path)
+    if os.path.exists(path):
+        return joblib.load(path, mmap_mode=mmap_mode), path, True
+    data = preprocess(pd.read_csv(csv_path))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    joblib.dump(data, tmp_path)
+    os.replace(tmp_path, path)
+    return data, path, False
+
+def train_model(name, data_path=None, data=None):
+    """
+    Fit one model; runs inside a pool worker
+
+    Workers memory-map the preprocessed arrays from data_path instead of
+    receiving a pickled copy of the training set.
+
+    Returns:
+        tuple: (name, fitted model, training wall time in seconds)
+    """
+    if data is None:
+        data = joblib.load(data_path, mmap_mode='r')
+    start = time.perf_counter()
+    model = build_model(name).fit(data['X_train'], data['y_train'])
+    seconds = time.perf_counter() - start
+    if hasattr(model, 'n_jobs'):
+        # n_jobs=-1 only pays off for fitting; at prediction time the thread
+        # pool start-up would dominate single-row latency
+        model.n_jobs = None
+    return name, model, seconds
+
+def train_all(data, data_path=None, jobs=None):
+    """
+    Train every model, concurrently when more than one worker is available
+
+    Returns:
+        dict: name -> (fitted model, training seconds), in MODEL_OUTPUTS order
+    """
+    jobs = jobs or min(len(MODEL_OUTPUTS), os.cpu_count() or 1)
+    results = {}
+    if jobs <= 1 or data_path is None:
+        for name in MODEL_OUTPUTS:
+            _, model, seconds = train_model(name, data=data)
+            results[name] = (model, seconds)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            # The forest is the slowest model, so it is submitted first
+            futures = [pool.submit(train_model, name, data_path) for name in MODEL_OUTPUTS]
+            for future in as_completed(futures):
+                name, model, seconds = future.result()
+                results[name] = (model, seconds)
+    return {name: results[name] for name in MODEL_OUTPUTS}
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Train and export the Cropify models")
+    parser.add_argument('--csv', default=DATASET_PATH, help=f"Training data (default: {DATASET_PATH})")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="Models trained at once (default: min(4, CPU count))")
+    parser.add_argument('--no-cache', action='store_true', help="Always redo the preprocessing")
+    parser.add_argument('--compress-forest', type=float, metavar='KB',
+                        help="Also save the best compressed forest within KB (see forest_compression.py)")
+    args = parser.parse_args(argv)
+
+    total_start = time.perf_counter()
+    start = time.perf_counter()
+    data, data_path, cached = load_dataset(args.csv, use_cache=not args.no_cache)
+    print(f"Preprocessing: {time.perf_counter() - start:.2f}s ({'cached' if cached else 'computed'})")
+
+    # Train models
+    trained = train_all(data, data_path, args.jobs)
+    le = data['label_encoder']
+
+    # Print results
+    for name, (model, seconds) in trained.items():
+        preds = model.predict(data['X_test'])
+        print(f"{name}: {accuracy_score(data['y_test'], preds)*100:.2f}% (trained in {seconds:.2f}s)")
+        print(classification_report(data['y_test'], preds, target_names=le.classes_))
+        print("---")
+
+    # Save models
+    for name, (model, _) in trained.items():
+        joblib.dump(model, MODEL_OUTPUTS[name])
+    joblib.dump(le, r"label_encoder.pkl")
+    joblib.dump(data['scaler'], r"scaler.pkl")
+
+    # Export the sklearn-free MLP engine (scaler folded into the first layer)
+    from mlp_engine import export_fused_mlp
+    export_fused_mlp()
+
+    # float32 and int8 versions of the MLP and Naive Bayes
+    from quantization import export_quantized
+    export_quantized()
+
+    # Compile the tree models into memory-mappable flat arrays
+    from forest_engine import compile_forest
+    compile_forest(trained["Random Forest"][0]).save(r"random_forest.forest")
+    compile_forest(trained["Decision Tree"][0]).save(r"random_tree.forest")
+
+    # Non-pickle bundle (manifest + .npy arrays) used by cropii.py and predict.py
+    from model_bundle import export_bundle
+    export_bundle()
+
+    # KD-tree over the labelled samples in scaled space (closest samples per prediction)
+    from neighbour_index import build_index
+    build_index(args.csv, data['scaler'])
+
+    # Starting point for incremental updates (python incremental_training.py)
+    from incremental_training import record_full_training
+    record_full_training(args.csv, data)
+
+    if args.compress_forest:
+        from forest_compression import compress_file
+        report = compress_file(max_bytes=int(args.compress_forest * 1024), data=data)
+        if report['output']:
+            selected = report['candidates'][report['selected']]
+            print(f"Compressed forest: {selected['method']} {selected['params']}, "
+                  f"{selected['test_accuracy']*100:.2f}% in {selected['bytes'] / 1024:.0f} KB -> {report['output']}")
+        else:
+            print(f"Compressed forest: nothing fits in {args.compress_forest:g} KB")
+
+    print(f"Done in {time.perf_counter() - total_start:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,398 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+
+from predict import FEATURE_NAMES
+
+# =============================================================================
+# neighbour_index.py - Nearest Labelled Samples for Every Prediction
+# A KD-tree over the training CSV in the scaled feature space of scaler.pkl,
+# so distances mean the same thing the models see. The tree is complete and
+# stored in heap order (children of node i are 2i+1 and 2i+2) as flat .npy
+# arrays: rows in tree order, node boxes and split planes. Everything is
+# memory-mapped, so opening an index reads only its manifest and a query
+# pages in just the nodes and leaves it visits. A query scans the leaf its
+# input falls in, then walks the tree a few levels at a time, dropping every
+# subtree whose box is farther than the k-th distance found so far, and
+# scans the leaves that are left. The answer is exact.
+# =============================================================================
+
+INDEX_PATH = 'neighbour_index'
+INDEX_VERSION = 1
+DATASET_PATH = 'csv/Crop_recommendation.csv'
+# Most rows per leaf (leaves hold between half of this and this many)
+LEAF_SIZE = 64
+# Tree levels pruned per vectorized step (16 subtrees per surviving node)
+LEVELS_PER_STEP = 4
+# Leaves in the first scan chunk after the home leaf (doubles every chunk)
+FIRST_CHUNK = 8
+DEFAULT_NEIGHBOURS = 5
+
+def _fingerprints(paths):
+    from prediction_cache import model_fingerprint
+    return {path: model_fingerprint(path, path) for path in paths if os.path.exists(path)}
+
+def _read_dataset(csv_path, chunksize=500000):
+    """Raw features (n, 7) and labels of a CSV, read chunk by chunk"""
+    import pandas as pd
+    features, labels = [], []
+    for chunk in pd.read_csv(csv_path, usecols=FEATURE_NAMES + ['label'], chunksize=chunksize):
+        features.append(chunk[FEATURE_NAMES].to_numpy(dtype=np.float64))
+        labels.append(chunk['label'].to_numpy(dtype=str))
+    return np.concatenate(features), np.concatenate(labels)
+
+def tree_depth(rows, leaf_size=LEAF_SIZE):
+    """Levels below the root so that every leaf holds at most leaf_size rows"""
+    return int(np.ceil(np.log2(rows / leaf_size))) if rows > leaf_size else 0
+
+def build_tree(points, leaf_size=LEAF_SIZE):
+    """
+    Complete KD-tree over points in heap order
+
+    Every node is split at the median of its widest dimension, so all
+    leaves sit at the same depth and hold within one row of each other.
+
+    Returns:
+        dict: 'order' (row of each tree position), 'low' and 'high' (box of
+        every node), 'split_dim' and 'split_value' (plane of every internal
+        node: rows below the value go left) and 'leaf_ranges' (first and end
+        tree position of every leaf, left to right)
+    """
+    n, dims = points.shape
+    depth = tree_depth(n, leaf_size)
+    internal, nodes = 2 ** depth - 1, 2 ** (depth + 1) - 1
+    order = np.arange(n, dtype=np.int64)
+    low, high = np.empty((nodes, dims)), np.empty((nodes, dims))
+    split_dim = np.zeros(internal, dtype=np.int64)
+    split_value = np.zeros(internal)
+    ranges = np.zeros((nodes, 2), dtype=np.int64)
+    ranges[0] = (0, n)
+    # Heap order visits every parent before its children
+    for node in range(nodes):
+        start, end = ranges[node]
+        block = points[order[start:end]]
+        low[node], high[node] = block.min(axis=0), block.max(axis=0)
+        if node < internal:
+            dim = int(np.argmax(high[node] - low[node]))
+            mid = (start + end) // 2
+            part = np.argpartition(block[:, dim], mid - start)
+            order[start:end] = order[start:end][part]
+            split_dim[node], split_value[node] = dim, block[part[mid - start], dim]
+            ranges[2 * node + 1], ranges[2 * node + 2] = (start, mid), (mid, end)
+    return {
+        'order': order,
+        'low': low,
+        'high': high,
+        'split_dim': split_dim,
+        'split_value': split_value,
+        'leaf_ranges': ranges[internal:]
+    }
+
+def build_index(csv_path=DATASET_PATH, scaler=None, output_dir=INDEX_PATH, leaf_size=LEAF_SIZE,
+                scaler_path='scaler.pkl'):
+    """
+    Index every labelled row of csv_path in scaled space
+
+    The manifest is written last, so an interrupted build is never picked up.
+
+    Args:
+        csv_path: Training CSV (FEATURE_NAMES columns plus 'label')
+        scaler: Fitted StandardScaler (default: loaded from scaler_path)
+        output_dir: Directory for the arrays (replaced if it exists)
+        leaf_size: Most rows per leaf
+
+    Returns:
+        dict: The manifest that was written
+    """
+    if scaler is None:
+        import joblib
+        scaler = joblib.load(scaler_path)
+    start = time.perf_counter()
+    raw, label_names = _read_dataset(csv_path)
+    mean = np.asarray(scaler.mean_, dtype=np.float64)
+    scale = np.asarray(scaler.scale_, dtype=np.float64)
+    points = (raw - mean) / scale
+    labels, codes = np.unique(label_names, return_inverse=True)
+    tree = build_tree(points, leaf_size)
+    order = tree.pop('order')
+
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+    arrays = {
+        'points': points[order],
+        'features': raw[order],
+        'labels': codes[order].astype(np.uint16 if len(labels) > 255 else np.uint8),
+        'rows': order,
+        **tree
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(output_dir, f'{name}.npy'), np.ascontiguousarray(array))
+
+    manifest = {
+        'format_version': INDEX_VERSION,
+        'feature_names': FEATURE_NAMES,
+        'rows': len(points),
+        'depth': tree_depth(len(points), leaf_size),
+        'leaf_size': leaf_size,
+        'labels': labels.tolist(),
+        'scaler_mean': mean.tolist(),
+        'scaler_scale': scale.tolist(),
+        'build_seconds': time.perf_counter() - start,
+        'sources': _fingerprints([csv_path, scaler_path])
+    }
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+class NeighbourIndex:
+    """
+    k-nearest-neighbour queries against an index written by build_index()
+
+    The row arrays are memory-mapped (shared between processes, paged in
+    on demand), the tree included. Thread-safe:
+    queries keep no state on the index.
+
+    Args:
+        path: Directory written by build_index()
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), 'r') as file:
+            self.manifest = json.load(file)
+        if self.manifest['format_version'] != INDEX_VERSION:
+            raise ValueError(f"Unsupported neighbour index version {self.manifest['format_version']} in {path}")
+        self.labels = np.asarray(self.manifest['labels'])
+        self.mean = np.asarray(self.manifest['scaler_mean'])
+        self.scale = np.asarray(self.manifest['scaler_scale'])
+        self.points = self._array('points')
+        self.features = self._array('features')
+        self.codes = self._array('labels')
+        self.rows = self._array('rows')
+        self.low = self._array('low')
+        self.high = self._array('high')
+        self.split_dim = self._array('split_dim')
+        self.split_value = self._array('split_value')
+        ranges = self._array('leaf_ranges')
+        self.leaf_start, self.leaf_size = ranges[:, 0], ranges[:, 1] - ranges[:, 0]
+        self.depth = self.manifest['depth']
+        self._internal = 2 ** self.depth - 1
+
+    def _array(self, name):
+        # Plain ndarray view of the mapping: slicing a np.memmap costs microseconds
+        return np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r').view(np.ndarray)
+
+    @staticmethod
+    def exists(path=INDEX_PATH):
+        return os.path.exists(os.path.join(path, 'manifest.json'))
+
+    def is_stale(self):
+        """True if the CSV or the scaler changed (or vanished) since the index was built"""
+        return _fingerprints(self.manifest['sources']) != self.manifest['sources']
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def transform(self, X):
+        """Raw features -> the scaled space of the index"""
+        return (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+
+    def _positions(self, leaves):
+        """Tree positions of every row in leaves, as one array"""
+        sizes = self.leaf_size[leaves]
+        offsets = np.repeat(self.leaf_start[leaves] - np.cumsum(sizes) + sizes, sizes)
+        return offsets + np.arange(offsets.size)
+
+    def _distances(self, q, leaves):
+        positions = self._positions(leaves)
+        diff = self.points[positions] - q
+        return np.einsum('ij,ij->i', diff, diff), positions
+
+    def _search(self, q, k):
+        """Squared distances and tree positions of the k nearest points to scaled q, nearest first"""
+        # The leaf q falls in gives a first k-th distance to prune with
+        values = q.tolist()
+        node = 0
+        while node < self._internal:
+            node = 2 * node + (2 if values[self.split_dim[node]] >= self.split_value[node] else 1)
+        home = node - self._internal
+        distances, positions = self._distances(q, [home])
+        kth = np.partition(distances, k - 1)[k - 1] if len(distances) >= k else np.inf
+
+        # Subtrees whose box is within kth, LEVELS_PER_STEP levels at a time
+        frontier, level = np.zeros(1, dtype=np.int64), 0
+        bounds = np.zeros(1)
+        while level < self.depth:
+            step = min(LEVELS_PER_STEP, self.depth - level)
+            nodes = (((frontier[:, None] + 1) << step) - 1 + np.arange(1 << step)).ravel()
+            gap = np.maximum(self.low[nodes] - q, 0) + np.maximum(q - self.high[nodes], 0)
+            bounds = np.einsum('ij,ij->i', gap, gap)
+            keep = bounds <= kth
+            frontier, bounds = nodes[keep], bounds[keep]
+            level += step
+
+        # Remaining leaves nearest box first, in growing chunks; each chunk
+        # tightens kth, which drops more of the leaves after it
+        order = np.argsort(bounds)
+        leaves, bounds = frontier[order] - self._internal, bounds[order]
+        done, chunk = 0, FIRST_CHUNK
+        while done < len(leaves) and bounds[done] <= kth:
+            stop = min(done + chunk, int(np.searchsorted(bounds, kth, side='right')))
+            batch = leaves[done:stop]
+            batch = batch[batch != home]
+            if len(batch):
+                more, more_positions = self._distances(q, batch)
+                distances = np.concatenate([distances, more])
+                positions = np.concatenate([positions, more_positions])
+                if len(distances) > k:
+                    best = np.argpartition(distances, k - 1)[:k]
+                    distances, positions = distances[best], positions[best]
+                    kth = distances.max()
+            done, chunk = stop, chunk * 2
+
+        best = np.argpartition(distances, k - 1)[:k] if len(distances) > k else np.arange(len(distances))
+        # Nearest first; equal distances by tree position, so answers are deterministic
+        best = best[np.lexsort((positions[best], distances[best]))]
+        return distances[best], positions[best]
+
+    def query(self, X, k=DEFAULT_NEIGHBOURS, scaled=False):
+        """
+        Batched k-NN query
+
+        Args:
+            X: (n, 7) raw features in FEATURE_NAMES order (or a single row)
+            k: Neighbours per row
+            scaled: X is already in the index's scaled space
+
+        Returns:
+            tuple: (distances, positions), both (n, k) and nearest first;
+            distances are Euclidean in scaled space, positions index the
+            tree-ordered arrays (see neighbours_at)
+        """
+        k = min(int(k), len(self))
+        Q = np.asarray(X, dtype=np.float64).reshape(-1, len(FEATURE_NAMES))
+        if not scaled:
+            Q = self.transform(Q)
+        distances = np.empty((len(Q), k))
+        positions = np.empty((len(Q), k), dtype=np.int64)
+        for i, q in enumerate(Q):
+            distances[i], positions[i] = self._search(q, k)
+        return np.sqrt(distances), positions
+
+    def samples(self, positions):
+        """CSV data rows (0-based) and crops of tree positions (any shape)"""
+        positions = np.asarray(positions)
+        return self.rows[positions], self.labels[self.codes[positions]]
+
+    def neighbours_at(self, distances, positions):
+        """Readable neighbours for one row of query() results"""
+        return [{
+            'row': int(self.rows[position]),
+            'crop': str(self.labels[self.codes[position]]),
+            'distance': float(distance),
+            'features': dict(zip(FEATURE_NAMES, self.features[position].tolist()))
+        } for distance, position in zip(distances, positions)]
+
+    def nearest(self, features, k=DEFAULT_NEIGHBOURS):
+        """
+        The k labelled samples closest to one input
+
+        Returns:
+            list: dicts with 'row' (0-based CSV data row), 'crop', 'distance'
+            (scaled space) and the sample's raw 'features', nearest first
+        """
+        distances, positions = self.query(features, k)
+        return self.neighbours_at(distances[0], positions[0])
+
+    def nearest_batch(self, X, k=DEFAULT_NEIGHBOURS):
+        """nearest() for every row of an (n, 7) array"""
+        distances, positions = self.query(X, k)
+        return [self.neighbours_at(d, p) for d, p in zip(distances, positions)]
+
+def check_index(index, queries=1000, k=DEFAULT_NEIGHBOURS, seed=0):
+    """
+    Compare the tree's answers with a brute-force scan and time both
+
+    Queries are dataset rows plus noise (realistic inputs) and uniform
+    points over the feature ranges (far from the data).
+
+    Returns:
+        dict: mismatching queries and per-query latency of both methods
+    """
+    rng = np.random.default_rng(seed)
+    features = np.asarray(index.features)
+    low, high = features.min(axis=0), features.max(axis=0)
+    near = features[rng.integers(0, len(features), queries // 2)]
+    near = near + rng.normal(0, 0.05, near.shape) * (high - low)
+    X = np.vstack([near, rng.uniform(low, high, (queries - len(near), features.shape[1]))])
+
+    start = time.perf_counter()
+    for row in X:
+        index.query(row, k)
+    single_ms = (time.perf_counter() - start) / len(X) * 1000
+    start = time.perf_counter()
+    distances, _ = index.query(X, k)
+    batch_ms = (time.perf_counter() - start) / len(X) * 1000
+
+    # Brute force over every point, in blocks of queries
+    points = np.asarray(index.points)
+    Q = index.transform(X)
+    start = time.perf_counter()
+    expected = np.empty_like(distances)
+    block = max(1, (8 * 1024 * 1024) // points.nbytes)
+    for first in range(0, len(Q), block):
+        squared = ((Q[first:first + block, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+        expected[first:first + block] = np.sqrt(np.sort(np.partition(squared, k - 1, axis=1)[:, :k], axis=1))
+    brute_ms = (time.perf_counter() - start) / len(X) * 1000
+
+    # Compared by distance: equidistant neighbours may come in either order
+    mismatches = int((~np.isclose(distances, expected, rtol=1e-9, atol=1e-12).all(axis=1)).sum())
+    return {
+        'rows': len(index),
+        'queries': len(X),
+        'k': k,
+        'mismatches': mismatches,
+        'single_query_ms': single_ms,
+        'batched_ms_per_query': batch_ms,
+        'brute_force_ms_per_query': brute_ms
+    }
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Build and query the nearest-neighbour index")
+    parser.add_argument('--build', action='store_true', help="Index the training CSV in scaled space")
+    parser.add_argument('--check', action='store_true',
+                        help="Compare with a brute-force scan and time queries (exit 1 on a mismatch)")
+    parser.add_argument('--query', nargs=7, type=float, metavar='X',
+                        help="Nearest samples to N P K temp hum ph rainfall")
+    parser.add_argument('--path', default=INDEX_PATH)
+    parser.add_argument('--csv', default=DATASET_PATH, help=f"Build: training data (default: {DATASET_PATH})")
+    parser.add_argument('--leaf-size', type=int, default=LEAF_SIZE, help=f"Build: most rows per leaf (default: {LEAF_SIZE})")
+    parser.add_argument('-k', type=int, default=DEFAULT_NEIGHBOURS,
+                        help=f"Neighbours per query (default: {DEFAULT_NEIGHBOURS})")
+    parser.add_argument('--queries', type=int, default=1000, help="Check: random queries (default: 1000)")
+    args = parser.parse_args(argv)
+
+    if args.build:
+        manifest = build_index(args.csv, output_dir=args.path, leaf_size=args.leaf_size)
+        print(json.dumps({'written': args.path, 'rows': manifest['rows'], 'depth': manifest['depth'],
+                          'build_seconds': manifest['build_seconds']}))
+    elif args.check:
+        index = NeighbourIndex(args.path)
+        report = check_index(index, args.queries, args.k)
+        print(json.dumps({'stale': index.is_stale(), **report}))
+        return 1 if report['mismatches'] else 0
+    elif args.query:
+        index = NeighbourIndex(args.path)
+        print(json.dumps({'input': dict(zip(FEATURE_NAMES, args.query)), 'neighbours': index.nearest(args.query, args.k)}))
+    else:
+        parser.print_usage()
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,7 +1,14 @@
+import os
 import sys
 import json
-import joblib
+import argparse
+import socketserver
 import numpy as np
+import timing
+from lazy_imports import lazy_import
+
+# Only the 'sklearn' engine unpickles models; the others never import joblib
+joblib = lazy_import("joblib")
 
 # =============================================================================
 # predict.py - ML Model Prediction Service
@@ -11,14 +18,61 @@ import numpy as np
 # Feature order: N, P, K, temperature, humidity, ph, rainfall
 FEATURE_NAMES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
 
-def load_models():
+# Inference engine: 'sklearn' unpickles MLP.pkl; 'numpy' runs MLP_fused.npz
+# (see mlp_engine.py), 'float32' and 'int8' the reduced-precision MLP
+# exports (see quantization.py) and 'bundle' memory-maps model_bundle/ (see
+# model_bundle.py), none of them importing sklearn at all
+DEFAULT_ENGINE = os.getenv("CROPIFY_ENGINE", "sklearn")
+ENGINES = ['sklearn', 'numpy', 'float32', 'int8', 'bundle']
+# File whose mtime identifies each engine's model (for cache keys)
+MODEL_ARTIFACTS = {'sklearn': 'MLP.pkl', 'numpy': 'MLP_fused.npz', 'float32': 'quantized/mlp.float32.npz',
+                   'int8': 'quantized/mlp.int8.npz', 'bundle': 'model_bundle/manifest.json'}
+
+def load_models(engine=None):
     """Load the trained MLP model and scaler"""
-    model = joblib.load('MLP.pkl')
-    scaler = joblib.load('scaler.pkl')
-    label_encoder = joblib.load('label_encoder.pkl')
+    engine = engine or DEFAULT_ENGINE
+    if engine == 'numpy':
+        from mlp_engine import load_fused_models
+        with timing.stage('model_load'):
+            return load_fused_models()
+    if engine in ('float32', 'int8'):
+        from quantization import load_quantized
+        with timing.stage('model_load'):
+            return load_quantized("MLP", engine)
+    if engine == 'bundle':
+        from model_bundle import load_bundle_models
+        with timing.stage('model_load'):
+            return load_bundle_models()
+    if engine != 'sklearn':
+        raise ValueError(f"Unknown engine '{engine}'. Expected one of: {', '.join(ENGINES)}")
+
+    with timing.stage('model_load'):
+        model = joblib.load('MLP.pkl')
+        scaler = joblib.load('scaler.pkl')
+        label_encoder = joblib.load('label_encoder.pkl')
     return model, scaler, label_encoder
 
-def predict(n, p, k, temp, hum, ph, rainfall, model=None, scaler=None, label_encoder=None):
+def load_ensemble_models(engine=None):
+    """
+    Load all four models for ensemble mode
+
+    Returns:
+        tuple: ({model name: model}, scaler, label_encoder)
+    """
+    engine = engine or DEFAULT_ENGINE
+    from model_bundle import ModelBundle, MODEL_PATHS
+    if engine == 'bundle':
+        bundle = ModelBundle()
+        return {name: bundle.get(name) for name in bundle.model_names()}, bundle.scaler, bundle.label_encoder
+    if engine != 'sklearn':
+        raise ValueError("Ensemble mode needs the 'sklearn' or 'bundle' engine")
+
+    models = {name: joblib.load(path) for name, path in MODEL_PATHS.items() if os.path.exists(path)}
+    return models, joblib.load('scaler.pkl'), joblib.load('label_encoder.pkl')
+
+def predict(n, p, k, temp, hum, ph, rainfall, model=None, scaler=None, label_encoder=None,
+            cache=None, model_key='MLP', decision_map=None, decision_map_model='MLP', neighbour_index=None,
+            neighbours=5):
     """
     Make crop prediction based on soil and climate parameters
     
@@ -33,64 +87,495 @@ def predict(n, p, k, temp, hum, ph, rainfall, model=None, scaler=None, label_enc
         model: Pre-loaded model (optional)
         scaler: Pre-loaded scaler (optional)
         label_encoder: Pre-loaded label encoder (optional)
+        cache: PredictionCache to memoize results in (optional)
+        model_key: Model identity used in the cache key
+        decision_map: DecisionMap answering in-domain inputs by table lookup (optional)
+        decision_map_model: Name of model's table in decision_map
+        neighbour_index: NeighbourIndex; adds the closest training samples (optional)
+        neighbours: Number of training samples to add
     
     Returns:
-        dict: Prediction result with crop name and confidence
+        dict: Prediction result with crop name and confidence (and
+        'neighbours' when a neighbour_index is given)
     """
+    features = [n, p, k, temp, hum, ph, rainfall]
+    cached = cache.get(model_key, features) if cache is not None else None
+
+    # Precomputed table answer for the model (None outside the slider domain)
+    if cached is None and decision_map is not None:
+        _check_decision_map(decision_map, decision_map_model)
+        hit = decision_map.lookup(decision_map_model, features)
+        if hit is not None:
+            cached = {'crop': hit[0], 'confidence': hit[1]}
+
     # Load models if not provided
-    if model is None:
+    if cached is None and model is None:
         model, scaler, label_encoder = load_models()
-    
+
+    if cached is None:
+        cached = _predict_uncached(features, model, scaler, label_encoder)
+        if cache is not None:
+            cache.put(model_key, features, cached)
+
+    result = {
+        'crop': cached['crop'],
+        'confidence': cached['confidence'],
+        'input': {
+            'N': n, 'P': p, 'K': k,
+            'temperature': temp, 'humidity': hum,
+            'ph': ph, 'rainfall': rainfall
+        }
+    }
+    if neighbour_index is not None:
+        with timing.stage('neighbours'):
+            result['neighbours'] = neighbour_index.nearest(features, neighbours)
+    return result
+
+def _check_decision_map(decision_map, name):
+    if name not in decision_map.model_names():
+        raise ValueError(f"The decision map has no table for '{name}'")
+
+def _predict_uncached(features, model, scaler, label_encoder):
+    """Scale, infer and decode one sample; returns crop and confidence"""
     # Create input array
-    input_data = np.array([[n, p, k, temp, hum, ph, rainfall]])
+    input_data = np.array([features])
     
     # Scale the data using StandardScaler
     if scaler is not None:
-        input_data = scaler.transform(input_data)
+        with timing.stage('scale'):
+            input_data = scaler.transform(input_data)
     
     # Make prediction
-    prediction = model.predict(input_data)[0]
-    crop_name = label_encoder.inverse_transform([prediction])[0]
-    
-    # Get prediction probabilities if available
-    try:
-        probabilities = model.predict_proba(input_data)[0]
-        confidence = float(max(probabilities))
-    except (AttributeError, IndexError):
-        confidence = None
+    with timing.stage('infer'):
+        prediction = model.predict(input_data)[0]
+
+        # Get prediction probabilities if available
+        try:
+            probabilities = model.predict_proba(input_data)[0]
+            confidence = float(max(probabilities))
+        except (AttributeError, IndexError):
+            confidence = None
+
+    with timing.stage('decode'):
+        crop_name = label_encoder.inverse_transform([prediction])[0]
     
+    return {'crop': str(crop_name), 'confidence': confidence}
+
+def predict_batch(features, model=None, scaler=None, label_encoder=None, decision_map=None,
+                  decision_map_model='MLP', neighbour_index=None, neighbours=5):
+    """
+    Make crop predictions for many samples in one vectorized pass
+
+    Args:
+        features: (n, 7) array in FEATURE_NAMES order, or a DataFrame that
+            contains the FEATURE_NAMES columns (extra columns are ignored)
+        model: Pre-loaded model (optional)
+        scaler: Pre-loaded scaler (optional)
+        label_encoder: Pre-loaded label encoder (optional)
+        decision_map: DecisionMap answering in-domain rows by table lookup;
+            only the remaining rows go through the model (optional)
+        decision_map_model: Name of model's table in decision_map
+        neighbour_index: NeighbourIndex for the closest training samples (optional)
+        neighbours: Training samples per row
+
+    Returns:
+        dict: 'crops' (array of n crop names) and 'confidences' (array of n
+        floats, or None if the model has no predict_proba); with a
+        neighbour_index also (n, neighbours) arrays 'neighbour_rows' (CSV
+        data rows), 'neighbour_crops' and 'neighbour_distances'
+    """
+    if neighbour_index is not None:
+        result = predict_batch(features, model, scaler, label_encoder, decision_map, decision_map_model)
+        X = features[FEATURE_NAMES].to_numpy(dtype=float) if hasattr(features, 'columns') else features
+        with timing.stage('neighbours'):
+            distances, positions = neighbour_index.query(X, neighbours)
+        result['neighbour_rows'], result['neighbour_crops'] = neighbour_index.samples(positions)
+        result['neighbour_distances'] = distances
+        return result
+
+    if decision_map is not None:
+        X = features[FEATURE_NAMES].to_numpy(dtype=float) if hasattr(features, 'columns') else features
+        _check_decision_map(decision_map, decision_map_model)
+        crops, confidences, on_grid = decision_map.lookup_batch(decision_map_model, X)
+        if not on_grid.all():
+            X = np.asarray(X, dtype=float).reshape(-1, len(FEATURE_NAMES))
+            rest = predict_batch(X[~on_grid], model, scaler, label_encoder)
+            crops = crops.astype(object)
+            crops[~on_grid] = rest['crops']
+            confidences[~on_grid] = rest['confidences']
+        return {'crops': crops, 'confidences': confidences}
+
+    # Load models if not provided
+    if model is None:
+        model, scaler, label_encoder = load_models()
+
+    if hasattr(features, 'columns'):
+        input_data = features[FEATURE_NAMES]
+    else:
+        input_data = np.asarray(features, dtype=float).reshape(-1, len(FEATURE_NAMES))
+
+    if scaler is not None:
+        with timing.stage('scale'):
+            input_data = scaler.transform(input_data)
+
+    # One predict_proba call; the predicted class is its argmax, which is
+    # exactly what the sklearn classifiers' predict() does internally
+    with timing.stage('infer'):
+        if hasattr(model, 'predict_proba'):
+            probabilities = model.predict_proba(input_data)
+            best = probabilities.argmax(axis=1)
+            predictions = model.classes_[best]
+            confidences = probabilities[np.arange(len(best)), best]
+        else:
+            predictions = model.predict(input_data)
+            confidences = None
+
+    with timing.stage('decode'):
+        crops = label_encoder.inverse_transform(predictions)
     return {
-        'crop': crop_name,
-        'confidence': confidence,
-        'input': {
-            'N': n, 'P': p, 'K': k,
-            'temperature': temp, 'humidity': hum,
-            'ph': ph, 'rainfall': rainfall
-        }
+        'crops': crops,
+        'confidences': confidences
     }
 
-if __name__ == "__main__":
+def predict_csv(input_path, output, chunksize=10000, model=None, scaler=None, label_encoder=None,
+                decision_map=None, decision_map_model='MLP'):
+    """
+    Score a CSV file chunk by chunk and append the results to output
+
+    Only one chunk is held in memory at a time, so memory use does not grow
+    with file size. Each output row is the input row plus 'crop' and
+    'confidence' columns.
+
+    Args:
+        input_path: CSV file with (at least) the FEATURE_NAMES columns
+        output: Path or writable text stream for the scored CSV
+        chunksize: Number of rows scored per vectorized pass
+        decision_map: DecisionMap for in-domain rows (optional, see predict_batch)
+        decision_map_model: Name of model's table in decision_map
+
+    Returns:
+        int: Number of rows scored
+    """
+    import pandas as pd
+
+    if model is None:
+        model, scaler, label_encoder = load_models()
+
+    rows = 0
+    for i, chunk in enumerate(pd.read_csv(input_path, chunksize=chunksize)):
+        result = predict_batch(chunk, model=model, scaler=scaler, label_encoder=label_encoder,
+                               decision_map=decision_map, decision_map_model=decision_map_model)
+        chunk['crop'] = result['crops']
+        chunk['confidence'] = result['confidences']
+        chunk.to_csv(output, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        rows += len(chunk)
+    return rows
+
+# =============================================================================
+# Worker mode - load the models once and serve newline-delimited JSON
+# =============================================================================
+
+def parse_request(line):
+    """
+    Parse one newline-delimited JSON request
+
+    Accepts either named features ({"N": 90, "P": 42, ...}) or a positional
+    list in FEATURE_NAMES order ({"features": [90, 42, 43, 20, 82, 6.5, 202]}).
+    An optional "id" is echoed back so callers can match responses.
+
+    Returns:
+        tuple: (request id or None, list of 7 floats)
+    """
+    return parse_features(json.loads(line))
+
+def parse_features(request):
+    """parse_request() for an already decoded JSON value"""
+    if isinstance(request, list):
+        request = {'features': request}
+    if 'features' in request:
+        values = request['features']
+        if len(values) != len(FEATURE_NAMES):
+            raise ValueError(f"Expected {len(FEATURE_NAMES)} features, got {len(values)}")
+    else:
+        missing = [name for name in FEATURE_NAMES if name not in request]
+        if missing:
+            raise ValueError(f"Missing features: {', '.join(missing)}")
+        values = [request[name] for name in FEATURE_NAMES]
+    values = [float(v) for v in values]
+    # float() accepts "nan"/"inf", which would come back out as invalid JSON
+    if not np.isfinite(values).all():
+        raise ValueError("Features must be finite numbers")
+    return request.get('id'), values
+
+def handle_request(line, model, scaler, label_encoder, **predict_kwargs):
+    """Turn one request line into one JSON response line (never raises)"""
+    request_id = None
+    try:
+        request_id, values = parse_request(line)
+        result = predict(*values, model=model, scaler=scaler, label_encoder=label_encoder, **predict_kwargs)
+    except Exception as e:
+        result = {'error': str(e)}
+    if request_id is not None:
+        result['id'] = request_id
+    return json.dumps(result)
+
+def serve_stream(stream_in, stream_out, model, scaler, label_encoder, **predict_kwargs):
+    """
+    Answer newline-delimited JSON requests until the input stream closes
+
+    Args:
+        stream_in: Text stream with one JSON request per line (e.g. sys.stdin)
+        stream_out: Text stream that receives one JSON result per line
+        model, scaler, label_encoder: Models loaded once by the caller
+        predict_kwargs: Extra predict() arguments (cache, model_key, decision_map)
+    """
+    for line in stream_in:
+        if not line.strip():
+            continue
+        stream_out.write(handle_request(line, model, scaler, label_encoder, **predict_kwargs) + "\n")
+        stream_out.flush()
+
+class _SocketRequestHandler(socketserver.StreamRequestHandler):
+    """One connection = any number of request lines, answered in order"""
+
+    def handle(self):
+        server = self.server
+        for raw in self.rfile:
+            line = raw.decode('utf-8')
+            if not line.strip():
+                continue
+            response = handle_request(line, server.model, server.scaler, server.label_encoder,
+                                      **server.predict_kwargs)
+            self.wfile.write((response + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+class _PredictionSocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve_socket(socket_path, model, scaler, label_encoder, **predict_kwargs):
+    """
+    Serve newline-delimited JSON requests on a local Unix socket
+
+    Each client connection is handled on its own thread; all of them share
+    the models loaded once by the caller.
+    """
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    with _PredictionSocketServer(socket_path, _SocketRequestHandler) as server:
+        server.model, server.scaler, server.label_encoder = model, scaler, label_encoder
+        server.predict_kwargs = predict_kwargs
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+def build_parser():
+    """Argument parser for the option-based modes (--worker, --csv)"""
+    parser = argparse.ArgumentParser(description="Cropify prediction service")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--worker', action='store_true',
+                      help="Load the models once and answer newline-delimited JSON requests")
+    mode.add_argument('--csv', metavar='PATH',
+                      help="Score a CSV file in fixed-size chunks")
+    mode.add_argument('--ensemble', nargs=7, type=float, metavar='X',
+                      help="Consensus of all four models for N P K temp hum ph rainfall")
+    mode.add_argument('--sweep', nargs='+', metavar='FEATURE',
+                      help="What-if sweep of one or two features around --at (see sensitivity.py)")
+    mode.add_argument('--nearest', nargs=7, type=float, metavar='X',
+                      help="Training samples closest to N P K temp hum ph rainfall (see neighbour_index.py)")
+    parser.add_argument('--socket', metavar='PATH',
+                        help="Worker mode: listen on this Unix socket instead of stdin")
+    parser.add_argument('--output', metavar='PATH',
+                        help="CSV mode: write results here instead of stdout")
+    parser.add_argument('--chunksize', type=int, default=10000,
+                        help="CSV mode: rows per vectorized batch (default: 10000)")
+    parser.add_argument('--engine', choices=ENGINES, default=None,
+                        help=f"Inference engine (default: $CROPIFY_ENGINE or {DEFAULT_ENGINE})")
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help="Worker mode: memoize up to this many predictions (default: off)")
+    parser.add_argument('--cache-file', metavar='PATH',
+                        help="Worker mode: persist the prediction cache here between restarts")
+    parser.add_argument('--cache-resolution', type=float, metavar='STEP',
+                        help="Worker mode: quantize every float feature to this step (default: 0.01)")
+    parser.add_argument('--decision-map', metavar='DIR',
+                        help="Worker/CSV mode: answer in-domain inputs from precomputed tables (see decision_map.py)")
+    parser.add_argument('--neighbours', type=int, default=0, metavar='K',
+                        help="Worker mode: add the K closest training samples to every answer; "
+                             "nearest mode: samples to list (default: 5)")
+    parser.add_argument('--neighbour-index', metavar='DIR', default='neighbour_index',
+                        help="Index built by neighbour_index.py --build (default: neighbour_index)")
+    parser.add_argument('--weights', metavar='SPEC',
+                        help="Ensemble mode: soft-vote weights, e.g. 'Random Forest=2,MLP=1'")
+    parser.add_argument('--top-k', type=int, default=3,
+                        help="Ensemble mode: number of alternative crops to report (default: 3)")
+    parser.add_argument('--at', nargs=7, type=float, metavar='X',
+                        help="Sweep mode: the input to sweep around (N P K temp hum ph rainfall)")
+    parser.add_argument('--points', type=int,
+                        help="Sweep mode: points (1-D) or points per axis (2-D)")
+    parser.add_argument('--all-models', action='store_true',
+                        help="Sweep mode: soft vote of all four models (with --weights) instead of the MLP")
+    parser.add_argument('--png', metavar='PATH',
+                        help="Sweep mode: also draw the class-boundary map to this file")
+    parser.add_argument('--profile', action='store_true',
+                        help="Print a cProfile summary and stage timings to stderr")
+    return parser
+
+def run_sweep(args):
+    """Sweep mode: print the sweep as JSON (and optionally draw it)"""
+    import sensitivity
+    from ensemble import parse_weights
+    try:
+        if not args.at or len(args.sweep) > 2:
+            raise ValueError("Sweep mode expects 1 or 2 features and --at N P K temp hum ph rainfall")
+        if args.all_models:
+            models, scaler, label_encoder = load_ensemble_models(args.engine)
+        else:
+            model, scaler, label_encoder = load_models(args.engine)
+            models = {'MLP': model}
+        weights = parse_weights(args.weights)
+        if len(args.sweep) == 1:
+            result = sensitivity.sweep_1d(args.at, args.sweep[0], models, scaler, label_encoder,
+                                          points=args.points or sensitivity.DEFAULT_POINTS_1D, weights=weights)
+        else:
+            result = sensitivity.sweep_2d(args.at, *args.sweep, models, scaler, label_encoder,
+                                          points=args.points or sensitivity.DEFAULT_POINTS_2D, weights=weights)
+        if args.png:
+            with open(args.png, 'wb') as file:
+                file.write(sensitivity.render_sweep(result))
+        print(json.dumps(sensitivity.to_json(result)))
+    except Exception as e:
+        print(json.dumps({'error': str(e)}))
+        return 1
+    return 0
+
+def run_profiled(argv, top=25):
+    """
+    Run main(argv) under cProfile
+
+    Prints the cProfile summary (sorted by cumulative time) and the stage
+    timing record to stderr, so the JSON on stdout is unchanged.
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    with timing.request('predict.py ' + ' '.join(argv)):
+        profiler.enable()
+        try:
+            status = main(argv)
+        finally:
+            profiler.disable()
+    pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(top)
+    print(json.dumps({'timing': timing.recent_records[-1]}), file=sys.stderr)
+    return status
+
+def main(argv):
+    """Command-line entry point"""
+    # --profile works with every mode: python predict.py --profile 90 42 43 20 82 6.5 202
+    if '--profile' in argv:
+        return run_profiled([arg for arg in argv if arg != '--profile'])
+
+    if argv and argv[0].startswith('--'):
+        args = build_parser().parse_args(argv)
+
+        # Ensemble mode: python predict.py --ensemble N P K temp hum ph rainfall [--weights SPEC]
+        if args.ensemble:
+            from ensemble import predict_ensemble, parse_weights
+            try:
+                models, scaler, label_encoder = load_ensemble_models(args.engine)
+                result = predict_ensemble(args.ensemble, models, scaler, label_encoder,
+                                          weights=parse_weights(args.weights), top_k=args.top_k)
+                result['input'] = dict(zip(FEATURE_NAMES, args.ensemble))
+                print(json.dumps(result))
+            except Exception as e:
+                print(json.dumps({'error': str(e)}))
+                return 1
+            return 0
+
+        # Sweep mode: python predict.py --sweep N [rainfall] --at N P K temp hum ph rainfall
+        if args.sweep:
+            return run_sweep(args)
+
+        # Nearest mode: python predict.py --nearest N P K temp hum ph rainfall [--neighbours K]
+        if args.nearest:
+            from neighbour_index import NeighbourIndex
+            try:
+                neighbour_index = NeighbourIndex(args.neighbour_index)
+                if neighbour_index.is_stale():
+                    print(json.dumps({'warning': f"{args.neighbour_index} was built from an older CSV or scaler"}),
+                          file=sys.stderr)
+                print(json.dumps({'input': dict(zip(FEATURE_NAMES, args.nearest)),
+                                  'neighbours': neighbour_index.nearest(args.nearest, args.neighbours or 5)}))
+            except Exception as e:
+                print(json.dumps({'error': str(e)}))
+                return 1
+            return 0
+
+        model, scaler, label_encoder = load_models(args.engine)
+        decision_map = None
+        if args.decision_map:
+            from decision_map import DecisionMap
+            decision_map = DecisionMap(args.decision_map)
+            if decision_map.is_stale():
+                print(json.dumps({'warning': f"{args.decision_map} was built from older models"}), file=sys.stderr)
+
+        # Worker mode: python predict.py --worker [--socket PATH] [--cache-size N [--cache-file PATH]]
+        if args.worker:
+            predict_kwargs = {'decision_map': decision_map} if decision_map else {}
+            if args.neighbours > 0:
+                from neighbour_index import NeighbourIndex
+                neighbour_index = NeighbourIndex(args.neighbour_index)
+                # Neighbours from an older CSV or scaler would be wrong evidence; answer without them
+                if neighbour_index.is_stale():
+                    print(json.dumps({'warning': f"{args.neighbour_index} was built from an older CSV or scaler; "
+                                                 "neighbours are left out"}), file=sys.stderr)
+                else:
+                    predict_kwargs['neighbour_index'] = neighbour_index
+                    predict_kwargs['neighbours'] = args.neighbours
+            if args.cache_size > 0:
+                from prediction_cache import PredictionCache, model_fingerprint
+                engine = args.engine or DEFAULT_ENGINE
+                resolution = None
+                if args.cache_resolution:
+                    resolution = {name: args.cache_resolution for name in ['temperature', 'humidity', 'ph', 'rainfall']}
+                predict_kwargs['cache'] = PredictionCache(resolution, maxsize=args.cache_size, path=args.cache_file)
+                predict_kwargs['model_key'] = model_fingerprint(f"MLP/{engine}", MODEL_ARTIFACTS[engine])
+            try:
+                if args.socket:
+                    serve_socket(args.socket, model, scaler, label_encoder, **predict_kwargs)
+                else:
+                    serve_stream(sys.stdin, sys.stdout, model, scaler, label_encoder, **predict_kwargs)
+            finally:
+                cache = predict_kwargs.get('cache')
+                if cache is not None:
+                    if args.cache_file:
+                        cache.save()
+                    print(json.dumps({'cache': cache.stats()}), file=sys.stderr)
+
+        # CSV mode: python predict.py --csv samples.csv [--output scored.csv] [--chunksize N]
+        elif args.csv:
+            predict_csv(args.csv, args.output or sys.stdout, chunksize=args.chunksize,
+                        model=model, scaler=scaler, label_encoder=label_encoder, decision_map=decision_map)
+        return 0
+
     # Expected format: python predict.py N P K temp hum ph rainfall
     # Example: python predict.py 90 42 43 20 82 6.5 202
-    
-    if len(sys.argv) == 8:
+    if len(argv) == 7:
         try:
-            n = float(sys.argv[1])
-            p = float(sys.argv[2])
-            k = float(sys.argv[3])
-            temp = float(sys.argv[4])
-            hum = float(sys.argv[5])
-            ph = float(sys.argv[6])
-            rainfall = float(sys.argv[7])
-            
+            n, p, k, temp, hum, ph, rainfall = [float(v) for v in argv]
+
             result = predict(n, p, k, temp, hum, ph, rainfall)
-            
+
             # Output as JSON
             print(json.dumps(result))
-            
+
         except Exception as e:
             print(json.dumps({'error': str(e)}))
-            sys.exit(1)
+            return 1
     else:
         print(json.dumps({'error': 'Invalid arguments. Expected: N P K temp hum ph rainfall'}))
-        sys.exit(1)
\ No newline at end of file
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,122 @@
+import os
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+
+from predict import FEATURE_NAMES
+
+# =============================================================================
+# prediction_cache.py - Prediction Memoization Cache
+# Bounded LRU cache keyed on model identity plus the input quantized to a
+# configurable resolution. A hit skips scaling, inference and label decoding.
+# =============================================================================
+
+# Default resolution = the cropii.py slider steps (integer N/P/K, 0.01 for the
+# float sliders), so slider inputs are never merged with their neighbours
+DEFAULT_RESOLUTION = {
+    'N': 1, 'P': 1, 'K': 1,
+    'temperature': 0.01, 'humidity': 0.01, 'ph': 0.01, 'rainfall': 0.01
+}
+
+def model_fingerprint(name, path=None):
+    """
+    Stable model identity for cache keys: name plus the artifact's mtime/size,
+    so entries persisted on disk are never reused after a retrain
+    """
+    if path and os.path.exists(path):
+        stat = os.stat(path)
+        return f"{name}@{int(stat.st_mtime)}:{stat.st_size}"
+    return name
+
+class PredictionCache:
+    """
+    Thread-safe LRU memo of prediction results
+
+    Args:
+        resolution: Feature name -> quantization step (FEATURE_NAMES names)
+        maxsize: Max number of entries kept (least recently used are dropped)
+        path: Optional JSON file to load from and save to between restarts
+        autosave_every: Save to path after this many new entries (0 = only on save())
+    """
+
+    def __init__(self, resolution=None, maxsize=10000, path=None, autosave_every=0):
+        resolution = dict(DEFAULT_RESOLUTION, **(resolution or {}))
+        self.steps = [float(resolution[name]) for name in FEATURE_NAMES]
+        self.maxsize = maxsize
+        self.path = path
+        self.autosave_every = autosave_every
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def key(self, model_key, features):
+        """Cache key: model identity plus each feature rounded to its grid step"""
+        return (model_key,) + tuple(int(round(float(v) / step)) for v, step in zip(features, self.steps))
+
+    def get(self, model_key, features):
+        """Cached value, or None on a miss"""
+        key = self.key(model_key, features)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, model_key, features, value):
+        key = self.key(model_key, features)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self._unsaved += 1
+            autosave = self.path and self.autosave_every and self._unsaved >= self.autosave_every
+        if autosave:
+            self.save()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else None,
+            'size': len(self._entries),
+            'maxsize': self.maxsize
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def save(self, path=None):
+        """Write entries (oldest first) atomically as JSON"""
+        path = path or self.path
+        with self._lock:
+            payload = {
+                'steps': self.steps,
+                'entries': [[list(key), value] for key, value in self._entries.items()]
+            }
+            self._unsaved = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(payload, file)
+        os.replace(tmp_path, path)
+
+    def load(self, path=None):
+        """Load entries saved with the same resolution; others are ignored"""
+        with open(path or self.path, 'r') as file:
+            payload = json.load(file)
+        if payload.get('steps') != self.steps:
+            return
+        with self._lock:
+            for key, value in payload['entries'][-self.maxsize:]:
+                self._entries[tuple(key)] = value
@@ -0,0 +1,795 @@
+import gc
+import os
+import sys
+import json
+import time
+import signal
+import hashlib
+import argparse
+import threading
+import traceback
+import http.client
+import multiprocessing
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# =============================================================================
+# prediction_server.py - Pre-Fork HTTP Prediction Service
+# The parent loads every model once, binds the port and forks worker
+# processes that share the models copy-on-write and accept on the same
+# socket; each worker serves keep-alive connections on threads. /health and
+# /metrics report on the whole pool (counters live in shared memory). When
+# the model files change (or on SIGHUP) the parent loads the new models,
+# forks a fresh generation and lets the old workers finish what they have.
+# With --micro-batch-ms, concurrent single-row requests in a worker are
+# scored together (see micro_batching.py). PredictionClient is the
+# keep-alive client cropii.py uses.
+# =============================================================================
+
+DEFAULT_HOST = os.getenv("CROPIFY_SERVER_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("CROPIFY_SERVER_PORT", "8765"))
+SERVER_ENGINES = ['sklearn', 'bundle']
+ENSEMBLE_MODEL = 'ensemble'
+DEFAULT_MODEL = 'MLP'
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_TIMEOUT = 5.0
+# How often the parent checks the model files for changes
+RELOAD_POLL_SECONDS = 2.0
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# /sweep grid limits: points for a 1-D sweep, points per axis for a 2-D one
+MAX_SWEEP_POINTS_1D = 4096
+MAX_SWEEP_POINTS_2D = 256
+# Max wait for single-row /predict requests to form a batch (unset: no batching)
+MICRO_BATCH_MS = os.getenv("CROPIFY_MICRO_BATCH_MS")
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+def _log(event, **fields):
+    print(json.dumps({'event': event, 'pid': os.getpid(), **fields}), file=sys.stderr, flush=True)
+
+# ------------------------------- Models -------------------------------
+
+def model_files(engine):
+    """Files whose change triggers a reload"""
+    from model_bundle import BUNDLE_PATH, MODEL_PATHS
+    if engine == 'bundle':
+        return [os.path.join(BUNDLE_PATH, 'manifest.json')]
+    return [*MODEL_PATHS.values(), 'scaler.pkl', 'label_encoder.pkl']
+
+def default_engine():
+    """The bundle when it has been exported (about 3x the requests per second), else the pickles"""
+    from model_bundle import BUNDLE_PATH, ModelBundle
+    return 'bundle' if ModelBundle.exists(BUNDLE_PATH) else 'sklearn'
+
+def files_fingerprint(paths):
+    """Short hash of the paths' mtimes and sizes (missing files included)"""
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            parts.append(f"{path}:{stat.st_mtime_ns}:{stat.st_size}")
+        except OSError:
+            parts.append(f"{path}:missing")
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:12]
+
+class ModelSet:
+    """
+    One immutable load of every model plus the shared scaler and label encoder
+
+    Args:
+        engine: 'sklearn' or 'bundle'
+        micro_batch_ms: Batch single-row predictions with up to this wait
+            (None: score each request on its own)
+        on_batch: MicroBatcher callback, e.g. SharedMetrics.record_batch
+    """
+
+    def __init__(self, engine='sklearn', micro_batch_ms=None, on_batch=None):
+        from predict import load_ensemble_models
+        self.engine = engine
+        # Fingerprint first: a file replaced while loading triggers another reload
+        self.fingerprint = files_fingerprint(model_files(engine))
+        self.models, self.scaler, self.label_encoder = load_ensemble_models(engine)
+        if not self.models:
+            raise ValueError("No models found")
+        self.default_model = DEFAULT_MODEL if DEFAULT_MODEL in self.models else next(iter(self.models))
+        self.loaded_at = time.time()
+        self.micro_batch_ms = micro_batch_ms
+        self.on_batch = on_batch
+        self._batcher = None
+        self._batcher_lock = threading.Lock()
+
+    def batcher(self):
+        """The MicroBatcher, started on first use (after fork: its thread lives in the worker)"""
+        if self.micro_batch_ms is None:
+            return None
+        with self._batcher_lock:
+            if self._batcher is None:
+                from micro_batching import MicroBatcher
+                self._batcher = MicroBatcher(self.scaler, self.label_encoder, max_wait_ms=self.micro_batch_ms,
+                                             on_batch=self.on_batch)
+            return self._batcher
+
+    def predict(self, name, values):
+        """One row through the batcher when batching is on, else predict.predict()"""
+        from predict import predict
+        batcher = self.batcher()
+        if batcher is not None:
+            try:
+                return batcher.predict(self.get(name), values)
+            except RuntimeError:
+                pass  # closed by a reload while this request was running
+        return predict(*values, model=self.get(name), scaler=self.scaler, label_encoder=self.label_encoder)
+
+    def close(self):
+        """Stop the batcher (queued rows are still scored)"""
+        with self._batcher_lock:
+            if self._batcher is not None:
+                self._batcher.close()
+
+    def get(self, name):
+        name = name or self.default_model
+        if name not in self.models:
+            raise ValueError(f"Unknown model '{name}'. Expected one of: {', '.join([*self.models, ENSEMBLE_MODEL])}")
+        return self.models[name]
+
+# ------------------------------ Handlers ------------------------------
+
+def answer_predict(model_set, request):
+    """
+    Result of one /predict request body
+
+    Single row: the predict.py worker format ({"features": [...]} or the
+    named features, optional "id"), plus an optional "model" name or
+    "ensemble" (with optional "weights" and "top_k"). Batch: {"rows":
+    [[...], ...], "model": ...} scored in one predict_batch() pass.
+
+    Returns:
+        tuple: (response dict, rows scored)
+    """
+    from predict import FEATURE_NAMES, predict_batch, parse_features
+    import numpy as np
+
+    if not isinstance(request, (dict, list)):
+        raise ValueError("Expected a JSON object")
+    name = request.get('model') if isinstance(request, dict) else None
+    if isinstance(request, dict) and 'rows' in request:
+        rows = np.asarray(request['rows'], dtype=float)
+        if rows.ndim != 2 or rows.shape[1] != len(FEATURE_NAMES):
+            raise ValueError(f"Expected rows of {len(FEATURE_NAMES)} features")
+        if not np.isfinite(rows).all():
+            raise ValueError("Features must be finite numbers")
+        if name == ENSEMBLE_MODEL:
+            raise ValueError("Batch requests take a single model")
+        result = predict_batch(rows, model_set.get(name), model_set.scaler, model_set.label_encoder)
+        confidences = result['confidences']
+        return {
+            'model': name or model_set.default_model,
+            'crops': [str(crop) for crop in result['crops']],
+            'confidences': None if confidences is None else [float(value) for value in confidences]
+        }, len(rows)
+
+    request_id, values = parse_features(request)
+    if name == ENSEMBLE_MODEL:
+        from ensemble import predict_ensemble
+        result = predict_ensemble(values, model_set.models, model_set.scaler, model_set.label_encoder,
+                                  weights=request.get('weights'), top_k=int(request.get('top_k', 3)))
+        result['input'] = dict(zip(FEATURE_NAMES, values))
+    else:
+        result = model_set.predict(name, values)
+    result['model'] = name or model_set.default_model
+    if request_id is not None:
+        result['id'] = request_id
+    return result, 1
+
+def _sweep_points(request, default, limit):
+    points = request.get('points')
+    if points is None:
+        return default
+    if isinstance(points, bool) or not isinstance(points, int) or not 2 <= points <= limit:
+        raise ValueError(f"'points' must be an integer from 2 to {limit}")
+    return points
+
+def answer_sweep(model_set, request):
+    """
+    Result of one /sweep request body (see sensitivity.py)
+
+    {"at": [7 values], "features": ["N"] or ["N", "ph"], "model": name or
+    "ensemble", optional "points" and "weights"}. points is capped at
+    MAX_SWEEP_POINTS_1D, or MAX_SWEEP_POINTS_2D per axis.
+    """
+    import sensitivity
+    from predict import parse_features
+
+    at, features = request.get('at'), request.get('features') or []
+    if not isinstance(at, list) or not 1 <= len(features) <= 2:
+        raise ValueError("Expected 'at' (7 values) and 1 or 2 'features'")
+    _, at = parse_features(at)
+    name = request.get('model')
+    models = model_set.models if name == ENSEMBLE_MODEL else {name or model_set.default_model: model_set.get(name)}
+    weights = request.get('weights') if name == ENSEMBLE_MODEL else None
+    if len(features) == 1:
+        result = sensitivity.sweep_1d(at, features[0], models, model_set.scaler, model_set.label_encoder,
+                                      points=_sweep_points(request, sensitivity.DEFAULT_POINTS_1D, MAX_SWEEP_POINTS_1D),
+                                      weights=weights)
+    else:
+        result = sensitivity.sweep_2d(at, *features, models, model_set.scaler, model_set.label_encoder,
+                                      points=_sweep_points(request, sensitivity.DEFAULT_POINTS_2D, MAX_SWEEP_POINTS_2D),
+                                      weights=weights)
+    return sensitivity.to_json(result), result['points']
+
+POST_ROUTES = {'/predict': answer_predict, '/sweep': answer_sweep}
+
+# ------------------------------ Metrics -------------------------------
+
+class SharedMetrics:
+    """
+    Request counters in shared memory, one row per worker slot
+
+    The array is allocated before forking, so every worker writes its own
+    row and any worker can sum all rows for /metrics. Rows are never reset:
+    a slot freed by an exited worker keeps its counts and the next worker
+    to take it adds to them, so the totals are cumulative. Each row ends
+    with the latency histogram, then the micro-batch size histogram and the
+    rows in those batches.
+
+    Args:
+        slots: Worker rows to allocate
+    """
+    FIELDS = ('requests', 'errors', 'rows', 'in_flight', 'latency_sum_ms')
+
+    def __init__(self, slots):
+        from micro_batching import BATCH_BUCKETS
+        self.slots = slots
+        self.batch_buckets = BATCH_BUCKETS
+        self._batch_base = len(self.FIELDS) + len(LATENCY_BUCKETS_MS) + 1
+        self.width = self._batch_base + len(BATCH_BUCKETS) + 2
+        self._values = multiprocessing.RawArray('d', slots * self.width)
+        # Pool-wide values written by the parent: generation, reloads, start time
+        self._state = multiprocessing.RawArray('d', 3)
+        self._state[2] = time.time()
+        self._lock = threading.Lock()
+        self.slot = 0
+
+    def _index(self, field):
+        return self.slot * self.width + self.FIELDS.index(field)
+
+    def enter(self):
+        with self._lock:
+            self._values[self._index('in_flight')] += 1
+
+    def leave(self, latency_ms, rows, error):
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if latency_ms <= bound),
+                      len(LATENCY_BUCKETS_MS))
+        base = self.slot * self.width
+        with self._lock:
+            self._values[self._index('in_flight')] -= 1
+            self._values[self._index('requests')] += 1
+            self._values[self._index('errors')] += bool(error)
+            self._values[self._index('rows')] += rows
+            self._values[self._index('latency_sum_ms')] += latency_ms
+            self._values[base + len(self.FIELDS) + bucket] += 1
+
+    def record_batch(self, size, reason=None):
+        """MicroBatcher on_batch callback"""
+        bucket = next((i for i, bound in enumerate(self.batch_buckets) if size <= bound), len(self.batch_buckets))
+        base = self.slot * self.width + self._batch_base
+        with self._lock:
+            self._values[base + bucket] += 1
+            self._values[base + len(self.batch_buckets) + 1] += size
+
+    def set_generation(self, generation, reloads):
+        self._state[0], self._state[1] = generation, reloads
+
+    def snapshot(self, workers=None):
+        """Totals over every slot, with the latency histogram (non-cumulative counts)"""
+        totals = [0.0] * self.width
+        for slot in range(self.slots):
+            for i in range(self.width):
+                totals[i] += self._values[slot * self.width + i]
+        fields = dict(zip(self.FIELDS, totals))
+        buckets = totals[len(self.FIELDS):self._batch_base]
+        batch_buckets, batch_rows = totals[self._batch_base:-1], totals[-1]
+        requests = int(fields['requests'])
+        snapshot = {
+            'generation': int(self._state[0]),
+            'reloads': int(self._state[1]),
+            'uptime_s': time.time() - self._state[2],
+            'requests': requests,
+            'errors': int(fields['errors']),
+            'rows': int(fields['rows']),
+            'in_flight': int(fields['in_flight']),
+            'latency_ms': {
+                'mean': fields['latency_sum_ms'] / requests if requests else None,
+                'sum': fields['latency_sum_ms'],
+                'buckets': {**{str(bound): int(count) for bound, count in zip(LATENCY_BUCKETS_MS, buckets)},
+                            '+Inf': int(buckets[-1])}
+            },
+            'micro_batches': {
+                'batches': int(sum(batch_buckets)),
+                'rows': int(batch_rows),
+                'size_buckets': {**{str(bound): int(count) for bound, count in zip(self.batch_buckets, batch_buckets)},
+                                 '+Inf': int(batch_buckets[-1])}
+            }
+        }
+        if workers is not None:
+            snapshot['workers'] = workers
+        return snapshot
+
+def to_prometheus(snapshot):
+    """/metrics in the Prometheus text format"""
+    lines = []
+    for name, kind, value in [('requests_total', 'counter', snapshot['requests']),
+                              ('errors_total', 'counter', snapshot['errors']),
+                              ('rows_total', 'counter', snapshot['rows']),
+                              ('in_flight', 'gauge', snapshot['in_flight']),
+                              ('generation', 'gauge', snapshot['generation']),
+                              ('reloads_total', 'counter', snapshot['reloads'])]:
+        lines += [f"# TYPE cropify_{name} {kind}", f"cropify_{name} {value}"]
+    lines.append("# TYPE cropify_request_latency_ms histogram")
+    cumulative = 0
+    for bound, count in snapshot['latency_ms']['buckets'].items():
+        cumulative += count
+        lines.append(f'cropify_request_latency_ms_bucket{{le="{bound}"}} {cumulative}')
+    lines.append(f"cropify_request_latency_ms_sum {snapshot['latency_ms']['sum']}")
+    lines.append(f"cropify_request_latency_ms_count {snapshot['requests']}")
+    batches = snapshot['micro_batches']
+    lines.append("# TYPE cropify_micro_batch_size histogram")
+    cumulative = 0
+    for bound, count in batches['size_buckets'].items():
+        cumulative += count
+        lines.append(f'cropify_micro_batch_size_bucket{{le="{bound}"}} {cumulative}')
+    lines.append(f"cropify_micro_batch_size_sum {batches['rows']}")
+    lines.append(f"cropify_micro_batch_size_count {batches['batches']}")
+    return '\n'.join(lines) + '\n'
+
+# ------------------------------- Server -------------------------------
+
+class _PredictionHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 JSON endpoints; connections stay open between requests"""
+    protocol_version = 'HTTP/1.1'
+    server_version = 'Cropify'
+    # Headers and body go out as two writes; without TCP_NODELAY the second
+    # waits for the client's delayed ACK (~40 ms per keep-alive request)
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        self.timeout = self.server.keepalive_timeout
+        super().setup()
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type='application/json'):
+        data = (body if isinstance(body, str) else json.dumps(body)).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        # A draining worker hands its clients over to the next generation
+        if self.server.draining or self.close_connection:
+            self.close_connection = True
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path, _, query = self.path.partition('?')
+        server = self.server
+        if path == '/health':
+            model_set = server.model_set
+            self._send(200, {
+                'status': 'draining' if server.draining else 'ok',
+                'pid': os.getpid(),
+                'generation': server.generation,
+                'engine': model_set.engine,
+                'models': list(model_set.models),
+                'default_model': model_set.default_model,
+                'fingerprint': model_set.fingerprint,
+                'loaded_at': model_set.loaded_at,
+                'micro_batch_ms': model_set.micro_batch_ms
+            })
+        elif path == '/metrics':
+            snapshot = server.metrics.snapshot(server.workers)
+            if 'format=prometheus' in query:
+                self._send(200, to_prometheus(snapshot), 'text/plain; version=0.0.4')
+            else:
+                self._send(200, snapshot)
+        else:
+            self._send(404, {'error': f"Unknown path {path}"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        server = self.server
+        route = POST_ROUTES.get(self.path.partition('?')[0])
+        server.metrics.enter()
+        status, rows = 200, 0
+        try:
+            try:
+                length = int(self.headers.get('Content-Length') or -1)
+            except ValueError:
+                length = -1
+            body = None
+            if 0 <= length <= MAX_BODY_BYTES:
+                # Read even when the request is refused, so the next one on the connection starts clean
+                body = self.rfile.read(length)
+            else:
+                # Where the body ends is unknown, so the connection cannot carry another request
+                self.close_connection = True
+            if route is None:
+                status, result = 404, {'error': f"Unknown path {self.path}"}
+            elif body is None:
+                status, result = 411 if length < 0 else 413, {'error': "A Content-Length up to 16 MB is required"}
+            else:
+                result, rows = route(server.model_set, json.loads(body))
+        except (ValueError, TypeError, KeyError) as e:
+            status, result = 400, {'error': str(e)}
+        except Exception as e:
+            status, result = 500, {'error': str(e)}
+        finally:
+            server.metrics.leave((time.perf_counter() - start) * 1000, rows, status != 200)
+        self._send(status, result)
+
+class _PredictionHTTPServer(ThreadingHTTPServer):
+    daemon_threads = False   # server_close() waits for open connections
+    allow_reuse_address = True
+    request_queue_size = 256
+
+    def __init__(self, address, model_set, metrics, keepalive_timeout=KEEPALIVE_TIMEOUT, access_log=False):
+        super().__init__(address, _PredictionHandler)
+        self.model_set = model_set
+        self.metrics = metrics
+        self.keepalive_timeout = keepalive_timeout
+        self.access_log = access_log
+        self.draining = False
+        self.workers = None
+        self.generation = 0
+
+    def drain(self):
+        """Stop accepting and finish open requests (call from a thread other than serve_forever's)"""
+        self.draining = True
+        self.shutdown()
+
+class PredictionServer:
+    """
+    Pre-fork supervisor: loads the models, binds the port, forks and watches workers
+
+    Args:
+        host, port: Address to listen on
+        workers: Worker processes (0: serve threads in this process; the
+            default when os.fork is unavailable)
+        engine: 'sklearn' (pickles) or 'bundle' (memory-mapped model_bundle/;
+            the default when it exists)
+        reload_poll: Seconds between model file checks (0: only on SIGHUP)
+        keepalive_timeout: Idle seconds before a keep-alive connection is closed
+        access_log: Log every request to stderr
+        micro_batch_ms: Batch concurrent single-row /predict requests with up
+            to this wait (None: no batching; see micro_batching.py)
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, engine=None,
+                 reload_poll=RELOAD_POLL_SECONDS, keepalive_timeout=KEEPALIVE_TIMEOUT, access_log=False,
+                 micro_batch_ms=None):
+        engine = engine or default_engine()
+        if engine not in SERVER_ENGINES:
+            raise ValueError(f"Unknown engine '{engine}'. Expected one of: {', '.join(SERVER_ENGINES)}")
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        if not hasattr(os, 'fork'):
+            self.workers = 0
+        self.engine = engine
+        self.reload_poll = reload_poll
+        self.micro_batch_ms = micro_batch_ms
+        self.metrics = SharedMetrics(max(4 * self.workers, 1))
+        self.model_set = self._load_model_set()
+        self.httpd = _PredictionHTTPServer((host, port), self.model_set, self.metrics, keepalive_timeout, access_log)
+        self.httpd.workers = self.workers
+        self.address = self.httpd.server_address
+        self.generation = 0
+        self.reloads = 0
+        self._children = {}              # pid -> (generation, metrics slot)
+        self._failed_fingerprint = None
+        self._reload_requested = False
+        self._stopping = False
+
+    # --- reloading ---
+
+    def _load_model_set(self):
+        return ModelSet(self.engine, self.micro_batch_ms, self.metrics.record_batch)
+
+    def _maybe_reload(self, force=False):
+        """Load the current model files if they changed; True if a new set is live"""
+        fingerprint = files_fingerprint(model_files(self.engine))
+        if not force and fingerprint in (self.model_set.fingerprint, self._failed_fingerprint):
+            return False
+        try:
+            model_set = self._load_model_set()
+        except Exception as e:
+            # Keep serving the old models; retry when the files change again
+            self._failed_fingerprint = fingerprint
+            _log('reload_failed', error=str(e), fingerprint=fingerprint)
+            return False
+        # Threaded mode: requests still holding the old set fall back to unbatched predict()
+        old, self.model_set = self.model_set, model_set
+        self.httpd.model_set = model_set
+        old.close()
+        self.generation = self.httpd.generation = self.generation + 1
+        self.reloads += 1
+        self.metrics.set_generation(self.generation, self.reloads)
+        _log('reloaded', generation=self.generation, fingerprint=model_set.fingerprint)
+        return True
+
+    # --- pre-fork mode ---
+
+    def _spawn(self):
+        used = {slot for _, slot in self._children.values()}
+        slot = next((i for i in range(self.metrics.slots) if i not in used), None)
+        if slot is None:
+            return
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                self._worker_main(slot)
+                status = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(status)
+        self._children[pid] = (self.generation, slot)
+
+    def _worker_main(self, slot):
+        # Ctrl-C and SIGHUP go to the whole process group; only the parent acts on them
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=self.httpd.drain).start())
+        self.metrics.slot = slot
+        self.httpd.serve_forever(poll_interval=0.5)
+        self.httpd.server_close()
+
+    def _reap(self):
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                return
+            if pid == 0:
+                return
+            generation, _ = self._children.pop(pid, (None, None))
+            if generation == self.generation and not self._stopping:
+                _log('worker_exited', worker=pid, status=status)
+
+    def _current_workers(self):
+        return [pid for pid, (generation, _) in self._children.items() if generation == self.generation]
+
+    def _serve_prefork(self):
+        # Keep the loaded models out of the cyclic GC, so collections in the
+        # workers do not write to (and un-share) their pages
+        gc.freeze()
+        last_poll = time.monotonic()
+        while not self._stopping:
+            self._reap()
+            for _ in range(self.workers - len(self._current_workers())):
+                self._spawn()
+            time.sleep(0.1)
+            now = time.monotonic()
+            if self._reload_requested or (self.reload_poll and now - last_poll >= self.reload_poll):
+                forced, self._reload_requested, last_poll = self._reload_requested, False, now
+                old = self._current_workers()
+                if self._maybe_reload(force=forced):
+                    gc.freeze()
+                    for _ in range(self.workers):
+                        self._spawn()
+                    for pid in old:
+                        os.kill(pid, signal.SIGTERM)
+
+        for pid in self._children:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.httpd.keepalive_timeout + 5
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.05)
+        for pid in self._children:
+            os.kill(pid, signal.SIGKILL)
+
+    # --- single-process mode ---
+
+    def _serve_threaded(self):
+        thread = threading.Thread(target=self.httpd.serve_forever, kwargs={'poll_interval': 0.5}, daemon=True)
+        thread.start()
+        last_poll = time.monotonic()
+        while not self._stopping:
+            time.sleep(0.1)
+            now = time.monotonic()
+            if self._reload_requested or (self.reload_poll and now - last_poll >= self.reload_poll):
+                # Requests pick the model set up once, so swapping it is atomic for them
+                self._maybe_reload(force=self._reload_requested)
+                self._reload_requested, last_poll = False, now
+        self.httpd.shutdown()
+
+    def serve_forever(self):
+        """Serve until SIGTERM/SIGINT (or stop()); SIGHUP forces a reload"""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *_: self.stop())
+            signal.signal(signal.SIGINT, lambda *_: self.stop())
+            if hasattr(signal, 'SIGHUP'):
+                signal.signal(signal.SIGHUP, lambda *_: self.request_reload())
+        _log('listening', url=f"http://{self.address[0]}:{self.address[1]}", workers=self.workers,
+             engine=self.engine, models=list(self.model_set.models), micro_batch_ms=self.micro_batch_ms)
+        try:
+            if self.workers > 0:
+                self._serve_prefork()
+            else:
+                self._serve_threaded()
+        finally:
+            self.httpd.server_close()
+
+    def request_reload(self):
+        self._reload_requested = True
+
+    def stop(self):
+        self._stopping = True
+
+# ------------------------------- Client -------------------------------
+
+class PredictionClient:
+    """
+    Keep-alive client for a prediction server, safe to share between threads
+
+    Each thread keeps its own persistent connection. A connection the
+    server closed (idle timeout, draining worker) is reopened and the
+    request retried once.
+
+    Args:
+        url: Server base URL, e.g. http://127.0.0.1:8765
+        timeout: Socket timeout in seconds
+    """
+
+    def __init__(self, url, timeout=10.0):
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname or DEFAULT_HOST
+        self.port = parts.port or DEFAULT_PORT
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def request(self, method, path, body=None):
+        """
+        Send one request and decode its JSON response
+
+        Raises:
+            ValueError: The server rejected the request (4xx/5xx)
+            OSError: The server could not be reached
+        """
+        data = None if body is None else json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json'} if data is not None else {}
+        for attempt in (0, 1):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=data, headers=headers)
+                response = connection.getresponse()
+                payload = response.read()
+                break
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                    ConnectionResetError, BrokenPipeError):
+                self.close()
+                if attempt:
+                    raise
+        if response.getheader('Connection', '').lower() == 'close':
+            self.close()
+        result = json.loads(payload)
+        if response.status != 200:
+            raise ValueError(result.get('error', f"HTTP {response.status}"))
+        return result
+
+    def health(self):
+        return self.request('GET', '/health')
+
+    def metrics(self):
+        return self.request('GET', '/metrics')
+
+    def predict(self, features, model=None, **options):
+        """Single prediction; model=ENSEMBLE_MODEL takes weights= and top_k= options"""
+        body = {'features': [float(value) for value in features], **options}
+        if model:
+            body['model'] = model
+        return self.request('POST', '/predict', body)
+
+    def predict_batch(self, rows, model=None):
+        body = {'rows': [[float(value) for value in row] for row in rows]}
+        if model:
+            body['model'] = model
+        return self.request('POST', '/predict', body)
+
+    def sweep(self, at, features, model=None, points=None, weights=None):
+        body = {'at': [float(value) for value in at], 'features': list(features), 'model': model,
+                'points': points, 'weights': weights}
+        return self.request('POST', '/sweep', body)
+
+def run_bench(url, requests=5000, concurrency=8, model=None):
+    """
+    Load test: concurrent keep-alive clients sending single-row /predict requests
+
+    Returns:
+        dict: requests per second and latency percentiles in ms
+    """
+    import numpy as np
+
+    client = PredictionClient(url)
+    per_thread = max(1, requests // concurrency)
+    latencies = [[] for _ in range(concurrency)]
+    errors = []
+
+    def worker(index):
+        rng = np.random.default_rng(index)
+        try:
+            for _ in range(per_thread):
+                features = [rng.uniform(0, 140), rng.uniform(5, 145), rng.uniform(5, 205), rng.uniform(10, 45),
+                            rng.uniform(15, 100), rng.uniform(3.5, 9.5), rng.uniform(20, 300)]
+                start = time.perf_counter()
+                client.predict(features, model=model)
+                latencies[index].append((time.perf_counter() - start) * 1000)
+        except (OSError, ValueError) as e:
+            errors.append(str(e))
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    merged = np.sort(np.concatenate([np.asarray(values) for values in latencies]))
+    return {
+        'requests': len(merged),
+        'concurrency': concurrency,
+        'errors': errors[:5],
+        'requests_per_second': len(merged) / elapsed,
+        'latency_ms': {'p50': float(np.percentile(merged, 50)), 'p99': float(np.percentile(merged, 99)),
+                       'max': float(merged[-1])} if len(merged) else None
+    }
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Cropify HTTP prediction service")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"Listen address (default: {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Worker processes (default: CPU count; 0 = threads in one process)")
+    parser.add_argument('--engine', choices=SERVER_ENGINES, default=None,
+                        help="Models from the pickles or the memory-mapped bundle (default: bundle if exported)")
+    parser.add_argument('--reload-poll', type=float, default=RELOAD_POLL_SECONDS,
+                        help=f"Seconds between model file checks, 0 = SIGHUP only (default: {RELOAD_POLL_SECONDS:g})")
+    parser.add_argument('--keepalive-timeout', type=float, default=KEEPALIVE_TIMEOUT,
+                        help=f"Idle keep-alive seconds (default: {KEEPALIVE_TIMEOUT:g})")
+    parser.add_argument('--access-log', action='store_true', help="Log every request to stderr")
+    parser.add_argument('--micro-batch-ms', type=float,
+                        default=float(MICRO_BATCH_MS) if MICRO_BATCH_MS is not None else None,
+                        help="Score concurrent single-row requests together, waiting up to this long "
+                             "(default: CROPIFY_MICRO_BATCH_MS, unset = off)")
+    parser.add_argument('--bench', metavar='URL', help="Load-test a running server instead of serving")
+    parser.add_argument('--requests', type=int, default=5000, help="Bench: total requests (default: 5000)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Bench: client threads (default: 8)")
+    parser.add_argument('--model', help="Bench: model name (default: the server's default)")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        print(json.dumps(run_bench(args.bench, args.requests, args.concurrency, args.model)))
+        return 0
+    PredictionServer(args.host, args.port, args.workers, args.engine, args.reload_poll,
+                     args.keepalive_timeout, args.access_log, args.micro_batch_ms).serve_forever()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
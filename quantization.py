@@ -0,0 +1,337 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+
+from mlp_engine import FusedMLP, LabelDecoder, export_fused_mlp
+
+# =============================================================================
+# quantization.py - Reduced-Precision MLP and Naive Bayes Engines
+# Exports float32 and int8 versions of MLP.pkl and naive_bayes.pkl with the
+# scaler built in (raw features in, like MLP_fused.npz). int8 weights are
+# stored per channel: one float32 scale per output unit (MLP) or per feature
+# (Naive Bayes). The kernels here run them without sklearn, and report()
+# measures accuracy, top-1 agreement and batch throughput against float64.
+# =============================================================================
+
+QUANTIZED_DIR = 'quantized'
+PRECISIONS = ('float32', 'int8')
+# Display name -> (source pickle, artifact file prefix)
+QUANTIZED_MODELS = {
+    "MLP": ('MLP.pkl', 'mlp'),
+    "Naive Bayes": ('naive_bayes.pkl', 'naive_bayes')
+}
+REPORT_BATCH_SIZE = 10000
+
+def _fingerprints(paths):
+    from prediction_cache import model_fingerprint
+    return {path: model_fingerprint(path, path) for path in paths if os.path.exists(path)}
+
+def quantized_path(name, precision, directory=QUANTIZED_DIR):
+    """Artifact path of a model display name in a precision"""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}'. Expected one of: {', '.join(PRECISIONS)}")
+    return os.path.join(directory, f"{QUANTIZED_MODELS[name][1]}.{precision}.npz")
+
+def quantize_per_channel(weights, axis=0):
+    """
+    Symmetric int8 quantization with one scale per channel
+
+    Args:
+        weights: float array
+        axis: Axis reduced to find each channel's largest magnitude
+            (0: one scale per column)
+
+    Returns:
+        tuple: (int8 array, float32 scales with the reduced axis kept as 1)
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    scales = np.abs(weights).max(axis=axis, keepdims=True) / 127
+    scales[scales == 0] = 1
+    return np.round(weights / scales).astype(np.int8), scales.astype(np.float32)
+
+def _standardizer(scaler, n_features):
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+    return mean.astype(np.float32), (1 / scale).astype(np.float32)
+
+class Int8MLP(FusedMLP):
+    """
+    MLP stored as int8 per-output-unit weights, computed in float32
+
+    The weights are quantized without the scaler folded in; folding it into
+    int8 first-layer weights would leave the small-ranged features (pH) with
+    only a few quantization steps. NumPy has no int8 matmul, so on load the
+    weights are dequantized to float32 once and the scaler is folded into
+    the dequantized first layer: a batch then costs exactly what the float32
+    engine costs, and only the stored weights are smaller.
+    """
+
+    def __init__(self, coefs, scales, intercepts, classes, input_mean, input_inv_scale,
+                 hidden_activation='relu', out_activation='softmax'):
+        self.int8_coefs_ = coefs
+        self.scales_ = scales
+        self.int8_intercepts_ = intercepts
+        weights = [w.astype(np.float64) * scale for w, scale in zip(coefs, scales)]
+        biases = [np.asarray(b, dtype=np.float64) for b in intercepts]
+        # ((x - mean) * inv_scale) @ W + b == x @ (W * inv_scale[:, None]) + (b - (mean * inv_scale) @ W)
+        inv_scale = np.asarray(input_inv_scale, dtype=np.float64)
+        biases[0] = biases[0] - (np.asarray(input_mean, dtype=np.float64) * inv_scale) @ weights[0]
+        weights[0] = weights[0] * inv_scale[:, None]
+        super().__init__([np.ascontiguousarray(w, dtype=np.float32) for w in weights],
+                         [b.astype(np.float32) for b in biases], classes, hidden_activation, out_activation)
+
+class FusedNaiveBayes:
+    """
+    GaussianNB on raw features as two small matmuls
+
+    The per-class log-likelihood -0.5 * sum((x - theta)^2 / var) expands to
+    x @ (theta / var).T - 0.5 * (x * x) @ (1 / var).T plus a per-class
+    constant, so a batch costs two (rows x 7) @ (7 x 22) products instead of
+    a (rows x 22 x 7) intermediate. Inputs are standardized first, which
+    keeps the expanded terms small enough for float32.
+
+    Exposes the classifier API used by predict.py (predict, predict_proba,
+    classes_) but expects raw, unscaled features.
+    """
+
+    def __init__(self, theta, var, class_prior, classes, input_mean, input_inv_scale, dtype=np.float32):
+        theta, var = np.asarray(theta, dtype=np.float64), np.asarray(var, dtype=np.float64)
+        self.classes_ = classes
+        self.dtype = dtype
+        self.input_mean_ = np.asarray(input_mean, dtype=dtype)
+        self.input_inv_scale_ = np.asarray(input_inv_scale, dtype=dtype)
+        self._linear = np.ascontiguousarray((theta / var).T, dtype=dtype)
+        self._quadratic = np.ascontiguousarray((-0.5 / var).T, dtype=dtype)
+        self._constant = (np.log(class_prior) - 0.5 * np.log(2.0 * np.pi * var).sum(axis=1)
+                          - 0.5 * (theta ** 2 / var).sum(axis=1)).astype(dtype)
+
+    def _standardize(self, X):
+        X = np.asarray(X, dtype=self.dtype)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return (X - self.input_mean_) * self.input_inv_scale_
+
+    def _joint_log_likelihood(self, X):
+        X = self._standardize(X)
+        jll = X @ self._linear
+        jll += (X * X) @ self._quadratic
+        jll += self._constant
+        return jll
+
+    def predict_proba(self, X):
+        """Class probabilities for raw (unscaled) features"""
+        jll = self._joint_log_likelihood(X)
+        jll -= jll.max(axis=1, keepdims=True)
+        np.exp(jll, out=jll)
+        jll /= jll.sum(axis=1, keepdims=True)
+        return jll
+
+    def predict(self, X):
+        """Encoded class predictions for raw (unscaled) features"""
+        return self.classes_[self._joint_log_likelihood(X).argmax(axis=1)]
+
+class Int8NaiveBayes(FusedNaiveBayes):
+    """
+    GaussianNB stored as int8 means and inverse standard deviations, one scale per feature
+
+    The int8 parameters are dequantized once on load and expanded into the
+    two-matmul form of FusedNaiveBayes, so a batch costs the same as
+    float32. Only theta and 1/std are quantized, never the expanded terms:
+    int8 rounding of those large, nearly cancelling terms would flip
+    predictions.
+    """
+
+    def __init__(self, theta, theta_scale, inv_std, inv_std_scale, class_prior, classes,
+                 input_mean, input_inv_scale):
+        self.theta_ = theta
+        self.theta_scale_ = theta_scale
+        self.inv_std_ = inv_std
+        self.inv_std_scale_ = inv_std_scale
+        inv_std_values = inv_std.astype(np.float64) * inv_std_scale
+        super().__init__(theta.astype(np.float64) * theta_scale, 1 / inv_std_values ** 2, class_prior, classes,
+                         input_mean, input_inv_scale)
+
+def export_quantized(directory=QUANTIZED_DIR, scaler_path='scaler.pkl', label_encoder_path='label_encoder.pkl'):
+    """
+    Write the float32 and int8 artifacts of every model in QUANTIZED_MODELS
+
+    Missing source pickles are skipped. manifest.json, written last, records
+    the fingerprints of the pickles each model was exported from.
+
+    Returns:
+        dict: Written path -> bytes
+    """
+    import joblib
+
+    os.makedirs(directory, exist_ok=True)
+    scaler = joblib.load(scaler_path)
+    labels = np.asarray(joblib.load(label_encoder_path).classes_).astype(str)
+    written = {}
+    manifest = {'models': {}}
+    for name, (source, _) in QUANTIZED_MODELS.items():
+        if not os.path.exists(source):
+            continue
+        manifest['models'][name] = _fingerprints([source, scaler_path, label_encoder_path])
+        paths = {precision: quantized_path(name, precision, directory) for precision in PRECISIONS}
+        model = joblib.load(source)
+        mean, inv_scale = _standardizer(scaler, model.n_features_in_)
+        common = {'classes': np.asarray(model.classes_), 'labels': labels,
+                  'input_mean': mean, 'input_inv_scale': inv_scale}
+        if name == "MLP":
+            # float32 is the fused engine's format: scaler folded into the first layer
+            export_fused_mlp(source, scaler_path, label_encoder_path, paths['float32'])
+            arrays = {'hidden_activation': np.array(model.activation),
+                      'out_activation': np.array(model.out_activation_),
+                      'n_layers': np.array(len(model.coefs_)), **common}
+            for i, (w, b) in enumerate(zip(model.coefs_, model.intercepts_)):
+                arrays[f'coef_{i}'], arrays[f'scale_{i}'] = quantize_per_channel(w, axis=0)
+                arrays[f'intercept_{i}'] = np.asarray(b, dtype=np.float32)
+            np.savez(paths['int8'], **arrays)
+        else:
+            np.savez(paths['float32'], theta=model.theta_.astype(np.float32), var=model.var_.astype(np.float32),
+                     class_prior=model.class_prior_.astype(np.float32), **common)
+            theta, theta_scale = quantize_per_channel(model.theta_, axis=0)
+            inv_std, inv_std_scale = quantize_per_channel(1 / np.sqrt(model.var_), axis=0)
+            # A zero would make a class infinitely unlikely; one step is the closest safe value
+            inv_std = np.maximum(inv_std, 1).astype(np.int8)
+            np.savez(paths['int8'], theta=theta, theta_scale=theta_scale, inv_std=inv_std,
+                     inv_std_scale=inv_std_scale, class_prior=model.class_prior_.astype(np.float32), **common)
+        for path in paths.values():
+            written[path] = os.path.getsize(path)
+    with open(os.path.join(directory, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return written
+
+def is_stale(name="MLP", directory=QUANTIZED_DIR):
+    """True if name's source pickles changed (or vanished) since it was exported, or were never recorded"""
+    try:
+        with open(os.path.join(directory, 'manifest.json'), 'r') as file:
+            sources = json.load(file)['models'][name]
+    except (OSError, KeyError, ValueError):
+        return True
+    return _fingerprints(sources) != sources
+
+def load_quantized(name="MLP", precision="int8", directory=QUANTIZED_DIR, allow_stale=False):
+    """
+    Load a quantized model in the same shape as predict.load_models()
+
+    Args:
+        allow_stale: Load artifacts exported from older pickles instead of raising
+
+    Returns:
+        tuple: (model, None, label_decoder) - no scaler, it is built in
+    """
+    path = quantized_path(name, precision, directory)
+    if not allow_stale and is_stale(name, directory):
+        raise ValueError(f"{path} was exported from older models; run python quantization.py --export")
+    with np.load(path) as data:
+        decoder = LabelDecoder(data['labels'])
+        if name == "MLP" and precision == 'float32':
+            return FusedMLP.load(path), None, decoder
+        if name == "MLP":
+            n_layers = int(data['n_layers'])
+            model = Int8MLP(
+                coefs=[data[f'coef_{i}'] for i in range(n_layers)],
+                scales=[data[f'scale_{i}'] for i in range(n_layers)],
+                intercepts=[data[f'intercept_{i}'] for i in range(n_layers)],
+                classes=data['classes'],
+                input_mean=data['input_mean'],
+                input_inv_scale=data['input_inv_scale'],
+                hidden_activation=str(data['hidden_activation']),
+                out_activation=str(data['out_activation'])
+            )
+        elif precision == 'float32':
+            model = FusedNaiveBayes(data['theta'], data['var'], data['class_prior'], data['classes'],
+                                    data['input_mean'], data['input_inv_scale'])
+        else:
+            model = Int8NaiveBayes(data['theta'], data['theta_scale'], data['inv_std'], data['inv_std_scale'],
+                                   data['class_prior'], data['classes'], data['input_mean'],
+                                   data['input_inv_scale'])
+    return model, None, decoder
+
+def _weight_bytes(model):
+    """Bytes of stored parameters, for the report"""
+    if isinstance(model, Int8NaiveBayes):
+        arrays = [model.theta_, model.theta_scale_, model.inv_std_, model.inv_std_scale_]
+    elif isinstance(model, Int8MLP):
+        arrays = [*model.int8_coefs_, *model.scales_, *model.int8_intercepts_]
+    elif isinstance(model, FusedNaiveBayes):
+        arrays = [model._linear, model._quadratic, model._constant]
+    elif hasattr(model, 'coefs_'):
+        arrays = [*model.coefs_, *model.intercepts_, *getattr(model, 'scales_', [])]
+    else:
+        arrays = [model.theta_, model.var_, model.class_prior_]
+    return int(sum(np.asarray(array).nbytes for array in arrays))
+
+def _rows_per_second(score, X, batch_size=REPORT_BATCH_SIZE, repeats=5):
+    batch = X[np.arange(batch_size) % len(X)]
+    score(batch)
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        score(batch)
+        best = min(best, time.perf_counter() - start)
+    return batch_size / best
+
+def report(csv_path='csv/Crop_recommendation.csv', directory=QUANTIZED_DIR):
+    """
+    Accuracy delta, top-1 agreement and throughput of every quantized model
+
+    Each model is compared with its float64 sklearn pickle (scaler.pkl +
+    predict_proba) on every row of the labelled CSV. Throughput is scored on
+    REPORT_BATCH_SIZE-row batches, the sklearn path including its scaler.
+
+    Returns:
+        dict: model name -> {'float64': ..., 'float32': ..., 'int8': ...}
+    """
+    import joblib
+    import pandas as pd
+    from predict import FEATURE_NAMES
+
+    data = pd.read_csv(csv_path)
+    X = data[FEATURE_NAMES].to_numpy(dtype=np.float64)
+    scaler = joblib.load('scaler.pkl')
+    y = joblib.load('label_encoder.pkl').transform(data['label'])
+    result = {}
+    for name, (source, _) in QUANTIZED_MODELS.items():
+        if not os.path.exists(quantized_path(name, 'float32', directory)):
+            continue
+        model = joblib.load(source)
+        expected = model.predict_proba(scaler.transform(X))
+        expected_top1 = expected.argmax(axis=1)
+        baseline = float(np.mean(model.classes_[expected_top1] == y))
+        result[name] = {'float64': {
+            'accuracy': baseline,
+            'weight_bytes': _weight_bytes(model),
+            'rows_per_second': _rows_per_second(lambda batch: model.predict_proba(scaler.transform(batch)), X)
+        }}
+        for precision in PRECISIONS:
+            engine = load_quantized(name, precision, directory)[0]
+            actual = engine.predict_proba(X)
+            accuracy = float(np.mean(engine.classes_[actual.argmax(axis=1)] == y))
+            result[name][precision] = {
+                'accuracy': accuracy,
+                'accuracy_delta': accuracy - baseline,
+                'top1_agreement': float(np.mean(actual.argmax(axis=1) == expected_top1)),
+                'max_abs_proba_diff': float(np.abs(expected - actual).max()),
+                'weight_bytes': _weight_bytes(engine),
+                'rows_per_second': _rows_per_second(engine.predict_proba, X)
+            }
+    return result
+
+if __name__ == "__main__":
+    # python quantization.py --export    (writes quantized/ from the pickles)
+    # python quantization.py --report    (accuracy delta and throughput vs. float64)
+    if len(sys.argv) == 2 and sys.argv[1] == '--export':
+        print(json.dumps({'written': export_quantized()}))
+    elif len(sys.argv) == 2 and sys.argv[1] == '--report':
+        result = report()
+        print(json.dumps(result, indent=2))
+        # Reduced precision must never change the recommended crop
+        sys.exit(0 if all(variant['top1_agreement'] == 1.0 for variants in result.values()
+                          for precision, variant in variants.items() if precision != 'float64') else 1)
+    else:
+        print(json.dumps({'error': 'Invalid arguments. Expected: --export or --report'}))
+        sys.exit(1)
@@ -0,0 +1,223 @@
+import io
+import time
+import numpy as np
+
+from predict import FEATURE_NAMES
+from decision_map import SLIDER_DOMAIN
+from ensemble import ensemble_proba
+
+# =============================================================================
+# sensitivity.py - What-If Sensitivity Sweeps
+# Holds six (or five) features at the current input and sweeps the others
+# across their slider range: thousands of points built as one matrix, scaled
+# once and scored with a single predict_proba call per model. Reports how far
+# each feature can move before the recommended crop changes, and draws the
+# resulting class-boundary maps.
+# =============================================================================
+
+DEFAULT_POINTS_1D = 2000
+# 64 x 64 = 4096 points: ~100 ms for the 100-tree forest, well under 200 ms in total
+DEFAULT_POINTS_2D = 64
+
+def _check_feature(name):
+    if name not in FEATURE_NAMES:
+        raise ValueError(f"Unknown feature '{name}'. Expected one of: {', '.join(FEATURE_NAMES)}")
+    return FEATURE_NAMES.index(name)
+
+def _axis(name, points, bounds):
+    low, high = (bounds or {}).get(name, SLIDER_DOMAIN[name])
+    return np.linspace(low, high, points)
+
+def _score(X, models, scaler, label_encoder, weights):
+    """
+    One predict_proba call per model over all rows, combined by soft voting
+
+    Returns:
+        tuple: (encoded class per row, its probability)
+    """
+    if scaler is not None:
+        if hasattr(scaler, 'feature_names_in_'):
+            import pandas as pd
+            X = pd.DataFrame(X, columns=FEATURE_NAMES)
+        X = scaler.transform(X)
+    combined, _, _ = ensemble_proba(X, models, len(label_encoder.classes_), weights)
+    best = combined.argmax(axis=1)
+    return best, combined[np.arange(len(best)), best]
+
+def _decode(label_encoder, codes):
+    return np.asarray(label_encoder.inverse_transform(codes)).astype(str)
+
+def sweep_1d(features, feature, models, scaler, label_encoder, points=DEFAULT_POINTS_1D,
+             bounds=None, weights=None):
+    """
+    Sweep one feature across its range with the others held at features
+
+    Args:
+        features: Current input, 7 values in FEATURE_NAMES order
+        feature: Name of the feature to sweep
+        models: Model name -> classifier; several models are soft-voted
+        scaler: Scaler shared by the models (None if folded into the model)
+        label_encoder: Label encoder shared by the models
+        points: Number of sweep points
+        bounds: Feature name -> (low, high) overriding the slider range
+        weights: Soft-vote weights (missing names weigh 1)
+
+    Returns:
+        dict: sweep values with the crop and confidence at each, the current
+        crop, the range of the feature over which it stays the same, and
+        every point where the recommendation flips
+    """
+    start = time.perf_counter()
+    column = _check_feature(feature)
+    values = _axis(feature, points, bounds)
+    base = np.asarray(features, dtype=np.float64)
+    # Sweep rows plus the unchanged input as the last row
+    X = np.repeat(base[None, :], points + 1, axis=0)
+    X[:points, column] = values
+    codes, confidence = _score(X, models, scaler, label_encoder, weights)
+    crops = _decode(label_encoder, codes)
+    current_crop = crops[-1]
+    crops, confidence, codes = crops[:points], confidence[:points], codes[:points]
+
+    # Flips sit halfway between neighbouring points with different crops
+    changes = np.nonzero(codes[1:] != codes[:-1])[0]
+    flips = [{'at': float((values[i] + values[i + 1]) / 2), 'from': str(crops[i]), 'to': str(crops[i + 1])}
+             for i in changes]
+    # Contiguous stretch around the current value that keeps the current crop
+    position = int(np.clip(np.searchsorted(values, base[column]), 0, points - 1))
+    different = np.nonzero(crops != current_crop)[0]
+    below, above = different[different < position], different[different >= position]
+    if crops[position] != current_crop:
+        stable = [float(base[column]), float(base[column])]
+    else:
+        stable = [float((values[below[-1]] + values[below[-1] + 1]) / 2) if len(below) else float(values[0]),
+                  float((values[above[0] - 1] + values[above[0]]) / 2) if len(above) else float(values[-1])]
+    return {
+        'feature': feature,
+        'current': float(base[column]),
+        'current_crop': str(current_crop),
+        'values': values,
+        'crops': crops,
+        'confidence': confidence,
+        'stable_range': stable,
+        'flips': flips,
+        'points': points,
+        'elapsed_ms': (time.perf_counter() - start) * 1000
+    }
+
+def sweep_2d(features, feature_x, feature_y, models, scaler, label_encoder, points=DEFAULT_POINTS_2D,
+             bounds=None, weights=None):
+    """
+    Sweep two features over a points x points grid with the others held at features
+
+    Args: as sweep_1d, with points per axis
+
+    Returns:
+        dict: axis values, (points_y, points_x) grids of encoded classes and
+        confidences, the crops present with their share of the area, and
+        the current crop
+    """
+    start = time.perf_counter()
+    column_x, column_y = _check_feature(feature_x), _check_feature(feature_y)
+    if column_x == column_y:
+        raise ValueError("A 2-D sweep needs two different features")
+    values_x, values_y = _axis(feature_x, points, bounds), _axis(feature_y, points, bounds)
+    base = np.asarray(features, dtype=np.float64)
+    X = np.repeat(base[None, :], points * points + 1, axis=0)
+    grid_y, grid_x = np.meshgrid(values_y, values_x, indexing='ij')
+    X[:-1, column_x] = grid_x.ravel()
+    X[:-1, column_y] = grid_y.ravel()
+    codes, confidence = _score(X, models, scaler, label_encoder, weights)
+    current_code = int(codes[-1])
+    classes = codes[:-1].reshape(points, points)
+
+    present, counts = np.unique(classes, return_counts=True)
+    names = _decode(label_encoder, np.append(present, current_code))
+    return {
+        'features': [feature_x, feature_y],
+        'current': [float(base[column_x]), float(base[column_y])],
+        'current_crop': str(names[-1]),
+        'values_x': values_x,
+        'values_y': values_y,
+        'classes': classes,
+        'confidence': confidence[:-1].reshape(points, points),
+        'labels': {int(code): str(name) for code, name in zip(present, names[:-1])},
+        'share': {str(name): float(count) / classes.size for name, count in zip(names[:-1], counts)},
+        'points': points * points,
+        'elapsed_ms': (time.perf_counter() - start) * 1000
+    }
+
+ARRAY_KEYS = ('values', 'crops', 'confidence', 'values_x', 'values_y', 'classes')
+
+def to_json(result):
+    """Sweep result with arrays turned into lists"""
+    return {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in result.items()}
+
+def from_json(result):
+    """Inverse of to_json() (e.g. a sweep from prediction_server.py), ready for render_sweep()"""
+    restored = {key: np.asarray(value) if key in ARRAY_KEYS else value for key, value in result.items()}
+    if 'labels' in restored:
+        # JSON object keys are strings; the class grid holds integer codes
+        restored['labels'] = {int(code): name for code, name in restored['labels'].items()}
+    return restored
+
+def _palette(n):
+    import matplotlib
+    colors = list(matplotlib.colormaps['tab20'].colors) + list(matplotlib.colormaps['tab20b'].colors)
+    return [colors[i % len(colors)] for i in range(n)]
+
+def render_sweep(result, dpi=100):
+    """
+    Draw a 1-D or 2-D sweep as PNG bytes
+
+    1-D: the confidence along the sweep, shaded by recommended crop.
+    2-D: the class-boundary map, one colour per crop, boundaries as black lines.
+    The current input is marked in both.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Patch
+
+    fig, ax = plt.subplots(figsize=(8, 4.5) if 'feature' in result else (7, 6))
+    try:
+        if 'feature' in result:
+            values, crops = result['values'], result['crops']
+            names = list(dict.fromkeys(crops.tolist()))
+            colors = dict(zip(names, _palette(len(names))))
+            edges = np.concatenate([[values[0]], (values[1:] + values[:-1]) / 2, [values[-1]]])
+            run_starts = np.concatenate([[0], np.nonzero(crops[1:] != crops[:-1])[0] + 1])
+            run_ends = np.append(run_starts[1:], len(crops))
+            for begin, end in zip(run_starts, run_ends):
+                ax.axvspan(edges[begin], edges[end], color=colors[crops[begin]], alpha=0.35, lw=0)
+            ax.plot(values, result['confidence'], color='black', lw=1.2)
+            ax.axvline(result['current'], color='red', ls='--', lw=1)
+            ax.set_xlim(values[0], values[-1])
+            ax.set_ylim(0, 1.02)
+            ax.set_xlabel(result['feature'])
+            ax.set_ylabel('confidence')
+            handles = [Patch(color=colors[name], alpha=0.6, label=name.capitalize()) for name in names]
+        else:
+            classes, labels = result['classes'], result['labels']
+            codes = sorted(labels)
+            colors = _palette(len(codes))
+            # Dense 0..k-1 index per crop present, so the colours are distinct
+            index = np.searchsorted(codes, classes)
+            values_x, values_y = result['values_x'], result['values_y']
+            extent = [values_x[0], values_x[-1], values_y[0], values_y[-1]]
+            ax.imshow(index, origin='lower', extent=extent, aspect='auto', interpolation='nearest',
+                      cmap=matplotlib.colors.ListedColormap(colors), vmin=-0.5, vmax=len(codes) - 0.5)
+            # Class boundaries: the 0.5 contour of each crop's indicator
+            for i in range(len(codes) if len(codes) > 1 else 0):
+                ax.contour(values_x, values_y, (index == i).astype(float), levels=[0.5],
+                           colors='black', linewidths=0.8)
+            ax.plot(*result['current'], marker='X', color='red', markersize=12, markeredgecolor='white')
+            ax.set_xlabel(result['features'][0])
+            ax.set_ylabel(result['features'][1])
+            handles = [Patch(color=colors[i], label=labels[code].capitalize()) for i, code in enumerate(codes)]
+        ax.legend(handles=handles, loc='upper left', bbox_to_anchor=(1.01, 1), fontsize=8, frameon=False)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
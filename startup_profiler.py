@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+
+# =============================================================================
+# startup_profiler.py - Start-up Time Profiling and Budget Check
+# Runs the app's first page render (the login page) in a fresh interpreter
+# with -X importtime and aggregates the per-module import cost by top-level
+# package. --check fails (exit code 1) when the time to render the login
+# page goes over a budget, so start-up regressions are caught.
+# =============================================================================
+
+APP_PATH = 'cropii.py'
+# Login page render budget in ms (override with --budget or the env var).
+# ~1.8 s on a single core, most of it streamlit-authenticator's import and
+# Streamlit's one-off component discovery for the cookie manager.
+DEFAULT_BUDGET_MS = float(os.getenv("CROPIFY_STARTUP_BUDGET_MS", "2500"))
+
+# Child process: render the login page once (no user is logged in), report timings
+_RENDER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+harness = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+app.run()
+done = time.perf_counter()
+# The page's own timing record (closed before st.stop() on the login page)
+import timing
+page = timing.recent_records[-1] if timing.recent_records else {}
+print(json.dumps({
+    'harness_ms': (harness - start) * 1000,
+    'render_ms': (done - harness) * 1000,
+    'script_ms': page.get('wall_ms'),
+    'stages': page.get('stages', []),
+    'exceptions': [str(e.value) for e in app.exception],
+    'login_page': any('log in' in str(info.value) for info in app.info)
+}))
+"""
+
+def _run_child(app_path, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', _RENDER_SCRIPT, os.path.abspath(app_path)]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(app_path)))
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(f"Render failed: {result.stderr[-2000:]}")
+    return json.loads(lines[-1]), result.stderr
+
+def parse_importtime(stderr):
+    """
+    Parse -X importtime output
+
+    Returns:
+        list: (module, self microseconds, cumulative microseconds), in import order
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            entries.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return entries
+
+def aggregate_by_package(entries):
+    """Self time and module count per top-level package, most expensive first"""
+    totals = defaultdict(lambda: {'self_ms': 0.0, 'modules': 0})
+    for name, self_us, _ in entries:
+        package = name.split('.')[0]
+        totals[package]['self_ms'] += self_us / 1000
+        totals[package]['modules'] += 1
+    return sorted(([package, stats] for package, stats in totals.items()),
+                  key=lambda item: item[1]['self_ms'], reverse=True)
+
+def profile_startup(app_path=APP_PATH):
+    """Import cost of rendering the login page, per top-level package"""
+    render, stderr = _run_child(app_path, importtime=True)
+    entries = parse_importtime(stderr)
+    return {
+        'render': render,
+        'packages': aggregate_by_package(entries),
+        'total_import_ms': sum(self_us for _, self_us, _ in entries) / 1000
+    }
+
+def measure_login_render(app_path=APP_PATH, runs=3):
+    """Median time to first render of the login page, each run in a fresh process"""
+    results = [_run_child(app_path)[0] for _ in range(runs)]
+    results.sort(key=lambda result: result['render_ms'])
+    median = results[len(results) // 2]
+    return {
+        'render_ms': median['render_ms'],
+        'runs_ms': [result['render_ms'] for result in results],
+        'script_ms': median['script_ms'],
+        'stages': median['stages'],
+        'exceptions': median['exceptions'],
+        'login_page': median['login_page']
+    }
+
+def check_budget(app_path=APP_PATH, budget_ms=DEFAULT_BUDGET_MS, runs=3):
+    """
+    Pass/fail check of the login page render time
+
+    Returns:
+        tuple: (passed, measurement dict)
+    """
+    result = measure_login_render(app_path, runs)
+    result['budget_ms'] = budget_ms
+    passed = result['login_page'] and not result['exceptions'] and result['render_ms'] <= budget_ms
+    return passed, result
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Profile and check the Streamlit app's start-up time")
+    parser.add_argument('--app', default=APP_PATH)
+    parser.add_argument('--check', action='store_true',
+                        help="Exit with status 1 if the login page render goes over the budget")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"Budget in ms (default: $CROPIFY_STARTUP_BUDGET_MS or {DEFAULT_BUDGET_MS:.0f})")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help="Packages shown in the import profile")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        passed, result = check_budget(args.app, args.budget, args.runs)
+        print(json.dumps(result))
+        print(f"{'PASS' if passed else 'FAIL'}: login page rendered in {result['render_ms']:.0f} ms "
+              f"(budget {args.budget:.0f} ms)")
+        return 0 if passed else 1
+
+    profile = profile_startup(args.app)
+    print(f"Login page render: {profile['render']['render_ms']:.0f} ms under -X importtime "
+          f"(imports: {profile['total_import_ms']:.0f} ms in total, incl. the test harness)")
+    print(f"{'Package':<28} {'Self (ms)':>10} {'Modules':>8}")
+    for package, stats in profile['packages'][:args.top]:
+        print(f"{package:<28} {stats['self_ms']:10.1f} {stats['modules']:8d}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
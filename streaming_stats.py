@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# streaming_stats.py - Memory-Bounded Statistics for Large CSV Files
+# Reads a CSV in chunks and keeps only O(columns^2) running state: pairwise
+# counts, means and co-moments merged chunk by chunk (Chan et al.), so the
+# correlation matrix matches DataFrame.corr(), including its pairwise
+# handling of missing values. Also keeps per-column summaries, the first
+# rows and a fixed-size reservoir sample.
+# =============================================================================
+
+DEFAULT_CHUNKSIZE = 50000
+
+def _is_numeric(series):
+    """Same columns as DataFrame.select_dtypes(include=[np.number])"""
+    return pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+
+class StreamingStats:
+    """
+    Online column statistics over a sequence of DataFrame chunks
+
+    For every pair of columns (i, j), only rows where both values are present
+    are counted, exactly like DataFrame.corr(). Each chunk is centered on its
+    own column means before its sums are taken, and chunks are combined with
+    the pairwise-update formulas, so there is no catastrophic cancellation
+    even for large offsets.
+
+    Args:
+        sample_size: Rows kept in the reservoir sample
+        head_size: Leading rows kept for the preview
+        random_state: Seed for the reservoir sample
+    """
+
+    def __init__(self, sample_size=1000, head_size=5, random_state=None):
+        self.sample_size = sample_size
+        self.head_size = head_size
+        self.rows = 0
+        self.columns = None
+        self.head = None
+        self._rng = np.random.default_rng(random_state)
+        self._non_numeric = set()
+        self._sample = []
+        self._n = None        # [i, j]: rows where columns i and j are both present
+        self._mean = None     # [i, j]: mean of column i over those rows
+        self._m2 = None       # [i, j]: sum of squared deviations of column i over those rows
+        self._comoment = None # [i, j]: sum of (x_i - mean) * (x_j - mean) over those rows
+        self._min = None
+        self._max = None
+
+    def update(self, chunk):
+        """Fold one DataFrame chunk into the running statistics"""
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            k = len(self.columns)
+            self._n = np.zeros((k, k))
+            self._mean = np.zeros((k, k))
+            self._m2 = np.zeros((k, k))
+            self._comoment = np.zeros((k, k))
+            self._min = np.full(k, np.inf)
+            self._max = np.full(k, -np.inf)
+            self.head = chunk.head(self.head_size)
+        self._update_reservoir(chunk)
+
+        values = np.full((len(chunk), len(self.columns)), np.nan)
+        for i, name in enumerate(self.columns):
+            column = chunk[name]
+            if _is_numeric(column):
+                values[:, i] = column.to_numpy(dtype=float, na_value=np.nan)
+            else:
+                self._non_numeric.add(name)
+        self._update_moments(values)
+        self.rows += len(chunk)
+
+    def _update_moments(self, X):
+        present = ~np.isnan(X)
+        if not present.any():
+            return
+        mask = present.astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Center on this chunk's column means so the sums stay small
+            counts = mask.sum(axis=0)
+            shift = np.where(counts > 0, np.nansum(X, axis=0) / np.maximum(counts, 1), 0.0)
+            Y = np.where(present, X - shift, 0.0)
+
+            n_b = mask.T @ mask
+            sums = Y.T @ mask                       # [i, j]: sum of y_i over pair rows
+            mean_b = np.where(n_b > 0, sums / n_b, 0.0)
+            m2_b = (Y * Y).T @ mask - mean_b * sums
+            comoment_b = Y.T @ Y - mean_b * sums.T
+            mean_b = mean_b + shift[:, None]
+
+            # Pairwise merge of (n, mean, M2, C) with the running totals
+            n_a = self._n
+            n = n_a + n_b
+            delta = mean_b - self._mean
+            weight = np.where(n > 0, n_a * n_b / np.where(n > 0, n, 1), 0.0)
+            self._mean = self._mean + np.where(n > 0, delta * n_b / np.where(n > 0, n, 1), 0.0)
+            self._m2 = self._m2 + m2_b + delta * delta * weight
+            self._comoment = self._comoment + comoment_b + delta * delta.T * weight
+            self._n = n
+
+        self._min = np.fmin(self._min, np.nanmin(np.where(present, X, np.inf), axis=0))
+        self._max = np.fmax(self._max, np.nanmax(np.where(present, X, -np.inf), axis=0))
+
+    def _update_reservoir(self, chunk):
+        """Algorithm R: every row seen so far is in the sample with equal probability"""
+        records = chunk.itertuples(index=False, name=None)
+        start = self.rows
+        fill = max(0, min(self.sample_size - start, len(chunk)))
+        for _ in range(fill):
+            self._sample.append(next(records))
+        if fill == len(chunk):
+            return
+        # Row t (0-based, overall) replaces slot j ~ U[0, t] when j < sample_size
+        positions = np.arange(start + fill, start + len(chunk))
+        slots = (self._rng.random(len(positions)) * (positions + 1)).astype(np.int64)
+        selected = np.nonzero(slots < self.sample_size)[0]
+        rows = chunk.iloc[fill + selected].itertuples(index=False, name=None)
+        for slot, row in zip(slots[selected], rows):
+            self._sample[slot] = row
+
+    def numeric_columns(self):
+        return [name for name in (self.columns or []) if name not in self._non_numeric]
+
+    def _numeric_index(self):
+        return [i for i, name in enumerate(self.columns or []) if name not in self._non_numeric]
+
+    def covariance(self):
+        """Pairwise covariance (ddof=1), like DataFrame.cov()"""
+        idx = self._numeric_index()
+        n = self._n[np.ix_(idx, idx)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = np.where(n > 1, self._comoment[np.ix_(idx, idx)] / (n - 1), np.nan)
+        names = self.numeric_columns()
+        return pd.DataFrame(cov, index=names, columns=names)
+
+    def correlation(self):
+        """Pairwise Pearson correlation, like DataFrame.corr()"""
+        idx = self._numeric_index()
+        if not idx:
+            return pd.DataFrame()
+        grid = np.ix_(idx, idx)
+        m2 = self._m2[grid]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            divisor = np.sqrt(m2 * m2.T)
+            corr = np.where((self._n[grid] > 0) & (divisor > 0), self._comoment[grid] / divisor, np.nan)
+        corr = np.clip(corr, -1.0, 1.0)
+        names = self.numeric_columns()
+        return pd.DataFrame(corr, index=names, columns=names)
+
+    def summary(self):
+        """Per-column non-null count, missing count, mean, std, min and max"""
+        rows = []
+        for i, name in enumerate(self.columns or []):
+            numeric = name not in self._non_numeric
+            count = int(self._n[i, i]) if numeric else None
+            rows.append({
+                'column': name,
+                'type': 'numeric' if numeric else 'other',
+                'count': count,
+                'missing': self.rows - count if numeric else None,
+                'mean': self._mean[i, i] if numeric and count else None,
+                'std': float(np.sqrt(self._m2[i, i] / (count - 1))) if numeric and count > 1 else None,
+                'min': self._min[i] if numeric and count else None,
+                'max': self._max[i] if numeric and count else None
+            })
+        return pd.DataFrame(rows)
+
+    def sample(self):
+        """Reservoir sample as a DataFrame (at most sample_size rows)"""
+        return pd.DataFrame(self._sample, columns=self.columns)
+
+def analyze_csv(source, chunksize=DEFAULT_CHUNKSIZE, sample_size=1000, random_state=None):
+    """
+    Stream a CSV file or file-like object through StreamingStats
+
+    Memory use is one chunk plus the running statistics, independent of the
+    file size.
+
+    Raises:
+        pandas.errors.EmptyDataError: if the file is empty
+    """
+    stats = StreamingStats(sample_size=sample_size, random_state=random_state)
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        stats.update(chunk)
+    return stats
+
+def verify_against_pandas(csv_path='csv/Crop_recommendation.csv', chunksize=137):
+    """Max absolute difference between the streamed and in-memory correlation"""
+    streamed = analyze_csv(csv_path, chunksize=chunksize).correlation()
+    expected = pd.read_csv(csv_path).select_dtypes(include=[np.number]).corr()
+    same_nan = bool((streamed.isna().to_numpy() == expected.isna().to_numpy()).all())
+    diff = np.nanmax(np.abs(streamed.to_numpy() - expected.to_numpy())) if len(expected) else 0.0
+    return {'columns': list(expected.columns) == list(streamed.columns), 'same_nan': same_nan,
+            'max_abs_diff': float(diff)}
+
+if __name__ == "__main__":
+    import sys
+    import json
+
+    # python streaming_stats.py --verify [CSV [CHUNKSIZE]]
+    if len(sys.argv) > 1 and sys.argv[1] == '--verify':
+        args = sys.argv[2:]
+        result = verify_against_pandas(*(args[:1]), *(int(a) for a in args[1:2]))
+        print(json.dumps(result))
+        sys.exit(0 if result['columns'] and result['same_nan'] and result['max_abs_diff'] < 1e-12 else 1)
+    print("Usage: python streaming_stats.py --verify [CSV [CHUNKSIZE]]")
+    sys.exit(1)
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# =============================================================================
+# timing.py - Per-Stage Timing Instrumentation
+# Records wall-clock and CPU time for named stages (config load, model load,
+# scaling, inference, ...). Each stage goes into the active request's timing
+# record and into process-wide rolling histograms.
+# =============================================================================
+
+# Append every finished request record here as one JSON line (unset = off)
+TIMING_LOG = os.getenv("CROPIFY_TIMING_LOG")
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is open-ended)
+BUCKETS_MS = [0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000]
+
+_current = contextvars.ContextVar("cropify_timing_record", default=None)
+
+class TimingRecord:
+    """Stage timings of one request (one prediction, one page run, ...)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.stages = []
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self.wall_ms = None
+        self.cpu_ms = None
+
+    def add(self, stage, wall_ms, cpu_ms):
+        self.stages.append({'stage': stage, 'wall_ms': wall_ms, 'cpu_ms': cpu_ms})
+
+    def finish(self):
+        self.wall_ms = (time.perf_counter() - self._wall_start) * 1000
+        self.cpu_ms = (time.thread_time() - self._cpu_start) * 1000
+        return self
+
+    def to_dict(self):
+        return {
+            'request': self.name,
+            'started_at': self.started_at,
+            'wall_ms': self.wall_ms,
+            'cpu_ms': self.cpu_ms,
+            'stages': list(self.stages)
+        }
+
+class StageHistograms:
+    """
+    Rolling per-stage latency statistics
+
+    Keeps the last `window` wall-clock samples of every stage for percentiles
+    and fixed-bucket counts; thread-safe.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, wall_ms):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(wall_ms)
+
+    def summary(self):
+        """Stage -> count, p50/p90/p99/max in ms and bucket counts"""
+        with self._lock:
+            snapshot = {stage: sorted(samples) for stage, samples in self._samples.items()}
+        result = {}
+        for stage, values in snapshot.items():
+            def percentile(q):
+                return values[min(len(values) - 1, int(q / 100 * len(values)))]
+            buckets = [0] * (len(BUCKETS_MS) + 1)
+            for value in values:
+                buckets[next((i for i, bound in enumerate(BUCKETS_MS) if value <= bound), len(BUCKETS_MS))] += 1
+            result[stage] = {
+                'count': len(values),
+                'p50_ms': percentile(50),
+                'p90_ms': percentile(90),
+                'p99_ms': percentile(99),
+                'max_ms': values[-1],
+                'buckets': buckets
+            }
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+# Process-wide statistics: every stage of every request, and the last records
+histograms = StageHistograms()
+recent_records = deque(maxlen=100)
+
+def begin_request(name):
+    """Start a timing record; stages timed in this context are added to it"""
+    record = TimingRecord(name)
+    _current.set(record)
+    return record
+
+def end_request(record=None):
+    """Finish the active (or given) record, keep it in recent_records and return its dict"""
+    record = record or _current.get()
+    if record is None:
+        return None
+    record.finish()
+    _current.set(None)
+    data = record.to_dict()
+    recent_records.append(data)
+    if TIMING_LOG:
+        with open(TIMING_LOG, 'a') as file:
+            file.write(json.dumps(data) + "\n")
+    return data
+
+@contextmanager
+def request(name):
+    """Context manager form of begin_request() / end_request()"""
+    record = begin_request(name)
+    try:
+        yield record
+    finally:
+        end_request(record)
+
+def current_record():
+    return _current.get()
+
+@contextmanager
+def stage(name):
+    """
+    Time a block as stage `name`
+
+    Wall time is perf_counter; CPU time is the calling thread's CPU time, so
+    other threads (e.g. concurrent Streamlit sessions) are not counted.
+    """
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        wall_ms = (time.perf_counter() - wall_start) * 1000
+        cpu_ms = (time.thread_time() - cpu_start) * 1000
+        histograms.add(name, wall_ms)
+        record = _current.get()
+        if record is not None:
+            record.add(name, wall_ms, cpu_ms)
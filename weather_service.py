@@ -0,0 +1,287 @@
+import sys
+import json
+import time
+import argparse
+import threading
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+import requests
+from requests.adapters import HTTPAdapter
+
+# =============================================================================
+# weather_service.py - Location and Weather Lookups off the Render Path
+# Queries the IP-location providers concurrently, reuses pooled HTTP sessions
+# and keeps a TTL cache that serves stale data while a background thread
+# refreshes it. All URLs are constructor arguments, so a local stub server
+# can stand in for the real APIs (python weather_service.py --self-test).
+# =============================================================================
+
+LOCATION_SERVICES = [
+    "https://ipinfo.io/json",
+    "https://ipapi.co/json/",
+    "http://ip-api.com/json/"
+]
+WEATHER_URL = "http://api.openweathermap.org/data/2.5/weather"
+
+class WeatherService:
+    """
+    Cached, concurrent location and weather lookups
+
+    Args:
+        api_key: OpenWeatherMap API key
+        location_urls: IP-location providers, queried concurrently
+        weather_url: OpenWeatherMap-compatible current weather endpoint
+        ttl: Seconds a successful answer stays fresh
+        failure_ttl: Seconds a failed lookup is remembered before retrying
+        timeout: Per-request HTTP timeout in seconds
+    """
+
+    def __init__(self, api_key, location_urls=LOCATION_SERVICES, weather_url=WEATHER_URL,
+                 ttl=600, failure_ttl=60, timeout=5):
+        self.api_key = api_key
+        self.location_urls = list(location_urls)
+        self.weather_url = weather_url
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.timeout = timeout
+
+        # One pooled session (keep-alive connections) shared by all threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.location_urls) + 1, pool_maxsize=8)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Separate pools so a background refresh can wait on provider lookups
+        self._lookup_pool = ThreadPoolExecutor(max_workers=len(self.location_urls) or 1,
+                                               thread_name_prefix="location")
+        self._refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-refresh")
+        self._cache = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ cache
+    def _cached(self, key, fetch, block=True):
+        """
+        Stale-while-revalidate lookup
+
+        Fresh entries are returned directly. Expired entries are still returned,
+        and one background refresh is started for the key. Missing entries are
+        fetched inline when block is True; otherwise a background fetch starts
+        and None is returned.
+        """
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                self._refresh_in_background(key, fetch)
+            return value
+        if not block:
+            self._refresh_in_background(key, fetch)
+            return None
+        return self._store(key, fetch())
+
+    def _store(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.ttl if value is not None else self.failure_ttl
+        with self._lock:
+            self._cache[key] = (value, time.monotonic() + ttl)
+        return value
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = fetch()
+                if value is not None:
+                    self._store(key, value)
+                else:
+                    # Keep serving the old value, but retry after failure_ttl, not a full ttl
+                    with self._lock:
+                        previous = self._cache.get(key, (None, 0))[0]
+                    self._store(key, previous, self.failure_ttl)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresh_pool.submit(refresh)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    # --------------------------------------------------------------- location
+    def _fetch_city(self, service_url):
+        try:
+            response = self.session.get(service_url, timeout=self.timeout)
+            if response.status_code == 200:
+                data = response.json()
+                # Try different possible keys for city name
+                return (data.get("city") or
+                        data.get("town") or
+                        data.get("region") or
+                        data.get("district"))
+        except Exception as e:
+            print(f"Location fetch error from {service_url}: {e}")
+        return None
+
+    def _detect_city(self):
+        """Ask every provider at once and return the first valid city"""
+        futures = [self._lookup_pool.submit(self._fetch_city, url) for url in self.location_urls]
+        try:
+            for future in as_completed(futures, timeout=self.timeout + 1):
+                city = future.result()
+                if city:
+                    return city
+        except FutureTimeoutError:
+            print("Location lookup timed out")
+        return None
+
+    def detect_city(self, block=True):
+        """User's city from IP geolocation, or None if no provider answered"""
+        return self._cached(("location",), self._detect_city, block=block)
+
+    # ---------------------------------------------------------------- weather
+    def _fetch_weather(self, city):
+        try:
+            params = {"q": city, "appid": self.api_key, "units": "metric"}
+            response = self.session.get(self.weather_url, params=params, timeout=self.timeout)
+            if response.status_code == 200:
+                data = response.json()
+                return data["main"]["temp"], data["main"]["humidity"], data["weather"][0]["main"]
+            print(f"Weather API error: Status {response.status_code}")
+        except Exception as e:
+            print(f"Weather fetch error: {e}")
+        return None
+
+    def get_weather(self, city, block=True):
+        """
+        Current weather for a city
+
+        Returns:
+            tuple: (temperature, humidity, condition), or (None, None, None)
+        """
+        if not city:
+            return None, None, None
+        key = ("weather", city.strip().lower())
+        result = self._cached(key, lambda: self._fetch_weather(city), block=block)
+        return result if result is not None else (None, None, None)
+
+# =============================================================================
+# Self-test - the service against a local stub of the location/weather APIs
+# =============================================================================
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """
+    /location/ok answers a city, /location/down a 500, /location/slow a city
+    after a second; /weather answers server.weather with server.weather_status
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.partition('?')[0]
+        server.hits[path] = server.hits.get(path, 0) + 1
+        status, body = 404, {}
+        if path == '/location/ok':
+            status, body = 200, {'city': 'Pune'}
+        elif path == '/location/down':
+            status = 500
+        elif path == '/location/slow':
+            time.sleep(1)
+            status, body = 200, {'city': 'Nashik'}
+        elif path == '/weather':
+            temp, humidity, condition = server.weather
+            status, body = server.weather_status, {'main': {'temp': temp, 'humidity': humidity},
+                                                   'weather': [{'main': condition}]}
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def _wait_for_refresh(service, timeout=5):
+    deadline = time.monotonic() + timeout
+    while service._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def self_test(ttl=1.0, failure_ttl=0.2):
+    """
+    Run the service against a local http.server stub
+
+    Checks concurrent location lookup past a failing and a slow provider,
+    caching, stale-while-revalidate, and that a failed refresh keeps the
+    stale value but is retried after failure_ttl.
+
+    Returns:
+        dict: check name -> True/False
+    """
+    stub = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    stub.hits, stub.weather, stub.weather_status = {}, (24.5, 60, 'Clear'), 200
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{stub.server_address[1]}"
+    service = WeatherService('test-key', [f"{base}/location/down", f"{base}/location/slow", f"{base}/location/ok"],
+                             f"{base}/weather", ttl=ttl, failure_ttl=failure_ttl, timeout=3)
+    checks = {}
+    try:
+        start = time.monotonic()
+        checks['location_first_valid'] = service.detect_city() == 'Pune'
+        checks['location_concurrent'] = time.monotonic() - start < 1
+
+        checks['weather'] = service.get_weather('Pune') == (24.5, 60, 'Clear')
+        service.get_weather(' pune ')
+        checks['weather_cached'] = stub.hits['/weather'] == 1
+
+        # Expired: the old answer comes back at once, the refresh replaces it
+        time.sleep(ttl + 0.05)
+        stub.weather = (30.0, 55, 'Clouds')
+        checks['stale_served'] = service.get_weather('Pune') == (24.5, 60, 'Clear')
+        _wait_for_refresh(service)
+        checks['refreshed'] = service.get_weather('Pune') == (30.0, 55, 'Clouds')
+
+        # Outage: the stale answer is kept, and retried after failure_ttl
+        stub.weather_status = 500
+        time.sleep(ttl + 0.05)
+        service.get_weather('Pune')
+        _wait_for_refresh(service)
+        checks['failed_refresh_keeps_stale'] = service.get_weather('Pune') == (30.0, 55, 'Clouds')
+        hits = stub.hits['/weather']
+        time.sleep(failure_ttl + 0.05)
+        service.get_weather('Pune')
+        _wait_for_refresh(service)
+        checks['failed_refresh_retried'] = stub.hits['/weather'] == hits + 1
+
+        stub.weather_status, stub.weather = 200, (31.0, 50, 'Clear')
+        time.sleep(failure_ttl + 0.05)
+        service.get_weather('Pune')
+        _wait_for_refresh(service)
+        checks['recovered'] = service.get_weather('Pune') == (31.0, 50, 'Clear')
+    finally:
+        stub.shutdown()
+        stub.server_close()
+    return checks
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Location and weather lookup service")
+    parser.add_argument('--self-test', action='store_true',
+                        help="Check caching, refresh and failure handling against a local stub server")
+    args = parser.parse_args(argv)
+    if not args.self_test:
+        parser.print_usage()
+        return 1
+    # The service logs fetch errors to stdout; keep stdout for the JSON result
+    with redirect_stdout(sys.stderr):
+        checks = self_test()
+    print(json.dumps({'passed': all(checks.values()), 'checks': checks}, indent=2))
+    return 0 if all(checks.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))